@@ -0,0 +1,439 @@
+"""
+Consensus & adversarial panel for financial crime investigations.
+
+Packages the notebook's data models, Ollama client, panelists, aggregator and critic,
+plus a panel engine that consults panelists concurrently and stops as soon as the
+verdict is settled.
+"""
+import json
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+
+import requests
+
+VERDICTS = ("CLEARED", "SUSPICIOUS")
+# Risk score for a panelist whose reply, or whose risk_score, could not be read
+FALLBACK_RISK_SCORE = 50.0
+PROMPT_LAYOUTS = ("shared_prefix", "legacy")
+
+# One system prompt for the whole panel: Ollama places the system prompt ahead of the
+# user prompt, so a per-persona system prompt would break the shared case prefix
+PANEL_SYSTEM_PROMPT = "You are a member of a financial crime investigation panel. Answer in the role you are given."
+
+# --- Data models and normalizer ---
+
+@dataclass
+class Transaction:
+    transaction_id: str
+    amount: float
+    currency: str
+    timestamp: str
+    counterparty: str
+    location: str
+
+@dataclass
+class CustomerProfile:
+    customer_id: str
+    risk_rating: str
+    onboarding_date: str
+    occupation: str
+    expected_monthly_volume: float
+
+@dataclass
+class NormalizedCaseData:
+    case_id: str
+    customer: CustomerProfile
+    transactions: List[Transaction]
+    alert_type: str
+    summary: str
+
+def normalize_input(raw_data: Dict[str, Any]) -> NormalizedCaseData:
+    """Standardizes disparate input data into a consistent format."""
+    customer_data = raw_data.get('customer', {})
+    customer = CustomerProfile(
+        customer_id=customer_data.get('id', 'N/A'),
+        risk_rating=customer_data.get('risk_level', 'Medium'),
+        onboarding_date=customer_data.get('onboarded', 'N/A'),
+        occupation=customer_data.get('job', 'Unknown'),
+        expected_monthly_volume=float(customer_data.get('expected_vol', 0))
+    )
+
+    transactions = []
+    for tx in raw_data.get('transactions', []):
+        transactions.append(Transaction(
+            transaction_id=tx.get('tx_id', 'N/A'),
+            amount=float(tx.get('amt', 0)),
+            currency=tx.get('ccy', 'USD'),
+            timestamp=tx.get('time', 'N/A'),
+            counterparty=tx.get('to', 'N/A'),
+            location=tx.get('loc', 'N/A')
+        ))
+
+    return NormalizedCaseData(
+        case_id=raw_data.get('case_id', 'CASE-' + datetime.now().strftime('%Y%m%d%H%M%S')),
+        customer=customer,
+        transactions=transactions,
+        alert_type=raw_data.get('alert_type', 'General Suspicious Activity'),
+        summary=raw_data.get('description', 'No summary provided')
+    )
+
+# --- Ollama client ---
+
+class OllamaClient:
+    """
+    Minimal /api/generate client. Each thread reuses its own HTTP session (requests.Session
+    is not thread-safe and panelists query concurrently), keeps the model loaded for
+    keep_alive, and records Ollama's prefill/decode counters in `usage`.
+    """
+    def __init__(self, model="gemma3:4b", base_url="http://localhost:11434/api/generate", keep_alive="30m"):
+        self.model = model
+        self.base_url = base_url
+        self.keep_alive = keep_alive
+        self._local = threading.local()
+        self.usage: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def query(self, prompt: str, system_prompt: Optional[str] = None, options: Optional[Dict[str, Any]] = None) -> str:
+        payload = {
+            "model": self.model,
+            "prompt": prompt,
+            "system": system_prompt or "You are a financial crime investigator.",
+            "stream": False,
+            "keep_alive": self.keep_alive
+        }
+        if options:
+            payload["options"] = options
+        try:
+            response = self.session.post(self.base_url, json=payload)
+            response.raise_for_status()
+            data = response.json()
+            self._record(data)
+            return data.get('response', 'No response content')
+        except Exception as e:
+            return f"Error querying Ollama: {str(e)}"
+
+    def warm(self):
+        """Loads the model without generating (Ollama treats an empty prompt as a load request)."""
+        try:
+            self.session.post(self.base_url, json={"model": self.model, "keep_alive": self.keep_alive}).raise_for_status()
+        except Exception as e:
+            print(f"Could not warm {self.model}: {e}")
+
+    def _record(self, data: Dict[str, Any]):
+        # Ollama reports durations in nanoseconds; prompt_eval_count excludes prefix tokens reused from its cache
+        with self._lock:
+            self.usage.append({
+                "prefill_tokens": data.get("prompt_eval_count", 0),
+                "prefill_ms": data.get("prompt_eval_duration", 0) / 1e6,
+                "load_ms": data.get("load_duration", 0) / 1e6,
+                "decode_tokens": data.get("eval_count", 0),
+                "total_ms": data.get("total_duration", 0) / 1e6,
+            })
+
+    def usage_since(self, mark: int = 0) -> Dict[str, Any]:
+        """Sums the usage of calls made after len(self.usage) was `mark`."""
+        with self._lock:
+            calls = self.usage[mark:]
+        totals = {"calls": len(calls)}
+        for name in ("prefill_tokens", "prefill_ms", "load_ms", "decode_tokens", "total_ms"):
+            totals[name] = sum(call[name] for call in calls)
+        return totals
+
+# --- Prompt layout ---
+
+def case_prefix(case: NormalizedCaseData) -> str:
+    """
+    The case body every panel prompt starts with. It is byte-identical across the
+    panelists and the critic, so Ollama only prefills it once per case and reuses the
+    cached tokens for the other calls.
+    """
+    return "Case Data:\n" + json.dumps(asdict(case), indent=2, sort_keys=True) + "\n\n"
+
+# --- Panelists ---
+
+class BaseAgent:
+    def __init__(self, name: str, persona: str, client: OllamaClient, layout: str = "shared_prefix"):
+        if layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout '{layout}', expected one of {PROMPT_LAYOUTS}")
+        self.name = name
+        self.persona = persona
+        self.client = client
+        self.layout = layout
+
+    def reason(self, case: NormalizedCaseData) -> Dict[str, Any]:
+        if self.layout == "legacy":
+            prompt = f"""
+        Case Data:
+        {json.dumps(asdict(case), indent=2)}
+
+        As a {self.name} specializing in {self.persona}, analyze the following case and provide:
+        1. Rationale: Your step-by-step reasoning.
+        2. Risk Score: A score from 0 to 100.
+        3. Recommendation: 'CLEARED' or 'SUSPICIOUS'.
+
+        Return ONLY a JSON object with keys: 'rationale', 'risk_score', 'recommendation'.
+        """
+            system_prompt = f"You are a {self.name} agent. Persona: {self.persona}"
+        else:
+            prompt = case_prefix(case) + (
+                f"You are the {self.name} panelist, specializing in {self.persona}\n"
+                "Analyze the case above and provide:\n"
+                "1. Rationale: Your step-by-step reasoning.\n"
+                "2. Risk Score: A score from 0 to 100.\n"
+                "3. Recommendation: 'CLEARED' or 'SUSPICIOUS'.\n\n"
+                "Return ONLY a JSON object with keys: 'rationale', 'risk_score', 'recommendation'."
+            )
+            system_prompt = PANEL_SYSTEM_PROMPT
+        response = self.client.query(prompt, system_prompt=system_prompt)
+        try:
+            # Basic cleaning to extract JSON if needed
+            json_start = response.find('{')
+            json_end = response.rfind('}') + 1
+            result = json.loads(response[json_start:json_end])
+            if not isinstance(result, dict):
+                raise ValueError("reply is not a JSON object")
+            return result
+        except (json.JSONDecodeError, ValueError):
+            return {"rationale": f"Failed to parse response: {response}", "risk_score": FALLBACK_RISK_SCORE,
+                    "recommendation": "SUSPICIOUS"}
+
+def default_panelists(client: OllamaClient, layout: str = "shared_prefix") -> List[BaseAgent]:
+    return [
+        BaseAgent("Conservative Compliance", "Strict AML/KYC guidelines and regulatory rulebooks.", client, layout),
+        BaseAgent("Risk Appetite", "Bank's financial risk exposure and threshold for high-value transactions.", client, layout),
+        BaseAgent("Customer Context", "Historical behavior, KYC history, and customer profile consistency.", client, layout),
+        BaseAgent("Legal/Regulatory", "Jurisdictional laws, SAR filing triggers, and legal precedence.", client, layout)
+    ]
+
+# --- Aggregator and adversarial critic ---
+
+class Aggregator:
+    def aggregate(self, responses: List[Dict[str, Any]], skipped: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        scores = [_risk_score(r) for r in responses]
+        # Normalised like the early-stop check, so "suspicious" or an unknown verdict counts the same way
+        recommendations = [_vote(r) for r in responses]
+
+        if responses:
+            final_score = sum(scores) / len(scores)
+            # Simple majority vote
+            final_rec = max(set(recommendations), key=recommendations.count)
+            consensus = recommendations.count(final_rec) / len(recommendations)
+        else:
+            # Nobody answered: no consensus, and the case is not cleared
+            final_score, final_rec, consensus = FALLBACK_RISK_SCORE, "SUSPICIOUS", 0.0
+
+        return {
+            "final_risk_score": final_score,
+            "final_recommendation": final_rec,
+            "consensus_level": consensus,
+            # Consensus is over the panelists actually consulted; skipped ones are listed for audit
+            "panelists_consulted": [r.get('agent') for r in responses],
+            "panelists_skipped": list(skipped or []),
+        }
+
+class AdversarialCritic:
+    def __init__(self, client: OllamaClient, layout: str = "shared_prefix"):
+        if layout not in PROMPT_LAYOUTS:
+            raise ValueError(f"Unknown prompt layout '{layout}', expected one of {PROMPT_LAYOUTS}")
+        self.client = client
+        self.layout = layout
+
+    def evaluate(self, case: NormalizedCaseData, agent_responses: List[Dict[str, Any]], aggregated: Dict[str, Any]) -> str:
+        if self.layout == "legacy":
+            prompt = f"""
+        Case Data: {json.dumps(asdict(case))}
+        Agent Responses: {json.dumps(agent_responses)}
+        Aggregated Decision: {json.dumps(aggregated)}
+
+        As an Adversarial Critic, evaluate the panel's disagreement and the quality of their rationales.
+        If you find flaws or contradictions, highlight them. If the consensus is weak, recommend further manual review.
+        """
+            return self.client.query(prompt, system_prompt="You are an Adversarial Critic for financial crime investigations.")
+        prompt = case_prefix(case) + (
+            f"Agent Responses: {json.dumps(agent_responses)}\n"
+            f"Aggregated Decision: {json.dumps(aggregated)}\n\n"
+            "You are the Adversarial Critic. Evaluate the panel's disagreement and the quality of their rationales.\n"
+            "If you find flaws or contradictions, highlight them. If the consensus is weak, recommend further manual review."
+        )
+        return self.client.query(prompt, system_prompt=PANEL_SYSTEM_PROMPT)
+
+# --- Panel engine ---
+
+def _risk_score(response: Dict[str, Any]) -> float:
+    # Models sometimes answer "85" or "high"; anything float() cannot read counts as the fallback
+    try:
+        score = float(response.get('risk_score', FALLBACK_RISK_SCORE))
+    except (TypeError, ValueError):
+        return FALLBACK_RISK_SCORE
+    return score if math.isfinite(score) else FALLBACK_RISK_SCORE
+
+def _vote(response: Dict[str, Any]) -> str:
+    recommendation = str(response.get('recommendation', 'SUSPICIOUS')).upper()
+    return recommendation if recommendation in VERDICTS else 'SUSPICIOUS'
+
+class ConsensusPanel:
+    """
+    Consults panelists concurrently and stops as soon as further answers cannot matter:
+
+      verdict_locked      - the leading verdict has more votes than the rival could reach
+                            even if every remaining panelist disagreed
+      confidence_reached  - at least min_votes answers are in and the leading verdict's
+                            share of them is >= confidence (off unless confidence is set)
+
+    Panelists that were never asked, or whose answers arrived after the stop, are
+    reported as skipped with the reason. The critic only runs when the consensus
+    level is below critic_threshold.
+
+    With prime_prefix, the shared case prefix is prefilled once (a one-token
+    generation) before the panelists fan out, so concurrent panelists find it cached
+    instead of each prefilling it.
+    """
+    def __init__(self, agents: List[BaseAgent], critic: Optional[AdversarialCritic] = None,
+                 aggregator: Optional[Aggregator] = None, max_concurrency: Optional[int] = None,
+                 confidence: Optional[float] = None, min_votes: int = 2, critic_threshold: float = 0.75,
+                 prime_prefix: bool = False, early_stop: bool = True):
+        self.agents = agents
+        self.critic = critic
+        self.aggregator = aggregator or Aggregator()
+        self.max_concurrency = max_concurrency or len(agents)
+        self.confidence = confidence
+        self.min_votes = min_votes
+        self.critic_threshold = critic_threshold
+        self.prime_prefix = prime_prefix
+        self.early_stop = early_stop
+
+    def _stop_reason(self, responses: List[Dict[str, Any]]) -> Optional[str]:
+        votes = [_vote(r) for r in responses]
+        remaining = len(self.agents) - len(votes)
+        if remaining == 0 or not self.early_stop:
+            return None
+        counts = sorted((votes.count(v) for v in VERDICTS), reverse=True)
+        if counts[0] > counts[1] + remaining:
+            return "verdict_locked"
+        if self.confidence is not None and len(votes) >= self.min_votes and counts[0] / len(votes) >= self.confidence:
+            return "confidence_reached"
+        return None
+
+    def deliberate(self, case: NormalizedCaseData) -> Dict[str, Any]:
+        """Returns the panelist responses in completion order, the skipped panelists and the stop reason."""
+        if self.prime_prefix and self.agents:
+            self.agents[0].client.query(case_prefix(case), system_prompt=PANEL_SYSTEM_PROMPT, options={"num_predict": 1})
+        responses: List[Dict[str, Any]] = []
+        stop_reason = None
+        pending_agents = list(self.agents)
+        in_flight = {}
+        executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+        try:
+            while pending_agents or in_flight:
+                # Only start new panelists while the outcome is still open
+                while pending_agents and len(in_flight) < self.max_concurrency:
+                    agent = pending_agents.pop(0)
+                    in_flight[executor.submit(agent.reason, case)] = agent
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    agent = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"rationale": f"Panelist failed: {e}", "risk_score": FALLBACK_RISK_SCORE,
+                                  "recommendation": "SUSPICIOUS"}
+                    responses.append({"agent": agent.name, **result})
+                stop_reason = self._stop_reason(responses)
+                if stop_reason:
+                    break
+        finally:
+            # Answers still in flight are not waited for
+            executor.shutdown(wait=False)
+
+        skipped = [{"agent": agent.name, "reason": stop_reason, "state": "in_flight"} for agent in in_flight.values()]
+        skipped += [{"agent": agent.name, "reason": stop_reason, "state": "not_started"} for agent in pending_agents]
+        return {"responses": responses, "skipped": skipped, "stop_reason": stop_reason}
+
+    def run(self, case: NormalizedCaseData) -> Dict[str, Any]:
+        deliberation = self.deliberate(case)
+        responses = deliberation["responses"]
+        summary = self.aggregator.aggregate(responses, deliberation["skipped"])
+        summary["stop_reason"] = deliberation["stop_reason"]
+
+        critique = None
+        critic_called = self.critic is not None and summary["consensus_level"] < self.critic_threshold
+        if critic_called:
+            critique = self.critic.evaluate(case, responses, summary)
+        summary["critic_called"] = critic_called
+
+        return {
+            "timestamp": datetime.now().isoformat(),
+            "case": asdict(case),
+            "agent_outputs": responses,
+            "aggregation": summary,
+            "critique": critique
+        }
+
+def run_investigation(raw_case: Dict[str, Any], panel: ConsensusPanel) -> Dict[str, Any]:
+    print(f"--- Starting Investigation for Case: {raw_case.get('case_id', 'New Case')} ---")
+    normalized_case = normalize_input(raw_case)
+
+    result = panel.run(normalized_case)
+    summary = result["aggregation"]
+
+    print("\n--- Investigation Summary ---")
+    print(f"Final Recommendation: {summary['final_recommendation']}")
+    print(f"Final Risk Score: {summary['final_risk_score']}")
+    print(f"Consensus Level: {summary['consensus_level'] * 100:.1f}%")
+    print(f"Panelists Consulted: {', '.join(summary['panelists_consulted'])}")
+    for skipped in summary["panelists_skipped"]:
+        print(f"Skipped {skipped['agent']} ({skipped['reason']}, {skipped['state']})")
+
+    print("\n--- Critic's Evaluation ---")
+    if result["critique"] is None:
+        print(f"Not requested (consensus at or above {panel.critic_threshold * 100:.0f}%)")
+    else:
+        print(result["critique"])
+
+    return result
+
+def measure_prefill(raw_case: Dict[str, Any], client: OllamaClient, layouts=("legacy", "shared_prefix")) -> Dict[str, Dict[str, Any]]:
+    """
+    Runs the full five-call panel (no early stop, critic always called) once per prompt
+    layout and returns the prefill tokens and time Ollama reported for each.
+    """
+    case = normalize_input(raw_case)
+    client.warm()
+    results = {}
+    for layout in layouts:
+        panel = ConsensusPanel(default_panelists(client, layout), AdversarialCritic(client, layout),
+                               max_concurrency=1, critic_threshold=float("inf"), early_stop=False)
+        mark = len(client.usage)
+        panel.run(case)
+        results[layout] = client.usage_since(mark)
+    return results
+
+if __name__ == "__main__":
+    client = OllamaClient()
+    panel = ConsensusPanel(default_panelists(client), AdversarialCritic(client))
+    sample_case = {
+        "case_id": "CASE-999",
+        "alert_type": "Rapid Movement of Funds",
+        "description": "Customer transferred $45,000 to a newly opened account in a high-risk jurisdiction.",
+        "customer": {"id": "C123", "risk_level": "Low", "job": "Engineer", "expected_vol": 5000},
+        "transactions": [
+            {"tx_id": "TX1", "amt": 45000, "ccy": "USD", "time": "2025-12-29 10:00", "to": "Account X - Offshore", "loc": "Cayman Islands"}
+        ]
+    }
+    run_investigation(sample_case, panel)
+
+    print("\n--- Prefill per case by prompt layout ---")
+    for layout, usage in measure_prefill(sample_case, client).items():
+        print(f"{layout:>13}: {usage['calls']} calls, {usage['prefill_tokens']} prefill tokens, "
+              f"{usage['prefill_ms']:.0f} ms prefill, {usage['total_ms']:.0f} ms total")
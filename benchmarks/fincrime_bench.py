@@ -0,0 +1,51 @@
+"""fincrime_investigation benchmark: full Supervisor workflows (profile, context, typology, recommendation)."""
+import argparse
+import json
+import os
+import sys
+from urllib.parse import urlsplit
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "fincrime_investigation"))
+
+from benchmarks.harness import drive
+
+def synthetic_alerts(n: int, customers: int = 50):
+    for i in range(n):
+        yield {
+            "alert_id": f"ALT-BENCH-{i:06d}",
+            "customer_id": f"CUST-{i % customers:05d}",
+            "alert_type": "High Value Transaction",
+            "timestamp": "2024-10-25T14:30:00Z",
+            "details": {"amount": 10000 + i, "currency": "USD", "beneficiary_country": "Cayman Islands"},
+        }
+
+def synthetic_profile(customer_id: str) -> dict:
+    return {"name": f"Customer {customer_id}", "risk_rating": "Medium", "business_type": "Import/Export",
+            "jurisdiction": "USA"}
+
+def run(base_url: str, requests: int = 50, concurrency: int = 8, customers: int = 50) -> dict:
+    # ChatOllama reaches Ollama through the ollama client, which reads OLLAMA_HOST
+    parts = urlsplit(base_url)
+    os.environ["OLLAMA_HOST"] = f"{parts.hostname}:{parts.port}"
+    from agents.supervisor import Supervisor
+
+    supervisor = Supervisor()
+    alerts = list(synthetic_alerts(requests, customers))
+    result = drive(lambda alert: supervisor.investigate(alert, synthetic_profile(alert["customer_id"])),
+                   alerts, concurrency)
+    result.update({"pipeline": "fincrime_investigation", "customers": customers,
+                   "profile_cache": supervisor.profile_cache.report()})
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", required=True)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--customers", type=int, default=50, help="distinct customers the alerts are spread over")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.base_url, args.requests, args.concurrency, args.customers)))
+
+if __name__ == "__main__":
+    main()
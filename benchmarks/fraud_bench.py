@@ -0,0 +1,51 @@
+"""fraud_detection benchmark: payments through ingestion, rolling windows and the cash-out detector."""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "fraud_detection"))
+
+from benchmarks.harness import drive
+
+def synthetic_payments(n: int, accounts: int = 1000, seed: int = 7):
+    """An inbound credit per account followed by outbound debits, so ratios sweep through the LLM band."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    for i in range(n):
+        account = f"ACC{i % accounts:06d}"
+        timestamp = start + datetime.timedelta(milliseconds=100 * i)
+        if i < accounts:
+            yield account, 1000.0, "IN", timestamp
+        else:
+            yield account, round(rng.uniform(50.0, 400.0), 2), "OUT", timestamp
+
+def run(base_url: str, requests: int = 5000, accounts: int = 1000) -> dict:
+    from agents import FastCashoutDetectorAgent, IngestionAgent, RollingWindowAgent
+    from events import EventBus
+    from llm_runtime.transport import get_transport
+
+    # Keep most payments outbound even for short runs
+    accounts = max(1, min(accounts, requests // 5))
+    event_bus = EventBus()
+    ingestion = IngestionAgent(event_bus)
+    RollingWindowAgent(event_bus)
+    detector = FastCashoutDetectorAgent(event_bus, transport=get_transport(base_url))
+    # Ingestion is synchronous through the EventBus, so payments are driven one at a time
+    result = drive(lambda payment: ingestion.ingest(*payment), synthetic_payments(requests, accounts), 1)
+    result.update({"pipeline": "fraud_detection", "accounts": accounts, "detector_tiers": detector.tier_report()})
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", required=True)
+    parser.add_argument("--requests", type=int, default=5000, help="payments to ingest")
+    parser.add_argument("--accounts", type=int, default=1000)
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.base_url, args.requests, args.accounts)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Bulk ingestion benchmark for fraud_detection: rows/sec and memory of the streaming
+CSV, NDJSON and Parquet readers, alone and feeding the window + detector pipeline
+through IngestionAgent.ingest_many, against a row-at-a-time csv.DictReader loop.
+
+  python -m benchmarks.fraud_ingest --rows 500000 --formats csv,ndjson,parquet
+
+Reader memory is the tracemalloc peak of a separate read-only pass, so it shows what
+the chunking holds at once; it does not grow with the file size.
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "fraud_detection"))
+
+from events import EventBus
+from sharded import build_pipeline
+from sources import read_payments
+from agents import IngestionAgent
+
+FORMATS = ("csv", "ndjson", "parquet")
+
+def synthetic_rows(n: int, accounts: int, seed: int = 5):
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    for i in range(n):
+        yield (f"ACC{rng.randrange(accounts):07d}", (start + datetime.timedelta(milliseconds=25 * i)).isoformat(),
+               round(rng.uniform(5.0, 2000.0), 2), "IN" if rng.random() < 0.45 else "OUT",
+               f"CP{rng.randrange(accounts * 4):08d}")
+
+def write_files(directory: str, rows: int, accounts: int, formats) -> dict:
+    header = ["account_id", "timestamp", "amount", "direction", "counterparty_id"]
+    paths = {}
+    if "csv" in formats:
+        paths["csv"] = os.path.join(directory, "payments.csv")
+        with open(paths["csv"], "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(synthetic_rows(rows, accounts))
+    if "ndjson" in formats:
+        paths["ndjson"] = os.path.join(directory, "payments.ndjson")
+        with open(paths["ndjson"], "w") as f:
+            for row in synthetic_rows(rows, accounts):
+                f.write(json.dumps(dict(zip(header, row))) + "\n")
+    if "parquet" in formats:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        paths["parquet"] = os.path.join(directory, "payments.parquet")
+        writer = None
+        chunk = []
+        for row in synthetic_rows(rows, accounts):
+            chunk.append(row)
+            if len(chunk) == 100_000:
+                writer = _write_parquet_chunk(pa, pq, writer, paths["parquet"], header, chunk)
+                chunk = []
+        if chunk:
+            writer = _write_parquet_chunk(pa, pq, writer, paths["parquet"], header, chunk)
+        writer.close()
+    return paths
+
+def _write_parquet_chunk(pa, pq, writer, path, header, chunk):
+    columns = [list(column) for column in zip(*chunk)]
+    columns[1] = pa.array([datetime.datetime.fromisoformat(ts) for ts in columns[1]], pa.timestamp("us"))
+    table = pa.table(dict(zip(header, columns)))
+    if writer is None:
+        writer = pq.ParquetWriter(path, table.schema)
+    writer.write_table(table)
+    return writer
+
+def read_only(path: str, chunk_size: int) -> dict:
+    started = time.perf_counter()
+    rows = sum(len(batch) for batch in read_payments(path, chunk_size=chunk_size))
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    for _ in read_payments(path, chunk_size=chunk_size):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"rows_per_sec": round(rows / elapsed), "peak_mb": round(peak / 2**20, 1)}
+
+def _pipeline() -> IngestionAgent:
+    bus = EventBus()
+    # Empty LLM band: the benchmark measures ingestion, not model calls
+    build_pipeline(bus, {"llm_band": (0.8, 0.8)})
+    return IngestionAgent(bus)
+
+def row_at_a_time(path: str) -> dict:
+    """The loop a caller would write without ingest_many: DictReader, fromisoformat, ingest()."""
+    started = time.perf_counter()
+    rows = 0
+    with open(path, newline="") as f:
+        for record in csv.DictReader(f):
+            (record["account_id"], float(record["amount"]), record["direction"],
+             datetime.datetime.fromisoformat(record["timestamp"]), record["counterparty_id"])
+            rows += 1
+    parse_elapsed = time.perf_counter() - started
+
+    ingestion = _pipeline()
+    started = time.perf_counter()
+    with open(path, newline="") as f:
+        for record in csv.DictReader(f):
+            ingestion.ingest(record["account_id"], float(record["amount"]), record["direction"],
+                             datetime.datetime.fromisoformat(record["timestamp"]), record["counterparty_id"])
+    elapsed = time.perf_counter() - started
+    return {"reader_rows_per_sec": round(rows / parse_elapsed), "pipeline_rows_per_sec": round(rows / elapsed)}
+
+def run(rows: int = 500_000, accounts: int = 50_000, formats=FORMATS, chunk_size: int = 50_000) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="fraud-ingest-") as directory:
+        paths = write_files(directory, rows, accounts, formats)
+        for name, path in paths.items():
+            report = _pipeline().ingest_many(read_payments(path, chunk_size=chunk_size))
+            results[name] = {
+                "file_mb": round(os.path.getsize(path) / 2**20, 1),
+                "reader": read_only(path, chunk_size),
+                "pipeline": {key: report[key] for key in ("rows", "rejected", "rows_per_sec", "max_rss_mb")},
+            }
+        if "csv" in paths:
+            baseline = row_at_a_time(paths["csv"])
+            baseline["reader_speedup"] = round(results["csv"]["reader"]["rows_per_sec"] / baseline["reader_rows_per_sec"], 2)
+            baseline["pipeline_speedup"] = round(results["csv"]["pipeline"]["rows_per_sec"]
+                                                 / baseline["pipeline_rows_per_sec"], 2)
+            results["csv_row_at_a_time"] = baseline
+    return {"benchmark": "fraud_ingest", "rows": rows, "accounts": accounts, "chunk_size": chunk_size,
+            "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--accounts", type=int, default=50_000)
+    parser.add_argument("--formats", default=",".join(FORMATS), help="comma-separated subset of " + ",".join(FORMATS))
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args(argv)
+    formats = [name.strip() for name in args.formats.split(",") if name.strip()]
+    print(json.dumps(run(args.rows, args.accounts, formats, args.chunk_size), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Scaling benchmark for fraud_detection's ShardedRunner: payments/sec with 1..N worker
+processes against the single-process EventBus pipeline.
+
+  python -m benchmarks.fraud_scaling --payments 200000 --workers 1,2,4,8
+  python -m benchmarks.fraud_scaling --llm --latency-ms 20   # ambiguous ratios go to a mock Ollama
+
+Without --llm the detector's LLM band is empty, so the numbers are pure window and
+rule CPU; with it, workers also overlap their model calls.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "fraud_detection"))
+
+from events import EventBus, PaymentObserved
+from sharded import ShardedRunner, build_pipeline
+
+from benchmarks.mock_ollama import MockOllamaServer
+
+def synthetic_payments(n: int, accounts: int, seed: int = 11):
+    """An inbound credit per account, then mostly outbound debits spread over all accounts."""
+    rng = random.Random(seed)
+    start = datetime.datetime(2025, 1, 1)
+    payments = []
+    for i in range(n):
+        account = f"ACC{rng.randrange(accounts):07d}" if i >= accounts else f"ACC{i:07d}"
+        direction = "IN" if i < accounts or rng.random() < 0.3 else "OUT"
+        amount = 1000.0 if i < accounts else round(rng.uniform(20.0, 400.0), 2)
+        payments.append((account, amount, direction, start + datetime.timedelta(milliseconds=10 * i)))
+    return payments
+
+def run_single(payments, options) -> dict:
+    bus = EventBus()
+    build_pipeline(bus, options)
+    started = time.perf_counter()
+    for account, amount, direction, timestamp in payments:
+        bus.publish(PaymentObserved(timestamp=timestamp, account_id=account, amount=amount, direction=direction))
+    elapsed = time.perf_counter() - started
+    return {"mode": "single_process", "elapsed_s": round(elapsed, 3),
+            "payments_per_sec": round(len(payments) / elapsed)}
+
+def run_sharded(payments, workers: int, batch_size: int, options) -> dict:
+    started = time.perf_counter()
+    runner = ShardedRunner(workers=workers, batch_size=batch_size, options=options)
+    startup = time.perf_counter() - started
+    started = time.perf_counter()
+    for account, amount, direction, timestamp in payments:
+        runner.ingest(account, amount, direction, timestamp)
+    runner.join()
+    elapsed = time.perf_counter() - started
+    stats = runner.close()
+    return {"mode": "sharded", "workers": workers, "startup_s": round(startup, 3), "elapsed_s": round(elapsed, 3),
+            "payments_per_sec": round(len(payments) / elapsed), "alerts": stats["alerts"],
+            "batches": stats["batches"], "errors": stats.get("errors", 0)}
+
+def run(payments: int = 200_000, accounts: int = 20_000, workers=(1, 2, 4), batch_size: int = 1000,
+        llm: bool = False, latency_ms: float = 20.0, rules: bool = False) -> dict:
+    data = synthetic_payments(payments, accounts)
+    server = MockOllamaServer(latency_ms=latency_ms).start() if llm else None
+    try:
+        options = {"rules": rules}
+        if server is not None:
+            options["base_url"] = server.url
+        else:
+            # Empty LLM band: every window is decided by the local gate
+            options["llm_band"] = (0.8, 0.8)
+        results = [run_single(data, options)]
+        for count in workers:
+            results.append(run_sharded(data, count, batch_size, options))
+    finally:
+        if server is not None:
+            server.stop()
+    baseline = results[0]["payments_per_sec"]
+    for result in results[1:]:
+        result["speedup"] = round(result["payments_per_sec"] / baseline, 2)
+    return {"benchmark": "fraud_scaling", "payments": payments, "accounts": accounts, "batch_size": batch_size,
+            "llm": llm, "rules": rules, "cpus": os.cpu_count(), "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--payments", type=int, default=200_000)
+    parser.add_argument("--accounts", type=int, default=20_000)
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--rules", action="store_true", help="also run the RuleEngineAgent in each worker")
+    parser.add_argument("--llm", action="store_true", help="send ambiguous windows to a local mock Ollama")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+    workers = [int(count) for count in args.workers.split(",") if count.strip()]
+    print(json.dumps(run(args.payments, args.accounts, workers, args.batch_size, args.llm, args.latency_ms,
+                         args.rules), indent=2))
+
+if __name__ == "__main__":
+    main()
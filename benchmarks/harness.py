@@ -0,0 +1,64 @@
+"""Load driver and latency summary shared by the pipeline benchmarks."""
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+from llm_runtime import metrics
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+def summarize(latencies: List[float], elapsed: float, errors: int = 0, **extra: Any) -> Dict[str, Any]:
+    """Requests/sec and latency percentiles (milliseconds) for one benchmark run."""
+    ordered = sorted(latencies)
+    completed = len(ordered)
+    summary = {
+        "requests": completed + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "requests_per_sec": round(completed / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p95": round(percentile(ordered, 95) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+            "mean": round(sum(ordered) / completed * 1000, 3) if completed else 0.0,
+            "max": round(ordered[-1] * 1000, 3) if completed else 0.0,
+        },
+    }
+    summary.update(extra)
+    return summary
+
+def drive(call: Callable[[Any], Any], items: Iterable[Any], concurrency: int = 1) -> Dict[str, Any]:
+    """Runs call(item) for every item with up to `concurrency` in flight and summarizes the latencies."""
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(item):
+        started = time.perf_counter()
+        call(item)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for item in items:
+            try:
+                latencies.append(timed(item))
+            except Exception:
+                errors += 1
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(timed, item) for item in items]
+            for future in futures:
+                try:
+                    latencies.append(future.result())
+                except Exception:
+                    errors += 1
+    summary = summarize(latencies, time.perf_counter() - started, errors, concurrency=concurrency)
+    if metrics.ENABLED:
+        summary["metrics"] = metrics.snapshot()
+    return summary
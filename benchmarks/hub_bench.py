@@ -0,0 +1,65 @@
+"""Hub-and-spoke benchmark: full Orchestrator requests against FraudSpoke and AMLSpoke."""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "hub_and_spoke_framework"))
+
+from common.models import SpokeCapability, Transaction
+from hub.batching import MicroBatcher
+from hub.observability import AuditStore
+from hub.orchestrator import Orchestrator
+from hub.registry import AgentRegistry
+from spokes.implementations import AMLSpoke, FraudSpoke
+
+from benchmarks.harness import drive
+
+def run(base_url: str, requests: int = 200, concurrency: int = 16, batch: bool = False,
+        replicas: int = 1, stream: bool = False) -> dict:
+    registry = AgentRegistry()
+    for replica in range(replicas):
+        endpoint = f"{base_url}#{replica}"
+        registry.register_spoke("FraudSentinel", [SpokeCapability.FRAUD], endpoint,
+                                FraudSpoke(name="FraudSentinel", base_url=base_url, stream=stream))
+        registry.register_spoke("AMLGuardian", [SpokeCapability.AML], endpoint,
+                                AMLSpoke(name="AMLGuardian", base_url=base_url, stream=stream))
+
+    with tempfile.TemporaryDirectory() as directory:
+        audit_store = AuditStore(storage_path=os.path.join(directory, "audit.jsonl"))
+        batcher = MicroBatcher() if batch else None
+        orchestrator = Orchestrator(registry, audit_store, max_workers=max(8, concurrency * 2), batcher=batcher)
+
+        def one(i: int):
+            tx = Transaction(transaction_id=f"TX-{i}", amount=1000.0 + i, sender_id=f"CUST-{i % 97}",
+                             receiver_id=f"CUST-{(i * 7) % 97}", metadata={"payment_method": "wire_transfer"})
+            request_id = orchestrator.process_request(tx)
+            spokes = orchestrator.route_spokes([SpokeCapability.FRAUD, SpokeCapability.AML])
+            findings = orchestrator.execute_spokes(request_id, tx, spokes)
+            return orchestrator.aggregate_results(request_id, findings)
+
+        try:
+            result = drive(one, range(requests), concurrency)
+        finally:
+            orchestrator.shutdown()
+            if batcher:
+                batcher.close()
+            audit_store.close()
+    result.update({"pipeline": "hub_and_spoke", "batch": batch, "replicas": replicas, "stream": stream})
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--base-url", required=True)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch", action="store_true", help="route spoke calls through the MicroBatcher")
+    parser.add_argument("--replicas", type=int, default=1)
+    parser.add_argument("--stream", action="store_true", help="score with streamed generation and early stop")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.base_url, args.requests, args.concurrency, args.batch, args.replicas, args.stream)))
+
+if __name__ == "__main__":
+    main()
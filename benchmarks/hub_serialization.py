@@ -0,0 +1,108 @@
+"""
+Serialization microbenchmark for the hub's audit trail: encoding cost and bytes per
+request for the events one Orchestrator request writes (REQUEST_RECEIVED,
+ORCHESTRATION_STARTED, SPOKE_INVOKED and SPOKE_RESPONSE_RECEIVED per spoke,
+REQUEST_COMPLETED).
+
+  python -m benchmarks.hub_serialization --requests 5000 --spokes 4 --repeat 5
+
+"legacy" is the previous layout: model_dump() + json.dumps(default=str) per event,
+with REQUEST_COMPLETED embedding the whole response and every finding again.
+"json" and "orjson" are common.serialization with findings referenced by spoke name.
+Every request uses fresh model instances, so the per-model cache only saves work
+within a request, as it does in the hub.
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "hub_and_spoke_framework"))
+
+from common.models import Finding, OrchestrationResponse, Transaction
+from common.serialization import ENCODERS
+
+RATIONALE = ("Amount is 4.2x the sender's 90-day average and the receiver was first seen two days ago; "
+             "three similar transfers to new payees in the last hour.")
+
+def build_requests(count: int, spokes: int):
+    requests = []
+    for i in range(count):
+        request_id = f"req-{i:08d}"
+        transaction = Transaction(transaction_id=f"TX-{i}", amount=1000.0 + i, sender_id=f"CUST-{i % 97}",
+                                  receiver_id=f"CUST-{(i * 7) % 97}", timestamp=datetime.datetime(2025, 1, 1),
+                                  metadata={"payment_method": "wire_transfer", "channel": "online"})
+        findings = [Finding(spoke_name=f"Spoke{s}", severity="MEDIUM", score=0.4 + s / 20, rationale=RATIONALE,
+                            action_item="Hold for manual review") for s in range(spokes)]
+        response = OrchestrationResponse(request_id=request_id, findings=findings, consensus_score=0.5,
+                                         final_decision="APPROVED", audit_trail_id=request_id)
+        requests.append((request_id, transaction, findings, response))
+    return requests
+
+def _entry(event_type: str, data) -> dict:
+    return {"timestamp": "2025-01-01T00:00:00.000000", "event_type": event_type, "data": data}
+
+def legacy_request(request_id, transaction, findings, response) -> int:
+    dump = lambda model: model.model_dump() if hasattr(model, "model_dump") else model.dict()
+    encode = lambda entry: (json.dumps(entry, default=str) + "\n").encode("utf-8")
+    size = len(encode(_entry("REQUEST_RECEIVED", {"request_id": request_id, "transaction": dump(transaction)})))
+    size += len(encode(_entry("ORCHESTRATION_STARTED", {"request_id": request_id})))
+    for finding in findings:
+        size += len(encode(_entry("SPOKE_INVOKED", {"request_id": request_id, "spoke_name": finding.spoke_name})))
+    for finding in findings:
+        size += len(encode(_entry("SPOKE_RESPONSE_RECEIVED", {"request_id": request_id, "spoke_name": finding.spoke_name,
+                                                              "finding": dump(finding), "elapsed_ms": 12.5})))
+    size += len(encode(_entry("REQUEST_COMPLETED", dump(response))))
+    return size
+
+def layered_request(encode, request_id, transaction, findings, response) -> int:
+    size = len(encode(_entry("REQUEST_RECEIVED", {"request_id": request_id, "transaction": transaction}))) + 1
+    size += len(encode(_entry("ORCHESTRATION_STARTED", {"request_id": request_id}))) + 1
+    for finding in findings:
+        size += len(encode(_entry("SPOKE_INVOKED", {"request_id": request_id, "spoke_name": finding.spoke_name}))) + 1
+    for finding in findings:
+        size += len(encode(_entry("SPOKE_RESPONSE_RECEIVED", {"request_id": request_id, "spoke_name": finding.spoke_name,
+                                                              "finding": finding, "elapsed_ms": 12.5}))) + 1
+    completed = response.model_dump(exclude={"findings"})
+    completed["finding_refs"] = [f.spoke_name for f in findings]
+    completed["findings"] = []
+    size += len(encode(_entry("REQUEST_COMPLETED", completed))) + 1
+    return size
+
+def measure(serialize, requests: int, spokes: int, repeat: int) -> dict:
+    """Best of `repeat` passes, each over freshly built models so no pass starts with a warm cache."""
+    best = None
+    for _ in range(repeat):
+        batch = build_requests(requests, spokes)
+        gc.collect()
+        started = time.perf_counter()
+        total = sum(serialize(*request) for request in batch)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return {"us_per_request": round(best / requests * 1e6, 1), "bytes_per_request": round(total / requests)}
+
+def run(requests: int = 5_000, spokes: int = 4, repeat: int = 5) -> dict:
+    results = {"legacy": measure(legacy_request, requests, spokes, repeat)}
+    for name, encode in ENCODERS.items():
+        results[name] = measure(lambda *request, encode=encode: layered_request(encode, *request),
+                                requests, spokes, repeat)
+    baseline = results["legacy"]["us_per_request"]
+    for name in ENCODERS:
+        results[name]["speedup"] = round(baseline / results[name]["us_per_request"], 2)
+    return {"benchmark": "hub_serialization", "requests": requests, "spokes": spokes, "repeat": repeat,
+            "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--spokes", type=int, default=4, help="findings per request")
+    parser.add_argument("--repeat", type=int, default=5, help="passes per variant; the fastest is reported")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.requests, args.spokes, args.repeat), indent=2))
+
+if __name__ == "__main__":
+    main()
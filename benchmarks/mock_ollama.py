@@ -0,0 +1,221 @@
+"""
+Local stand-in for an Ollama server, for benchmarking without a GPU.
+
+Serves /api/generate and /api/chat (streamed NDJSON or a single JSON body) with a
+configurable time-to-first-token, decode speed and canned replies. The default replies
+are shaped for the prompts used in this repository, so every pipeline parses them as
+it would a real model's answer.
+
+Run standalone:  python -m benchmarks.mock_ollama --port 11434 --latency-ms 50 --tokens-per-sec 200
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+def _prompt_text(body: Dict[str, Any]) -> str:
+    if "messages" in body:
+        return "\n".join(str(m.get("content", "")) for m in body.get("messages") or [])
+    return f"{body.get('system') or ''}\n{body.get('prompt') or ''}"
+
+def default_reply(body: Dict[str, Any]) -> str:
+    """Picks a plausible answer for the prompt formats used by the pipelines in this repository."""
+    text = _prompt_text(body)
+    if "JSON array" in text and "transaction_id" in text:
+        # Hub spokes, batched scoring
+        ids = re.findall(r"transaction_id: (\S+)", text)
+        return json.dumps([
+            {"transaction_id": tx_id, "severity": "LOW", "score": 0.2,
+             "rationale": "Mock batch finding.", "action_item": "None"}
+            for tx_id in ids
+        ])
+    if '"severity"' in text:
+        # Hub spokes, single transaction
+        return json.dumps({"severity": "MEDIUM", "score": 0.55, "rationale": "Mock finding.", "action_item": "Review"})
+    if '"suspicious"' in text:
+        # fraud_detection cash-out detector
+        ratio = re.findall(r"Ratio=([0-9.]+)", text)
+        suspicious = bool(ratio) and float(ratio[-1]) >= 0.8
+        return json.dumps({"suspicious": suspicious, "reason": "Mock decision."})
+    if "'risk_score'" in text:
+        # Consensus panel
+        return json.dumps({"rationale": "Mock rationale.", "risk_score": 70, "recommendation": "SUSPICIOUS"})
+    return ("Mock analysis: the activity is consistent with the customer's stated profile except for the "
+            "flagged transfer, which should be reviewed by an investigator.")
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The stdlib default backlog of 5 drops connection bursts into 1s SYN retries
+    request_queue_size = 512
+
+def _tokens(text: str) -> List[str]:
+    # Roughly four characters per token, like most tokenizers on English text
+    return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+class MockOllamaServer:
+    """
+    Threaded HTTP server answering like Ollama. Each request waits latency_ms
+    (plus up to jitter_ms) before the first token and then produces tokens at
+    tokens_per_sec. `reply` maps the request body to the reply text.
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 50.0,
+                 tokens_per_sec: float = 200.0, jitter_ms: float = 0.0,
+                 reply: Optional[Callable[[Dict[str, Any]], str]] = None):
+        self.latency_ms = latency_ms
+        self.tokens_per_sec = tokens_per_sec
+        self.jitter_ms = jitter_ms
+        self.reply = reply or default_reply
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._server = _Server((host, port), self._handler())
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "MockOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+            # Headers and body are separate writes; with Nagle on, a reused connection
+            # holds the body back until the client's delayed ACK (~40ms)
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") in ("", "/api/version"):
+                    self._send_json({"version": "0.0.0-mock"})
+                elif self.path == "/api/tags":
+                    self._send_json({"models": []})
+                else:
+                    self._send_json({"error": "not found"}, status=404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._send_json({"error": "invalid JSON"}, status=400)
+                    return
+                if self.path not in ("/api/generate", "/api/chat"):
+                    self._send_json({"error": "not found"}, status=404)
+                    return
+                with server._lock:
+                    server.requests += 1
+                server._respond(self, body, chat=self.path == "/api/chat")
+
+            def _send_json(self, obj: Dict[str, Any], status: int = 200):
+                data = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def _respond(self, handler: BaseHTTPRequestHandler, body: Dict[str, Any], chat: bool):
+        model = body.get("model", "mock")
+        if not body.get("prompt") and not body.get("messages"):
+            # Ollama treats an empty request as "load the model"
+            handler._send_json(self._chunk(model, "", chat, done=True, stats={}))
+            return
+
+        started = time.perf_counter()
+        tokens = _tokens(self.reply(body))
+        prompt_tokens = max(1, len(_prompt_text(body)) // 4)
+        time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000.0)
+        prefill_done = time.perf_counter()
+        per_token = 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+        def stats():
+            now = time.perf_counter()
+            return {
+                "total_duration": int((now - started) * 1e9),
+                "load_duration": 0,
+                "prompt_eval_count": prompt_tokens,
+                "prompt_eval_duration": int((prefill_done - started) * 1e9),
+                "eval_count": len(tokens),
+                "eval_duration": int((now - prefill_done) * 1e9),
+            }
+
+        if not body.get("stream", True):
+            time.sleep(per_token * len(tokens))
+            handler._send_json(self._chunk(model, "".join(tokens), chat, done=True, stats=stats()))
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Transfer-Encoding", "chunked")
+        handler.end_headers()
+        try:
+            for token in tokens:
+                self._write_chunk(handler, self._chunk(model, token, chat, done=False))
+                time.sleep(per_token)
+            self._write_chunk(handler, self._chunk(model, "", chat, done=True, stats=stats()))
+            handler.wfile.write(b"0\r\n\r\n")
+            handler.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # Client stopped reading early, as a real caller does after an early stop
+            handler.close_connection = True
+
+    @staticmethod
+    def _chunk(model: str, text: str, chat: bool, done: bool, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        chunk: Dict[str, Any] = {"model": model, "created_at": datetime.now(timezone.utc).isoformat(), "done": done}
+        if chat:
+            chunk["message"] = {"role": "assistant", "content": text}
+        else:
+            chunk["response"] = text
+        if done:
+            chunk["done_reason"] = "stop"
+            chunk.update(stats or {})
+        return chunk
+
+    @staticmethod
+    def _write_chunk(handler: BaseHTTPRequestHandler, obj: Dict[str, Any]):
+        data = json.dumps(obj).encode("utf-8") + b"\n"
+        handler.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        handler.wfile.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock Ollama server for offline benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    args = parser.parse_args()
+    server = MockOllamaServer(args.host, args.port, args.latency_ms, args.tokens_per_sec, args.jitter_ms)
+    print(f"Mock Ollama listening on {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Runs the pipeline benchmarks against a local mock Ollama server and writes one JSON
+document with requests/sec and p50/p95/p99 latency per pipeline.
+
+  python -m benchmarks.run --output bench.json
+  python -m benchmarks.run --pipelines hub --latency-ms 200 --tokens-per-sec 40 --concurrency 32
+
+Each pipeline runs in its own interpreter: the three projects use overlapping
+top-level module names (agents, main) and cannot share one sys.path.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from benchmarks.mock_ollama import MockOllamaServer
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+PIPELINES = {
+    "hub": "benchmarks.hub_bench",
+    "fincrime": "benchmarks.fincrime_bench",
+    "fraud": "benchmarks.fraud_bench",
+}
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_pipeline(name: str, base_url: str, extra_args: List[str], collect_metrics: bool = False) -> Dict[str, Any]:
+    env = dict(os.environ)
+    if collect_metrics:
+        env["LLM_METRICS"] = "1"
+    command = [sys.executable, "-m", PIPELINES[name], "--base-url", base_url] + extra_args
+    proc = subprocess.run(command, cwd=ROOT, capture_output=True, text=True, env=env)
+    lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+    if proc.returncode != 0 or not lines:
+        return {"pipeline": name, "error": (proc.stderr or proc.stdout).strip()[-2000:]}
+    # Pipelines print progress to stdout; the result is the last JSON line
+    return json.loads(lines[-1])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the hub, fincrime and fraud pipelines")
+    parser.add_argument("--pipelines", default="hub,fincrime,fraud", help="comma-separated subset of " + ",".join(PIPELINES))
+    parser.add_argument("--requests", type=int, help="requests per pipeline (default: each pipeline's own)")
+    parser.add_argument("--concurrency", type=int, help="requests in flight for hub and fincrime")
+    parser.add_argument("--batch", action="store_true", help="hub: use the MicroBatcher")
+    parser.add_argument("--stream", action="store_true", help="hub: streamed spoke scoring")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="mock time to first token")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=200.0)
+    parser.add_argument("--metrics", action="store_true", help="include an llm_runtime.metrics snapshot per pipeline")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.pipelines.split(",") if name.strip()]
+    unknown = [name for name in names if name not in PIPELINES]
+    if unknown:
+        parser.error(f"unknown pipelines: {', '.join(unknown)}")
+
+    report: Dict[str, Any] = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "mock": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "tokens_per_sec": args.tokens_per_sec},
+        "results": {},
+    }
+    with MockOllamaServer(latency_ms=args.latency_ms, tokens_per_sec=args.tokens_per_sec,
+                          jitter_ms=args.jitter_ms) as server:
+        for name in names:
+            extra: List[str] = []
+            if args.requests:
+                extra += ["--requests", str(args.requests)]
+            if args.concurrency and name != "fraud":
+                extra += ["--concurrency", str(args.concurrency)]
+            if args.batch and name == "hub":
+                extra.append("--batch")
+            if args.stream and name == "hub":
+                extra.append("--stream")
+            print(f"Running {name} benchmark...", file=sys.stderr)
+            report["results"][name] = run_pipeline(name, server.url, extra, args.metrics)
+        report["mock"]["requests_served"] = server.requests
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Memory benchmark for the fraud_detection rolling windows: bytes per active account
+with the compact WindowStore versus the previous layout (a deque of PaymentObserved
+events per account, each with its own datetime, direction string and account id).
+
+  python -m benchmarks.window_memory --accounts 100000 --entries 8
+"""
+import argparse
+import datetime
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from collections import deque
+
+ROOT = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+sys.path.append(os.path.join(ROOT, "fraud_detection"))
+
+from events import PaymentObserved
+from windows import WindowStore
+
+START = datetime.datetime(2025, 1, 1)
+
+def synthetic_payments(accounts: int, entries: int):
+    """`entries` payments per account, all inside one 30-minute window, interleaved across accounts."""
+    for j in range(entries):
+        for i in range(accounts):
+            # A fresh id string per payment, as a parser or deserializer would produce
+            yield PaymentObserved(timestamp=START + datetime.timedelta(seconds=j * 60, microseconds=i),
+                                  account_id="ACC%08d" % i, amount=100.0 + (i % 50) + j,
+                                  direction="IN" if j % 2 == 0 else "OUT")
+
+def _legacy_store(accounts: int, entries: int):
+    store = {}
+    for event in synthetic_payments(accounts, entries):
+        window = store.get(event.account_id)
+        if window is None:
+            window = store[event.account_id] = deque()
+        window.append(event)
+    return store
+
+def _compact_store(accounts: int, entries: int):
+    store = WindowStore()
+    for event in synthetic_payments(accounts, entries):
+        store.observe(event)
+    return store
+
+def measure(build, accounts: int, entries: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    store = build(accounts, entries)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del store
+    return {
+        "bytes": current,
+        "bytes_per_account": round(current / accounts, 1),
+        "bytes_per_entry": round(current / (accounts * entries), 1),
+        "peak_bytes": peak,
+    }
+
+def run(accounts: int = 100_000, entries: int = 8) -> dict:
+    legacy = measure(_legacy_store, accounts, entries)
+    compact = measure(_compact_store, accounts, entries)
+    return {
+        "benchmark": "window_memory",
+        "accounts": accounts,
+        "entries_per_account": entries,
+        "legacy": legacy,
+        "compact": compact,
+        "reduction": round(legacy["bytes"] / compact["bytes"], 2) if compact["bytes"] else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=100_000)
+    parser.add_argument("--entries", type=int, default=8, help="payments per account inside the window")
+    args = parser.parse_args(argv)
+    print(json.dumps(run(args.accounts, args.entries), indent=2))
+
+if __name__ == "__main__":
+    main()
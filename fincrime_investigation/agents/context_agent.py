@@ -3,8 +3,9 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 class ContextAgent:
-    def __init__(self, model_name="gemma3:4b"):
-        self.llm = ChatOllama(model=model_name)
+    def __init__(self, model_name="gemma3:4b", cache=None):
+        # A response cache is only valid for deterministic output, so pin temperature when caching
+        self.llm = ChatOllama(model=model_name, cache=cache, temperature=0) if cache else ChatOllama(model=model_name)
         self.prompt = ChatPromptTemplate.from_messages([
             ("system", "You are a financial crime investigator assistant. Your job is to extract and summarize key context from an alert. "
                        "Identify the Who, What, When, Where, and How Much. "
@@ -13,9 +14,31 @@ class ContextAgent:
         ])
         self.chain = self.prompt | self.llm | StrOutputParser()
 
-    def analyze(self, alert_data, customer_profile):
+        # Split form: the profile is summarized once per customer and reused across alerts,
+        # so each alert only sends its own details plus the short background
+        self.profile_prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are a financial crime investigator assistant. Summarize the customer profile below as background for "
+                       "reviewing alerts: who the customer is, their business, jurisdiction, risk rating and expected activity. "
+                       "Be concise."),
+            ("user", "Customer Profile: {customer_profile}")
+        ])
+        self.profile_chain = self.profile_prompt | self.llm | StrOutputParser()
+        self.alert_prompt = ChatPromptTemplate.from_messages([
+            ("system", "You are a financial crime investigator assistant. Your job is to extract and summarize key context from an alert. "
+                       "Identify the Who, What, When, Where, and How Much. "
+                       "Format the output as a concise summary."),
+            ("user", "Alert Data: {alert_data}\n\nCustomer Background: {profile_summary}")
+        ])
+        self.alert_chain = self.alert_prompt | self.llm | StrOutputParser()
+
+    def analyze(self, alert_data, customer_profile, profile_summary=None):
+        if profile_summary is not None:
+            return self.alert_chain.invoke({"alert_data": alert_data, "profile_summary": profile_summary})
         return self.chain.invoke({"alert_data": alert_data, "customer_profile": customer_profile})
 
+    def summarize_profile(self, customer_profile):
+        return self.profile_chain.invoke({"customer_profile": customer_profile})
+
 if __name__ == "__main__":
     # Test
     agent = ContextAgent()
@@ -1,42 +1,75 @@
-from typing import TypedDict, Annotated
+import time
+from typing import Dict, Iterable, Iterator, Optional, Tuple, TypedDict, Annotated, Union
 from langgraph.graph import StateGraph, END
 from .context_agent import ContextAgent
 from .typology_agent import TypologyAgent
 from .recommendation_agent import RecommendationAgent
+from utils.llm_metrics import LLMMetricsHandler, metrics
+from utils.profile_cache import ProfileSummaryCache
 
 class AgentState(TypedDict):
     alert_data: dict
     customer_profile: dict
+    profile_summary: str
     context_summary: str
     typology_findings: str
     final_recommendation: str
 
 class Supervisor:
-    def __init__(self):
-        self.context_agent = ContextAgent()
-        self.typology_agent = TypologyAgent()
-        self.recommendation_agent = RecommendationAgent()
+    def __init__(self, cache=None, profile_cache=None):
+        # cache: optional LangChain BaseCache (e.g. utils.llm_cache.LangChainResponseCache) shared by all agents
+        # profile_cache: customer profile summaries reused across alerts for the same customer
+        self.profile_cache = profile_cache or ProfileSummaryCache()
+        self.context_agent = ContextAgent(cache=cache)
+        self.typology_agent = TypologyAgent(cache=cache)
+        self.recommendation_agent = RecommendationAgent(cache=cache)
+        self.metrics_handler = LLMMetricsHandler()
         self.workflow = self._build_graph()
 
     def _build_graph(self):
         workflow = StateGraph(AgentState)
 
         # Define nodes
-        workflow.add_node("context_builder", self.run_context_agent)
-        workflow.add_node("typology_checker", self.run_typology_agent)
-        workflow.add_node("decision_maker", self.run_recommendation_agent)
+        workflow.add_node("profile_summarizer", self._timed("profile_summarizer", self.run_profile_summary))
+        workflow.add_node("context_builder", self._timed("context_builder", self.run_context_agent))
+        workflow.add_node("typology_checker", self._timed("typology_checker", self.run_typology_agent))
+        workflow.add_node("decision_maker", self._timed("decision_maker", self.run_recommendation_agent))
 
         # Define edges
-        workflow.set_entry_point("context_builder")
+        workflow.set_entry_point("profile_summarizer")
+        workflow.add_edge("profile_summarizer", "context_builder")
         workflow.add_edge("context_builder", "typology_checker")
         workflow.add_edge("typology_checker", "decision_maker")
         workflow.add_edge("decision_maker", END)
 
         return workflow.compile()
 
+    @staticmethod
+    def _timed(stage, node):
+        def run(state: AgentState):
+            if not metrics.ENABLED:
+                return node(state)
+            started = time.perf_counter()
+            try:
+                return node(state)
+            finally:
+                metrics.STAGE_LATENCY.observe(time.perf_counter() - started, pipeline="fincrime", stage=stage)
+        return run
+
+    def _config(self, **config):
+        # Per-call LLM metrics come from a callback, attached only while metrics are on
+        if metrics.ENABLED:
+            config["callbacks"] = [self.metrics_handler]
+        return config or None
+
+    def run_profile_summary(self, state: AgentState):
+        customer_id = state["alert_data"].get("customer_id") or state["customer_profile"].get("customer_id")
+        summary = self.profile_cache.get_or_build(customer_id, state["customer_profile"], self.context_agent.summarize_profile)
+        return {"profile_summary": summary}
+
     def run_context_agent(self, state: AgentState):
         print("--- Running Context Agent ---")
-        summary = self.context_agent.analyze(state["alert_data"], state["customer_profile"])
+        summary = self.context_agent.analyze(state["alert_data"], state["customer_profile"], state.get("profile_summary"))
         return {"context_summary": summary}
 
     def run_typology_agent(self, state: AgentState):
@@ -51,5 +84,31 @@ class Supervisor:
 
     def investigate(self, alert_data, customer_profile):
         initial_state = {"alert_data": alert_data, "customer_profile": customer_profile}
-        result = self.workflow.invoke(initial_state)
+        result = self.workflow.invoke(initial_state, config=self._config())
         return result
+
+    def investigate_many(self, alerts: Iterable[dict], customer_profiles: Optional[Dict[str, dict]] = None,
+                         max_concurrency: int = 4) -> Iterator[Tuple[dict, Union[dict, Exception]]]:
+        """
+        Runs one workflow per alert, at most max_concurrency at a time, and yields
+        (alert, result) as each investigation finishes, in completion order. A failed
+        investigation yields its exception instead of a result and does not affect the
+        others. An alert may carry its own "customer_profile"; otherwise it is looked up
+        in customer_profiles by customer_id.
+        """
+        customer_profiles = customer_profiles or {}
+        alerts = list(alerts)
+        states = [
+            {
+                "alert_data": alert,
+                "customer_profile": alert.get("customer_profile") or customer_profiles.get(alert.get("customer_id"), {}),
+            }
+            for alert in alerts
+        ]
+        if not states:
+            return
+        results = self.workflow.batch_as_completed(
+            states, config=self._config(max_concurrency=max_concurrency), return_exceptions=True
+        )
+        for index, result in results:
+            yield alerts[index], result
@@ -1,17 +1,92 @@
 import sys
 import os
+import argparse
+import json
+import time
+
+# Entry point: the shared llm_runtime package lives at the repository root
+sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
 from agents.supervisor import Supervisor
+from utils.alert_loader import iter_alerts, load_profiles
 from utils.mock_data import SAMPLE_ALERTS, CUSTOMER_PROFILES
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Financial Crime Investigation System")
+    parser.add_argument("--batch", action="store_true",
+                        help="investigate alerts concurrently (implied by --alerts)")
+    parser.add_argument("--alerts", help="alerts file (.json list or .jsonl, one alert per line)")
+    parser.add_argument("--profiles", help="customer profiles file (.json keyed by customer_id, or a list)")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum investigations in flight")
+    parser.add_argument("--output", help="write one JSON report per line to this file")
+    parser.add_argument("--cache", help="SQLite file for caching LLM responses across runs")
+    return parser.parse_args(argv)
+
+def build_supervisor(cache_path=None):
+    cache = None
+    if cache_path:
+        from utils.llm_cache import LangChainResponseCache
+        cache = LangChainResponseCache(path=cache_path)
+    return Supervisor(cache=cache)
+
+def report_record(alert, result):
+    record = {"alert_id": alert.get("alert_id"), "customer_id": alert.get("customer_id")}
+    if isinstance(result, Exception):
+        record["status"] = "error"
+        record["error"] = f"{type(result).__name__}: {result}"
+    else:
+        record["status"] = "ok"
+        record["context_summary"] = result.get("context_summary")
+        record["typology_findings"] = result.get("typology_findings")
+        record["final_recommendation"] = result.get("final_recommendation")
+    return record
+
+def run_batch(supervisor, args):
+    alerts = list(iter_alerts(args.alerts)) if args.alerts else SAMPLE_ALERTS
+    profiles = load_profiles(args.profiles) if args.profiles else CUSTOMER_PROFILES
+    print(f"Investigating {len(alerts)} alerts with concurrency {args.concurrency}...")
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else None
+    profile_stats = supervisor.profile_cache.snapshot()
+    started = time.perf_counter()
+    done = failed = 0
+    try:
+        for alert, result in supervisor.investigate_many(alerts, profiles, max_concurrency=args.concurrency):
+            record = report_record(alert, result)
+            done += 1
+            if record["status"] == "error":
+                failed += 1
+            # Reports are written as soon as each investigation finishes
+            if out:
+                out.write(json.dumps(record, default=str) + "\n")
+                out.flush()
+                print(f"[{done}/{len(alerts)}] {record['alert_id']}: {record['status']}")
+            else:
+                print(json.dumps(record, indent=2, default=str))
+    finally:
+        if out:
+            out.close()
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"\nCompleted {done} investigations ({failed} failed) in {elapsed:.1f}s ({rate:.2f} alerts/s)")
+    report = supervisor.profile_cache.report(since=profile_stats)
+    print(f"Profile summary cache: {report['hits']} hits, {report['misses']} misses "
+          f"({report['hit_rate']:.0%} hit rate), {report['invalidations']} invalidated, "
+          f"~{report['time_saved']:.1f}s saved")
+
+def main(argv=None):
+    args = parse_args(argv)
     print("Initializing Financial Crime Investigation System...")
     try:
-        supervisor = Supervisor()
+        supervisor = build_supervisor(args.cache)
     except Exception as e:
         print(f"Error initializing supervisor: {e}")
         print("Ensure Ollama is running and the model is available.")
         return
 
+    if args.batch or args.alerts:
+        run_batch(supervisor, args)
+        return
+
     print(f"Found {len(SAMPLE_ALERTS)} alerts to investigate.")
 
     for alert in SAMPLE_ALERTS:
@@ -0,0 +1,38 @@
+# Readers for alert queues and customer profiles exported to disk
+import json
+from typing import Dict, Iterator
+
+def iter_alerts(path: str) -> Iterator[dict]:
+    """
+    Yields alerts from a .jsonl file (one alert per line) or a .json file holding
+    a list of alerts or {"alerts": [...]}.
+    """
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_no}: invalid alert JSON: {e}")
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("alerts", [])
+    for alert in data:
+        yield alert
+
+def load_profiles(path: str) -> Dict[str, dict]:
+    """Customer profiles keyed by customer_id, from a JSON object or a list/.jsonl of profiles."""
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = [json.loads(line) for line in f if line.strip()]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            profiles = json.load(f)
+    if isinstance(profiles, dict):
+        return profiles
+    return {profile["customer_id"]: profile for profile in profiles}
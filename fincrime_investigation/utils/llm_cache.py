@@ -0,0 +1,34 @@
+# LangChain cache adapter over the shared LLM response cache
+import json
+from typing import Any, Optional, Sequence
+from langchain_core.caches import BaseCache
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation
+
+from llm_runtime.cache import ResponseCache, cache_key
+
+class LangChainResponseCache(BaseCache):
+    """
+    Lets ChatOllama-based agents use llm_runtime's ResponseCache (LRU + optional SQLite),
+    so re-running the same alert does not hit the model again. Only attach it to models
+    running with temperature 0.
+    """
+    def __init__(self, cache: Optional[ResponseCache] = None, path: Optional[str] = None, **kwargs):
+        self.cache = cache or ResponseCache(path=path, **kwargs)
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        # llm_string carries the model name and invocation parameters
+        return cache_key({"model": llm_string, "prompt": prompt})
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Generation]]:
+        value = self.cache.get(self._key(prompt, llm_string))
+        if value is None:
+            return None
+        # Only the generated text is kept; the agents parse nothing else
+        return [ChatGeneration(message=AIMessage(content=text)) for text in json.loads(value)]
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Generation]) -> None:
+        self.cache.put(self._key(prompt, llm_string), json.dumps([gen.text for gen in return_val]))
+
+    def clear(self, **kwargs: Any) -> None:
+        self.cache.clear()
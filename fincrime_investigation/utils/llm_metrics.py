@@ -0,0 +1,46 @@
+# LangChain callback that feeds ChatOllama calls into the shared metrics registry
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+from llm_runtime import metrics
+
+class LLMMetricsHandler(BaseCallbackHandler):
+    """
+    Records latency, token counts and decode speed for every chat model call. The
+    caller label is the LangGraph node the call ran in (e.g. "context_builder").
+    """
+    def __init__(self):
+        self._runs: Dict[UUID, Tuple[float, str, str]] = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, invocation_params: Optional[Dict[str, Any]] = None,
+                            **kwargs: Any) -> None:
+        metadata = metadata or {}
+        params = invocation_params or kwargs.get("invocation_params") or {}
+        model = metadata.get("ls_model_name") or params.get("model") or "unknown"
+        caller = metadata.get("langgraph_node") or "unknown"
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), model, caller)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        started, model, caller = run
+        info = {}
+        if response.generations and response.generations[0]:
+            info = response.generations[0][0].generation_info or {}
+        metrics.record_llm_call(model, caller, time.perf_counter() - started, info)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            started, model, caller = run
+            metrics.record_llm_call(model, caller, time.perf_counter() - started, outcome="error")
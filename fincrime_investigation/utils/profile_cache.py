@@ -0,0 +1,72 @@
+# Reusable customer-profile summaries, shared across alerts for the same customer
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+def profile_hash(profile: dict) -> str:
+    encoded = json.dumps(profile, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+class ProfileSummaryCache:
+    """
+    Customer profile summaries keyed by customer id, tagged with a hash of the profile
+    they were generated from. A changed profile invalidates the entry. Concurrent alerts
+    for the same customer wait for one summary instead of each generating their own.
+    """
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # customer_id -> (hash, summary, seconds to build)
+        self._lock = threading.Lock()
+        self._building: Dict[str, threading.Lock] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "time_spent": 0.0, "time_saved": 0.0}
+
+    def get_or_build(self, customer_id: Optional[str], profile: dict, build: Callable[[dict], str]) -> str:
+        digest = profile_hash(profile)
+        key = customer_id or digest
+        with self._lock:
+            key_lock = self._building.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == digest:
+                    self._entries.move_to_end(key)
+                    self.stats["hits"] += 1
+                    self.stats["time_saved"] += entry[2]
+                    return entry[1]
+                if entry is not None:
+                    self.stats["invalidations"] += 1
+                    del self._entries[key]
+                self.stats["misses"] += 1
+
+            started = time.perf_counter()
+            summary = build(profile)
+            elapsed = time.perf_counter() - started
+
+            with self._lock:
+                self.stats["time_spent"] += elapsed
+                self._entries[key] = (digest, summary, elapsed)
+                while len(self._entries) > self.max_entries:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._building.pop(evicted, None)
+            return summary
+
+    def invalidate(self, customer_id: str):
+        with self._lock:
+            if self._entries.pop(customer_id, None) is not None:
+                self.stats["invalidations"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def report(self, since: Optional[dict] = None) -> dict:
+        """Hit rate and time figures, optionally relative to an earlier snapshot()."""
+        current = self.snapshot()
+        if since:
+            current = {name: value - since.get(name, 0) for name, value in current.items()}
+        lookups = current["hits"] + current["misses"]
+        current["hit_rate"] = current["hits"] / lookups if lookups else 0.0
+        return current
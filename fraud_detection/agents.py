@@ -1,156 +1,444 @@
 import datetime
-from collections import defaultdict
-from typing import List, Dict
+import json
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+from llm_runtime import metrics
+from llm_runtime.cache import ResponseCache
+from llm_runtime.transport import OllamaTransport, get_transport
 from events import EventBus, PaymentObserved, BalanceWindowUpdated, FastCashoutAlertRaised
+from rules import DEFAULT_RULES, Rule, RuleEngine
+from windows import AccountWindow, WindowStore
+from snapshots import WindowSnapshotter, restore_store
+from sources import PaymentBatch, read_payments
 
 class IngestionAgent:
     def __init__(self, event_bus: EventBus):
         self.event_bus = event_bus
 
-    def ingest(self, account_id: str, amount: float, direction: str, timestamp: datetime.datetime):
+    def ingest(self, account_id: str, amount: float, direction: str, timestamp: datetime.datetime,
+               counterparty_id: str = ""):
         """Wraps raw transaction data into a PaymentObserved event."""
         event = PaymentObserved(
             timestamp=timestamp,
             account_id=account_id,
             amount=amount,
-            direction=direction
+            direction=direction,
+            counterparty_id=counterparty_id
         )
         self.event_bus.publish(event)
 
+    def ingest_many(self, batches: Iterable[PaymentBatch], report_every: Optional[int] = None,
+                    start_position: int = 0) -> Dict[str, Any]:
+        """
+        Publishes PaymentBatch chunks (see sources.read_payments) in file order and
+        returns a report: rows, rejected rows, elapsed seconds, rows/sec and the peak
+        resident memory of the process. With `report_every`, prints progress every N rows.
+
+        `start_position` skips that many leading payments, e.g. the position returned by
+        RollingWindowAgent.restore(), whose windows already hold them.
+
+        The bus may also be a ShardedRunner, which takes the same publish() calls; its
+        workers restore their own snapshots and skip per shard, so leave start_position at 0.
+        """
+        publish = self.event_bus.publish
+        rows = rejected = chunks = 0
+        skip = start_position
+        next_report = report_every
+        started = time.perf_counter()
+        for batch in batches:
+            rejected += batch.rejected
+            columns = (batch.account_ids, batch.timestamps, batch.amounts, batch.directions, batch.counterparty_ids)
+            if skip:
+                skipped = min(skip, len(batch))
+                skip -= skipped
+                if skipped == len(batch):
+                    continue
+                columns = tuple(column[skipped:] for column in columns)
+            for account_id, timestamp, amount, direction, counterparty_id in zip(*columns):
+                publish(PaymentObserved(timestamp=timestamp, account_id=account_id, amount=amount,
+                                        direction=direction, counterparty_id=counterparty_id))
+            rows += len(columns[0])
+            chunks += 1
+            if next_report is not None and rows >= next_report:
+                elapsed = time.perf_counter() - started
+                print(f"Ingested {rows:,} payments ({rows / elapsed:,.0f} rows/s, {_max_rss_mb():.0f} MB max RSS)")
+                next_report = (rows // report_every + 1) * report_every
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": rows,
+            "skipped": start_position - skip,
+            "rejected": rejected,
+            "chunks": chunks,
+            "elapsed_s": round(elapsed, 3),
+            "rows_per_sec": round(rows / elapsed) if elapsed > 0 else None,
+            "max_rss_mb": round(_max_rss_mb(), 1),
+        }
+
+    def ingest_file(self, path: str, report_every: Optional[int] = None, start_position: int = 0,
+                    **reader_options) -> Dict[str, Any]:
+        """Streams a CSV, NDJSON or Parquet extract through ingest_many; see sources.read_payments."""
+        report = self.ingest_many(read_payments(path, **reader_options), report_every, start_position)
+        report["path"] = path
+        return report
+
+def _max_rss_mb() -> float:
+    # Peak resident set size of this process; ru_maxrss is in KiB on Linux and bytes on macOS
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
 class RollingWindowAgent:
-    def __init__(self, event_bus: EventBus):
+    def __init__(self, event_bus: EventBus, window: datetime.timedelta = datetime.timedelta(minutes=30),
+                 snapshot_dir: Optional[str] = None, snapshot_every: Optional[int] = 100_000,
+                 snapshot_interval: Optional[float] = 60.0, evict_every: Optional[int] = None,
+                 max_lateness: Optional[datetime.timedelta] = None):
         self.event_bus = event_bus
-        # Stores list of PaymentObserved events per account
-        self.account_transactions: Dict[str, List[PaymentObserved]] = defaultdict(list)
+        # Per-account column arrays (epoch us, amount, direction flag) with running IN/OUT sums.
+        # Payments later than max_lateness (default: the window) are counted and skipped, see WindowStore.
+        self.windows = WindowStore(window, max_lateness)
+        # Compatibility: this used to map account ids to lists of PaymentObserved. It now holds
+        # the AccountWindow column stores; self.windows.payments(account_id) returns the event list.
+        self.account_transactions: Dict[str, AccountWindow] = self.windows.accounts
+        # Optional periodic snapshots of the windows (every N payments or T seconds) for fast restarts
+        self.snapshotter = None
+        if snapshot_dir:
+            self.snapshotter = WindowSnapshotter(self.windows, snapshot_dir, snapshot_every, snapshot_interval)
+        # Accounts with nothing left in their window are dropped every evict_every payments (None = never).
+        # Off by default: the store must only be used from one thread, see ShardedEventBus.build_pipelines
+        self.evict_every = evict_every
+        self._since_eviction = 0
         self.event_bus.subscribe(PaymentObserved, self.on_payment_observed)
 
+    def restore(self) -> int:
+        """
+        Loads the latest snapshot and returns the stream position to resume from;
+        payments before it are already in the windows and must not be replayed
+        (pass it to IngestionAgent.ingest_many / ingest_file as start_position).
+        Call before the first payment is published. Detector state (verdicts and
+        cooldowns) is not part of the snapshot, see restore_store.
+        """
+        if self.snapshotter is None:
+            return 0
+        position = restore_store(self.windows, self.snapshotter.directory)
+        self.snapshotter.mark_restored()
+        return position
+
     def on_payment_observed(self, event: PaymentObserved):
-        account_id = event.account_id
-        
-        # Add new payment
-        self.account_transactions[account_id].append(event)
-        
-        # Sort by timestamp (though likely already sorted if ingested in order, good to be safe)
-        self.account_transactions[account_id].sort(key=lambda x: x.timestamp)
-        
-        # Filter window: Keep only transactions within last 30 minutes of THIS event's timestamp
+        # Add the payment and expire everything older than 30 minutes before THIS event's timestamp.
         # NOTE: Using the event's timestamp as "now" allows for simulation with historical data.
-        current_time = event.timestamp
-        window_start = current_time - datetime.timedelta(minutes=30)
-        
-        # Prune old transactions
-        self.account_transactions[account_id] = [
-            tx for tx in self.account_transactions[account_id] 
-            if tx.timestamp > window_start
-        ]
-        
-        # Calculate stats
-        active_window = self.account_transactions[account_id]
-        in_last_30m = sum(tx.amount for tx in active_window if tx.direction == "IN")
-        out_last_30m = sum(tx.amount for tx in active_window if tx.direction == "OUT")
+        active_window = self.windows.observe(event)
+        if active_window is None:
+            # Too late to place (see WindowStore.max_lateness): no window changed, nothing to publish
+            return
+
+        in_last_30m = active_window.in_total
+        out_last_30m = active_window.out_total
         net_change = in_last_30m - out_last_30m
-        
+
         # Publish update
         update_event = BalanceWindowUpdated(
-            timestamp=current_time,
-            account_id=account_id,
+            timestamp=event.timestamp,
+            account_id=event.account_id,
             in_last_30m=in_last_30m,
             out_last_30m=out_last_30m,
             net_change_last_30m=net_change
         )
         self.event_bus.publish(update_event)
+        # Only after the detector has handled the update, so a snapshot never covers a
+        # payment whose downstream work is lost in a crash
+        if self.snapshotter is not None:
+            self.snapshotter.maybe_snapshot()
+        if self.evict_every is not None:
+            self._since_eviction += 1
+            if self._since_eviction >= self.evict_every:
+                self._since_eviction = 0
+                self.windows.evict_idle(event.timestamp)
+
+class RuleEngineAgent:
+    """
+    Evaluates a rule set (see rules.py) over one shared per-account state and publishes
+    each firing rule's alert. With balance_window set it also publishes
+    BalanceWindowUpdated for that window, so it can replace RollingWindowAgent in front
+    of FastCashoutDetectorAgent instead of keeping a second copy of every payment.
+    DEFAULT_RULES leaves out rules.FAST_CASHOUT_RULE for that reason; add it only when
+    no detector runs, or every cash-out is alerted twice.
+    """
+    def __init__(self, event_bus: EventBus, rules: Optional[Sequence[Rule]] = None,
+                 balance_window: Optional[datetime.timedelta] = None, evict_every: Optional[int] = None):
+        self.event_bus = event_bus
+        self.engine = RuleEngine(DEFAULT_RULES if rules is None else rules,
+                                 [balance_window] if balance_window else ())
+        self.balance_window = balance_window
+        # Accounts idle for longer than the longest window are dropped every evict_every payments
+        # (None = never, the default; as with RollingWindowAgent, only for single-threaded use)
+        self.evict_every = evict_every
+        self._since_eviction = 0
+        self.alert_counts: Dict[str, int] = {rule.name: 0 for rule in self.engine.rules}
+        self.event_bus.subscribe(PaymentObserved, self.on_payment_observed)
+
+    def on_payment_observed(self, event: PaymentObserved):
+        state = self.engine.observe(event)
+        if self.balance_window is not None:
+            in_total, out_total = self.engine.balance(state, self.balance_window)
+            self.event_bus.publish(BalanceWindowUpdated(
+                timestamp=event.timestamp,
+                account_id=event.account_id,
+                in_last_30m=in_total,
+                out_last_30m=out_total,
+                net_change_last_30m=in_total - out_total
+            ))
+        for rule, values in self.engine.evaluate(state):
+            self.alert_counts[rule.name] += 1
+            self.event_bus.publish(rule.make_alert(event.account_id, event.timestamp, values))
+        if self.evict_every is not None:
+            self._since_eviction += 1
+            if self._since_eviction >= self.evict_every:
+                self._since_eviction = 0
+                self.engine.evict_idle(event.timestamp)
+
+@dataclass
+class CashoutGate:
+    """
+    Deterministic pre-filter in front of the LLM.
+
+    Clear-cut windows are decided locally; only ratios inside llm_band
+    (low inclusive, high exclusive) are sent to the model, whose prompt states
+    ratio_threshold as the rule. The band defaults to ratio_threshold +/- 0.1 and
+    must contain the threshold; (t, t) is an empty band that decides everything locally.
+    """
+    ratio_threshold: float = 0.8
+    llm_band: Optional[Tuple[float, float]] = None
+    min_amount: float = 100.0  # windows where both legs are below this are too small to matter
+
+    def __post_init__(self):
+        if self.llm_band is None:
+            self.llm_band = (round(self.ratio_threshold - 0.1, 6), round(self.ratio_threshold + 0.1, 6))
+        low, high = self.llm_band
+        if not (low <= self.ratio_threshold < high or low == high == self.ratio_threshold):
+            raise ValueError(f"llm_band {self.llm_band} must satisfy low <= ratio_threshold "
+                             f"({self.ratio_threshold}) < high")
+
+    def decide(self, in_amount: float, out_amount: float, ratio: float) -> Optional[Tuple[bool, str]]:
+        """Returns (suspicious, reason) for clear-cut cases, or None if the model should decide."""
+        if max(in_amount, out_amount) < self.min_amount:
+            return False, f"Amounts below {self.min_amount:.2f} are too small to assess."
+        low, high = self.llm_band
+        if ratio < low:
+            return False, self.reason(ratio)
+        if ratio >= high:
+            return True, self.reason(ratio)
+        return None
+
+    def reason(self, ratio: float) -> str:
+        if ratio >= self.ratio_threshold:
+            return f"Ratio {ratio:.2f} >= {self.ratio_threshold} indicates money muling."
+        return f"Ratio {ratio:.2f} is below {self.ratio_threshold} threshold."
+
+    def prompt(self, in_amount: float, out_amount: float, ratio: float) -> str:
+        """The model prompt: the threshold rule, worked examples on both sides of it and the window's figures."""
+        examples = "\n        \n".join(
+            f"""        Input: Inbound={inbound}, Outbound={outbound}, Ratio={outbound / inbound:.2f}
+        Output: {{ "suspicious": {str(outbound / inbound >= self.ratio_threshold).lower()}, "reason": "{self.reason(outbound / inbound)}" }}"""
+            for inbound, outbound in ((1000, 900), (1000, 0), (1000, 50), (1000, 200), (1000, 400), (5000, 4500)))
+        return f"""
+        Analyze bank account activity for 'fast cash-out' fraud (high outbound relative to inbound).
+        
+        Rule: SUSPICIOUS only if Ratio >= {self.ratio_threshold}. Otherwise SAFE.
+        
+        Examples:
+{examples}
+
+        Now analyze this:
+        Input: Inbound={in_amount}, Outbound={out_amount}, Ratio={ratio:.2f}
+        Output: (Return only JSON)
+        """
+
+@dataclass
+class AccountDecision:
+    """The detector's memory for one account: its last model verdict and last alert."""
+    in_amount: float = 0.0
+    out_amount: float = 0.0
+    suspicious: Optional[bool] = None
+    reason: str = ""
+    decided_at: Optional[datetime.datetime] = None
+    last_alert_at: Optional[datetime.datetime] = None
 
 class FastCashoutDetectorAgent:
-    def __init__(self, event_bus: EventBus):
+    """
+    Decides each window update in tiers: the CashoutGate for clear-cut ratios, then the
+    account's last model verdict if its IN/OUT totals are still within memo_tolerance
+    (relative) of the figures that verdict was given for, and only then the model.
+
+    An account that raised an alert is in cooldown for alert_cooldown (event time):
+    further suspicious verdicts are counted in suppressed_alerts instead of published,
+    and ambiguous windows are not sent to the model since no alert could come of it.
+    Per-account state is dropped once both its verdict is older than the window and its
+    cooldown is over. Pass memo_tolerance=None or alert_cooldown=None to turn either off.
+    """
+    def __init__(self, event_bus: EventBus, gate: Optional[CashoutGate] = None, model: str = "gemma3:4b",
+                 transport: Optional[OllamaTransport] = None, cache: Optional[ResponseCache] = None,
+                 window: datetime.timedelta = datetime.timedelta(minutes=30), memo_tolerance: Optional[float] = 0.02,
+                 alert_cooldown: Optional[datetime.timedelta] = datetime.timedelta(minutes=30),
+                 evict_every: int = 10_000):
         self.event_bus = event_bus
+        self.gate = gate or CashoutGate()
+        self.model = model
+        # Pooled keep-alive connections shared with every other Ollama caller in the process
+        self.transport = transport or get_transport("http://localhost:11434")
+        # Optional response cache; identical window figures produce identical prompts
+        self.cache = cache
+        self.window = window
+        self.memo_tolerance = memo_tolerance
+        self.alert_cooldown = alert_cooldown
+        self.evict_every = evict_every
+        # Only accounts that reached the model or raised an alert have an entry
+        self.decisions: Dict[str, AccountDecision] = {}
+        self._since_eviction = 0
+        # Events handled per tier; the "llm" share is what drives model capacity.
+        # "memoized" reused the account's last verdict, "cooldown" skipped the model during a cooldown.
+        self.tier_counts: Dict[str, int] = {"no_activity": 0, "local_safe": 0, "local_suspicious": 0,
+                                            "memoized": 0, "cooldown": 0, "llm": 0}
+        self.suppressed_alerts = 0
         self.event_bus.subscribe(BalanceWindowUpdated, self.on_balance_updated)
 
+    def tier_report(self) -> Dict[str, float]:
+        """Counts per tier, the fraction of active windows that reached the LLM and what the account state saved."""
+        report: Dict[str, float] = dict(self.tier_counts)
+        active = sum(self.tier_counts.values()) - self.tier_counts["no_activity"]
+        report["llm_share"] = self.tier_counts["llm"] / active if active else 0.0
+        report["llm_calls_saved"] = self.tier_counts["memoized"] + self.tier_counts["cooldown"]
+        report["suppressed_alerts"] = self.suppressed_alerts
+        return report
+
     def on_balance_updated(self, event: BalanceWindowUpdated):
-        # We will use the LLM to decide if this is suspicious.
-        # We only query if there is some activity to analyze.
+        self._since_eviction += 1
+        if self._since_eviction >= self.evict_every:
+            self.evict_stale(event.timestamp)
+
+        # We only analyze windows with some activity.
         if event.in_last_30m == 0 and event.out_last_30m == 0:
+            self.tier_counts["no_activity"] += 1
             return
 
-        import json
-        import urllib.request
-        import urllib.error
-
-        # Calculate ratio in Python to help the LLM (small models struggle with arithmetic)
+        # Calculate ratio in Python (small models struggle with arithmetic)
         ratio = 0.0
         if event.in_last_30m > 0:
             ratio = event.out_last_30m / event.in_last_30m
 
-        # Construct the prompt
-        prompt = f"""
-        Analyze bank account activity for 'fast cash-out' fraud (high outbound relative to inbound).
-        
-        Rule: SUSPICIOUS only if Ratio >= 0.8. Otherwise SAFE.
-        
-        Examples:
-        Input: Inbound=1000, Outbound=900, Ratio=0.90
-        Output: {{ "suspicious": true, "reason": "Ratio 0.90 >= 0.8 indicates money muling." }}
-        
-        Input: Inbound=1000, Outbound=0, Ratio=0.00
-        Output: {{ "suspicious": false, "reason": "Ratio 0.00 is safe." }}
-        
-        Input: Inbound=1000, Outbound=50, Ratio=0.05
-        Output: {{ "suspicious": false, "reason": "Ratio 0.05 is safe." }}
-        
-        Input: Inbound=1000, Outbound=200, Ratio=0.20
-        Output: {{ "suspicious": false, "reason": "Ratio 0.20 is below 0.8 threshold." }}
-        
-        Input: Inbound=1000, Outbound=400, Ratio=0.40
-        Output: {{ "suspicious": false, "reason": "Ratio 0.40 is below 0.8 threshold." }}
-        
-        Input: Inbound=5000, Outbound=4500, Ratio=0.90
-        Output: {{ "suspicious": true, "reason": "Ratio 0.90 is high." }}
+        # Tier 1: clear-cut cases are decided locally in microseconds
+        verdict = self.gate.decide(event.in_last_30m, event.out_last_30m, ratio)
+        state = self.decisions.get(event.account_id)
+        if verdict is not None:
+            is_suspicious, reason = verdict
+            self.tier_counts["local_suspicious" if is_suspicious else "local_safe"] += 1
+        elif state is not None and self._in_cooldown(state, event.timestamp):
+            # Tier 2: an alert for this account is still fresh, so a verdict could not raise another
+            self.tier_counts["cooldown"] += 1
+            return
+        elif state is not None and self._memo_applies(state, event):
+            # Tier 3: the figures barely moved since the model last looked at this account
+            self.tier_counts["memoized"] += 1
+            is_suspicious = state.suspicious
+        else:
+            # Tier 4: the ambiguous band goes to the model
+            self.tier_counts["llm"] += 1
+            verdict = self._ask_llm(event, ratio)
+            if verdict is None:
+                return
+            is_suspicious, reason = verdict
+            if self.memo_tolerance is not None:
+                if state is None:
+                    state = self.decisions[event.account_id] = AccountDecision()
+                state.in_amount, state.out_amount = event.in_last_30m, event.out_last_30m
+                state.suspicious, state.reason, state.decided_at = is_suspicious, reason, event.timestamp
 
-        Now analyze this:
-        Input: Inbound={event.in_last_30m}, Outbound={event.out_last_30m}, Ratio={ratio:.2f}
-        Output: (Return only JSON)
+        if is_suspicious:
+            if state is not None and self._in_cooldown(state, event.timestamp):
+                self.suppressed_alerts += 1
+                return
+            self._raise_alert(event, ratio)
+            if self.alert_cooldown is not None:
+                if state is None:
+                    state = self.decisions[event.account_id] = AccountDecision()
+                state.last_alert_at = event.timestamp
+
+    def _in_cooldown(self, state: AccountDecision, now: datetime.datetime) -> bool:
+        return (self.alert_cooldown is not None and state.last_alert_at is not None
+                and now - state.last_alert_at < self.alert_cooldown)
+
+    def _memo_applies(self, state: AccountDecision, event: BalanceWindowUpdated) -> bool:
+        if self.memo_tolerance is None or state.decided_at is None or event.timestamp - state.decided_at > self.window:
+            return False
+        tolerance = self.memo_tolerance
+        return (abs(event.in_last_30m - state.in_amount) <= tolerance * state.in_amount
+                and abs(event.out_last_30m - state.out_amount) <= tolerance * state.out_amount)
+
+    def evict_stale(self, watermark: datetime.datetime) -> int:
         """
+        Drops account state that can no longer matter for events at or after the
+        watermark: verdicts older than the window and cooldowns that have run out.
+        Runs every evict_every window updates; returns the number of accounts removed.
+        """
+        self._since_eviction = 0
+        stale = [
+            account_id for account_id, state in self.decisions.items()
+            if (state.decided_at is None or watermark - state.decided_at > self.window)
+            and not self._in_cooldown(state, watermark)
+        ]
+        for account_id in stale:
+            del self.decisions[account_id]
+        return len(stale)
+
+    def _raise_alert(self, event: BalanceWindowUpdated, ratio: float):
+        alert = FastCashoutAlertRaised(
+            timestamp=event.timestamp,
+            account_id=event.account_id,
+            in_last_30m=event.in_last_30m,
+            out_last_30m=event.out_last_30m,
+            ratio=ratio,
+            first_txn_time=event.timestamp - self.window,
+            last_txn_time=event.timestamp
+        )
+        self.event_bus.publish(alert)
+
+    def _ask_llm(self, event: BalanceWindowUpdated, ratio: float) -> Optional[Tuple[bool, str]]:
+        """Asks the model for a verdict; returns None if the call fails."""
+        prompt = self.gate.prompt(event.in_last_30m, event.out_last_30m, ratio)
 
         data = {
-            "model": "gemma3:4b",
+            "model": self.model,
             "prompt": prompt,
             "stream": False,
             "format": "json" 
         }
+        if self.cache:
+            # Only deterministic requests are cached
+            data["options"] = {"temperature": 0}
 
+        # Recorded once per call, after the reply has parsed, so a bad reply is an error rather than ok + error
+        seconds, result, outcome = None, None, "cache_hit"
         try:
-            req = urllib.request.Request(
-                "http://localhost:11434/api/generate",
-                data=json.dumps(data).encode('utf-8'),
-                headers={'Content-Type': 'application/json'}
-            )
-            with urllib.request.urlopen(req) as response:
-                result = json.loads(response.read().decode('utf-8'))
+            key, llm_response_text = self.cache.lookup(data) if self.cache else (None, None)
+            if llm_response_text is None:
+                outcome = "ok"
+                started = time.perf_counter()
+                result = self.transport.post_json("/api/generate", data)
+                seconds = time.perf_counter() - started
                 llm_response_text = result.get("response", "{}")
-                decision = json.loads(llm_response_text)
-                
-                is_suspicious = decision.get("suspicious", False)
-                reason = decision.get("reason", "No reason provided")
-
-                if is_suspicious:
-                    # Capture the ratio for the event payload if possible, or 1.0 if div by zero
-                    ratio = 0.0
-                    if event.in_last_30m > 0:
-                        ratio = event.out_last_30m / event.in_last_30m
-                    
-                    alert = FastCashoutAlertRaised(
-                        timestamp=event.timestamp,
-                        account_id=event.account_id,
-                        in_last_30m=event.in_last_30m,
-                        out_last_30m=event.out_last_30m,
-                        ratio=ratio,
-                        first_txn_time=event.timestamp - datetime.timedelta(minutes=30),
-                        last_txn_time=event.timestamp
-                    )
-                    # We might want to inject the reason into the event, but for now we follow the existing schema
-                    # or print it.
-                    print(f"DEBUG: LLM Reason for {event.account_id}: {reason}")
-                    self.event_bus.publish(alert)
-
+            else:
+                key = None
+            decision = json.loads(llm_response_text)
+            verdict = bool(decision.get("suspicious", False)), decision.get("reason", "No reason provided")
         except Exception as e:
+            metrics.record_llm_call(self.model, "FastCashoutDetector", seconds, result, outcome="error")
             print(f"Error calling LLM: {e}")
+            return None
 
+        metrics.record_llm_call(self.model, "FastCashoutDetector", seconds, result, outcome)
+        # Only replies that parsed are cached; a malformed one is asked again next time
+        if key is not None:
+            self.cache.put(key, llm_response_text)
+        return verdict
@@ -1,6 +1,14 @@
 import datetime
+import pickle
+import tempfile
+import threading
+import time
+import zlib
+from collections import deque
 from dataclasses import dataclass, field
-from typing import Callable, List, Dict, Type
+from typing import Any, Callable, List, Dict, Optional, Type
+
+from llm_runtime import metrics
 
 @dataclass
 class Event:
@@ -15,6 +23,7 @@ class PaymentObserved(Event):
     account_id: str = ""
     amount: float = 0.0
     direction: str = "IN"  # "IN" or "OUT"
+    counterparty_id: str = ""  # the other side of the payment, if known
 
 @dataclass
 class BalanceWindowUpdated(Event):
@@ -39,6 +48,16 @@ class FastCashoutAlertRaised(Event):
     first_txn_time: datetime.datetime = field(default_factory=datetime.datetime.now)
     last_txn_time: datetime.datetime = field(default_factory=datetime.datetime.now)
 
+@dataclass
+class RuleAlertRaised(Event):
+    """
+    Emitted by the RuleEngineAgent when all conditions of a rule hold for an account.
+    `values` holds the window features the rule looked at (e.g. {"out_count_5m": 7}).
+    """
+    account_id: str = ""
+    rule: str = ""
+    values: Dict[str, float] = field(default_factory=dict)
+
 class EventBus:
     """Simple in-memory event bus implementing the Observer pattern."""
     def __init__(self):
@@ -50,8 +69,245 @@ class EventBus:
         self._subscribers[event_type].append(callback)
 
     def publish(self, event: Event):
+        self._dispatch(event)
+
+    def _dispatch(self, event: Event,
+                  subscribers: Optional[Dict[Type[Event], List[Callable[[Event], None]]]] = None):
         # Notify subscribers of this specific event type
+        if subscribers is None:
+            subscribers = self._subscribers
         event_type = type(event)
-        if event_type in self._subscribers:
-            for callback in self._subscribers[event_type]:
+        if event_type in subscribers:
+            if metrics.ENABLED:
+                # Includes the time of events published from inside the subscribers
+                started = time.perf_counter()
+                for callback in subscribers[event_type]:
+                    callback(event)
+                metrics.EVENT_DISPATCH.observe(time.perf_counter() - started, event_type=event_type.__name__)
+                return
+            for callback in subscribers[event_type]:
                 callback(event)
+
+
+BACKPRESSURE_POLICIES = ("block", "drop_oldest", "spill")
+
+def shard_for(account_id: str, shards: int) -> int:
+    """Stable shard index for an account (the same in every process)."""
+    return zlib.crc32(account_id.encode("utf-8")) % shards
+
+class _SpillFile:
+    """FIFO of pickled events in a temporary file, used when a shard queue is full."""
+    def __init__(self):
+        self._file = tempfile.TemporaryFile()
+        self._read_pos = 0
+        self._write_pos = 0
+        self.count = 0
+
+    def push(self, event: Event):
+        self._file.seek(self._write_pos)
+        pickle.dump(event, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._write_pos = self._file.tell()
+        self.count += 1
+
+    def pop(self) -> Event:
+        self._file.seek(self._read_pos)
+        event = pickle.load(self._file)
+        self._read_pos = self._file.tell()
+        self.count -= 1
+        if self.count == 0:
+            # Drained: reuse the file from the start
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_pos = self._write_pos = 0
+        return event
+
+    def close(self):
+        self._file.close()
+
+class _Shard:
+    def __init__(self, max_queue: int):
+        self.queue: deque = deque()
+        self.max_queue = max_queue
+        self.spill: Optional[_SpillFile] = None
+        self.busy = False
+        self.closed = False
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.idle = threading.Condition(self.lock)
+
+    def depth(self) -> int:
+        return len(self.queue) + (self.spill.count if self.spill else 0)
+
+class ShardedEventBus(EventBus):
+    """
+    Event bus that dispatches on worker threads instead of the publisher's stack.
+
+    Events are routed to one of `workers` bounded queues by hashing `account_id`, so
+    all events for an account are handled in order by the same worker while a slow
+    subscriber (e.g. an LLM call) only stalls its own shard. When a queue is full the
+    backpressure policy decides what happens:
+
+      block       - the publisher waits for room (default, lossless)
+      drop_oldest - the oldest queued event on that shard is discarded
+      spill       - events overflow to a temporary file and are replayed in order
+
+    A subscriber publishing to another shard never waits under "block": two workers
+    waiting on each other's full queues would deadlock, so such events spill instead.
+
+    Agents keep per-account state in plain dicts and counters, so each shard needs its
+    own: build them with build_pipelines(pipeline, options), which calls
+    pipeline(bus, options) once per shard (options["shard"] is the index, as with
+    sharded.ShardedRunner) and delivers each shard's events only to the agents built
+    for it. A callback passed to subscribe() directly is called from every shard's
+    thread and must be thread-safe (list.append, for example).
+
+    Call join() to wait for all queued events to be handled and close() to stop the
+    workers; publishing after close() raises RuntimeError.
+    """
+    def __init__(self, workers: int = 4, max_queue: int = 10_000, policy: str = "block"):
+        super().__init__()
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy '{policy}', expected one of {BACKPRESSURE_POLICIES}")
+        self.policy = policy
+        self.dropped = 0
+        self.spilled = 0
+        self.errors = 0
+        # The counters are updated from every shard's thread
+        self._counter_lock = threading.Lock()
+        self._closed = False
+        self._local = threading.local()
+        self._shards = [_Shard(max_queue) for _ in range(workers)]
+        # Per shard: the shared subscribers plus the ones build_pipelines created for it
+        self._shard_subscribers: List[Dict[Type[Event], List[Callable[[Event], None]]]] = [
+            {} for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._run, args=(i,), name=f"eventbus-shard-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def subscribe(self, event_type: Type[Event], callback: Callable[[Event], None]):
+        building = getattr(self._local, "building", None)
+        if building is not None:
+            self._shard_subscribers[building].setdefault(event_type, []).append(callback)
+            return
+        super().subscribe(event_type, callback)
+        for subscribers in self._shard_subscribers:
+            subscribers.setdefault(event_type, []).append(callback)
+
+    def build_pipelines(self, pipeline: Callable[["ShardedEventBus", Dict[str, Any]], Any],
+                        options: Optional[Dict[str, Any]] = None) -> List[Any]:
+        """
+        Builds one set of agents per shard with pipeline(bus, options) and returns what
+        each call returned, in shard order. Call before the first publish.
+        """
+        built = []
+        for index in range(len(self._shards)):
+            self._local.building = index
+            try:
+                built.append(pipeline(self, dict(options or {}, shard=index)))
+            finally:
+                self._local.building = None
+        return built
+
+    def _count(self, name: str):
+        with self._counter_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def publish(self, event: Event):
+        index = shard_for(getattr(event, "account_id", ""), len(self._shards))
+        current = getattr(self._local, "shard", None)
+        if current is None and self._closed:
+            # Subscribers may still publish while close() drains the queues
+            raise RuntimeError("ShardedEventBus is closed")
+        if current == index:
+            # Published by a subscriber already running on this shard (e.g. PaymentObserved ->
+            # BalanceWindowUpdated): dispatch inline, like the synchronous bus, so ordering
+            # holds and a worker never waits on its own full queue.
+            self._dispatch(event, self._shard_subscribers[index])
+            return
+
+        shard = self._shards[index]
+        with shard.lock:
+            if shard.closed:
+                raise RuntimeError("ShardedEventBus is closed")
+            full = len(shard.queue) >= shard.max_queue
+            spill = self.policy == "spill" or (self.policy == "block" and current is not None)
+            if (shard.spill and shard.spill.count) or (full and spill):
+                # Once spilling, keep spilling until the file drains so order is preserved
+                if shard.spill is None:
+                    shard.spill = _SpillFile()
+                shard.spill.push(event)
+                self._count("spilled")
+                return
+            if full:
+                if self.policy == "drop_oldest":
+                    shard.queue.popleft()
+                    self._count("dropped")
+                else:
+                    while len(shard.queue) >= shard.max_queue and not shard.closed:
+                        shard.not_full.wait()
+                    if shard.closed:
+                        raise RuntimeError("ShardedEventBus is closed")
+            shard.queue.append(event)
+            shard.not_empty.notify()
+
+    def queue_depths(self) -> List[int]:
+        """Events waiting per shard, including spilled ones."""
+        return [shard.depth() for shard in self._shards]
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every shard is empty and idle. Returns False on timeout."""
+        for shard in self._shards:
+            with shard.lock:
+                if not shard.idle.wait_for(lambda: not shard.busy and shard.depth() == 0, timeout):
+                    return False
+        return True
+
+    def close(self):
+        """Drains outstanding events, then stops the worker threads."""
+        self._closed = True
+        self.join()
+        for shard in self._shards:
+            with shard.lock:
+                shard.closed = True
+                shard.not_empty.notify_all()
+                shard.not_full.notify_all()
+        for t in self._threads:
+            t.join()
+        for shard in self._shards:
+            if shard.spill:
+                shard.spill.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _run(self, index: int):
+        self._local.shard = index
+        shard = self._shards[index]
+        while True:
+            with shard.lock:
+                while not shard.queue and not shard.closed:
+                    shard.not_empty.wait()
+                if not shard.queue:
+                    return
+                event = shard.queue.popleft()
+                if shard.spill and shard.spill.count:
+                    shard.queue.append(shard.spill.pop())
+                shard.busy = True
+                shard.not_full.notify()
+            try:
+                self._dispatch(event, self._shard_subscribers[index])
+            except Exception as e:
+                self._count("errors")
+                print(f"Error dispatching {type(event).__name__} on shard {index}: {e}")
+            finally:
+                with shard.lock:
+                    shard.busy = False
+                    if shard.depth() == 0:
+                        shard.idle.notify_all()
@@ -0,0 +1,410 @@
+"""
+Multi-window, multi-rule streaming detection.
+
+Rules are declared as data: a name, a list of conditions over windowed features and
+optionally the alert event to publish. Features are named
+"<direction>_<aggregate>_<window>":
+
+  direction  in | out | any
+  aggregate  sum | count | max | distinct (distinct counterparties)
+  window     <N>s | <N>m | <N>h | <N>d
+
+e.g. "out_count_5m", "in_sum_30m", "out_distinct_24h". A rule set as JSON:
+
+  [{"name": "outbound_burst_5m", "when": [{"feature": "out_count_5m", "op": ">=", "value": 5}]},
+   {"name": "fast_cashout_30m", "when": [{"feature": "in_sum_30m", "op": ">=", "value": 100},
+                                         {"feature": "out_sum_30m", "op": ">=", "value": 0.8,
+                                          "relative_to": "in_sum_30m"}]}]
+
+RuleEngine keeps one copy of each account's payments, long enough for the longest
+window, and for every distinct window a head index into it plus running IN/OUT sums
+and counts. Max and distinct-counterparty trackers exist only for the
+(window, direction) pairs some rule reads. A new rule over an existing window
+therefore costs a few comparisons per payment, and a new window one more head
+pointer and its sums, not another copy of the payments.
+"""
+import bisect
+import datetime
+import json
+import operator
+import os
+import re
+import sys
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if __name__ == "__main__":
+    # Run as a script: the shared llm_runtime package lives at the repository root
+    sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+
+from events import Event, PaymentObserved, RuleAlertRaised, FastCashoutAlertRaised
+from windows import DIRECTION_FLAGS, IN, OTHER, OUT, ONE_MICROSECOND, intern_id, to_epoch_us
+
+ANY = -1
+DIRECTION_NAMES = {"in": IN, "out": OUT, "any": ANY}
+WINDOW_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+FEATURE_PATTERN = re.compile(r"^(in|out|any)_(sum|count|max|distinct)_(\d+)([smhd])$")
+OPERATORS = {">=": operator.ge, ">": operator.gt, "<=": operator.le, "<": operator.lt,
+             "==": operator.eq, "!=": operator.ne}
+
+def format_window(window: datetime.timedelta) -> str:
+    seconds = int(window.total_seconds())
+    for unit in ("d", "h", "m"):
+        if seconds % WINDOW_UNITS[unit] == 0:
+            return f"{seconds // WINDOW_UNITS[unit]}{unit}"
+    return f"{seconds}s"
+
+@dataclass(frozen=True)
+class Feature:
+    """One windowed aggregate over an account's payments."""
+    direction: str
+    aggregate: str
+    window: datetime.timedelta
+
+    @property
+    def name(self) -> str:
+        return f"{self.direction}_{self.aggregate}_{format_window(self.window)}"
+
+    @classmethod
+    def parse(cls, name: str) -> "Feature":
+        match = FEATURE_PATTERN.match(name)
+        if not match:
+            raise ValueError(f"Invalid feature '{name}', expected <in|out|any>_<sum|count|max|distinct>_<N><s|m|h|d>")
+        direction, aggregate, amount, unit = match.groups()
+        return cls(direction, aggregate, datetime.timedelta(seconds=int(amount) * WINDOW_UNITS[unit]))
+
+@dataclass
+class Condition:
+    """feature <op> value, or feature <op> value * relative_to when relative_to names a second feature."""
+    feature: str
+    op: str = ">="
+    value: float = 0.0
+    relative_to: Optional[str] = None
+
+@dataclass
+class Rule:
+    """
+    Fires when all conditions hold after a payment. `alert` builds the event to
+    publish from (account_id, timestamp, feature values); RuleAlertRaised by default.
+    """
+    name: str
+    conditions: List[Condition] = field(default_factory=list)
+    alert: Optional[Callable[[str, datetime.datetime, Dict[str, float]], Event]] = None
+
+    def make_alert(self, account_id: str, timestamp: datetime.datetime, values: Dict[str, float]) -> Event:
+        if self.alert is not None:
+            return self.alert(account_id, timestamp, values)
+        return RuleAlertRaised(timestamp=timestamp, account_id=account_id, rule=self.name, values=values)
+
+def rules_from_config(config: Iterable[dict]) -> List[Rule]:
+    """Builds rules from dicts of the form {"name": ..., "when": [{"feature": ..., "op": ..., "value": ...}, ...]}."""
+    return [Rule(name=entry["name"], conditions=[Condition(**condition) for condition in entry["when"]])
+            for entry in config]
+
+def load_rules(path: str) -> List[Rule]:
+    with open(path, "r", encoding="utf-8") as f:
+        return rules_from_config(json.load(f))
+
+def _fast_cashout_alert(account_id: str, timestamp: datetime.datetime, values: Dict[str, float]) -> Event:
+    inbound, outbound = values["in_sum_30m"], values["out_sum_30m"]
+    return FastCashoutAlertRaised(
+        timestamp=timestamp,
+        account_id=account_id,
+        in_last_30m=inbound,
+        out_last_30m=outbound,
+        ratio=outbound / inbound,
+        first_txn_time=timestamp - datetime.timedelta(minutes=30),
+        last_txn_time=timestamp
+    )
+
+# The FastCashoutDetectorAgent rule without its LLM tier: deterministic, same alert event.
+# Not in DEFAULT_RULES: next to the detector it would raise every cash-out alert twice.
+# Add it for pipelines that run without the detector.
+FAST_CASHOUT_RULE = Rule("fast_cashout_30m", [Condition("in_sum_30m", ">=", 100.0),
+                                              Condition("out_sum_30m", ">=", 0.8, relative_to="in_sum_30m")],
+                         alert=_fast_cashout_alert)
+
+DEFAULT_RULES = [
+    Rule("outbound_burst_5m", [Condition("out_count_5m", ">=", 5)]),
+    Rule("fan_out_24h", [Condition("out_distinct_24h", ">=", 10)]),
+    Rule("large_outbound_24h", [Condition("out_max_24h", ">=", 10_000.0)]),
+]
+
+class RuleState:
+    """
+    One account's payments for the longest window, in timestamp order, plus per window:
+    a head index (first entry still inside it) and [in_sum, in_count, out_sum, out_count].
+    `maxes` holds the current maximum per max slot, or None once the maximum has expired
+    and must be recomputed; `distinct` holds counterparty -> occurrences per distinct slot.
+    """
+    __slots__ = ("timestamps", "amounts", "flags", "counterparties", "heads", "totals", "maxes", "distinct")
+
+    def __init__(self, windows: int, max_slots: int, distinct_slots: int):
+        self.timestamps = array("q")
+        self.amounts = array("d")
+        self.flags = array("b")
+        # Only kept when some rule counts distinct counterparties
+        self.counterparties: Optional[List[str]] = [] if distinct_slots else None
+        self.heads = [0] * windows
+        self.totals: list = [0.0, 0, 0.0, 0] * windows
+        self.maxes: List[Optional[float]] = [0.0] * max_slots
+        self.distinct: List[Dict[str, int]] = [{} for _ in range(distinct_slots)]
+
+    def __len__(self) -> int:
+        return len(self.timestamps) - self.heads[-1]
+
+def _matches(slot_direction: int, flag: int) -> bool:
+    return slot_direction == flag or (slot_direction == ANY and flag != OTHER)
+
+class RuleEngine:
+    """
+    Computes every window and aggregate the rules need in one pass per payment and
+    evaluates the rules against them. `windows` adds windows no rule references (e.g.
+    the 30-minute balance window RuleEngineAgent publishes).
+
+    Windows follow WindowStore semantics: a payment expires once it is at or before
+    (timestamp of the payment being processed) - window. A late payment that is older
+    than a window's current start is counted only in the longer windows.
+    """
+    def __init__(self, rules: Sequence[Rule], windows: Iterable[datetime.timedelta] = ()):
+        self.rules = list(rules)
+        names = set()
+        for rule in self.rules:
+            for condition in rule.conditions:
+                if condition.op not in OPERATORS:
+                    raise ValueError(f"Rule '{rule.name}': unknown operator '{condition.op}'")
+                names.add(condition.feature)
+                if condition.relative_to:
+                    names.add(condition.relative_to)
+        features = {name: Feature.parse(name) for name in names}
+
+        self.windows = sorted({feature.window for feature in features.values()} | set(windows))
+        if not self.windows:
+            raise ValueError("RuleEngine needs at least one rule condition or window")
+        self.windows_us = [window // ONE_MICROSECOND for window in self.windows]
+        self._index = {window: k for k, window in enumerate(self.windows)}
+
+        def slots(aggregate: str) -> List[Tuple[int, int]]:
+            return sorted({(self._index[f.window], DIRECTION_NAMES[f.direction])
+                           for f in features.values() if f.aggregate == aggregate})
+        self.max_slots = slots("max")
+        self.distinct_slots = slots("distinct")
+        # Per window: (index, length in us, [(slot, direction), ...] of the max and distinct trackers to update)
+        self._plan = [
+            (k, window_us,
+             [(j, d) for j, (w, d) in enumerate(self.max_slots) if w == k],
+             [(j, d) for j, (w, d) in enumerate(self.distinct_slots) if w == k])
+            for k, window_us in enumerate(self.windows_us)
+        ]
+
+        self._readers = {name: self._reader(feature) for name, feature in features.items()}
+        self._compiled = []
+        for rule in self.rules:
+            checks = [(self._readers[c.feature], OPERATORS[c.op], c.value,
+                       self._readers[c.relative_to] if c.relative_to else None) for c in rule.conditions]
+            used = sorted({c.feature for c in rule.conditions} | {c.relative_to for c in rule.conditions if c.relative_to})
+            self._compiled.append((rule, checks, used))
+
+        self.accounts: Dict[str, RuleState] = {}
+        self.position = 0
+        self.late_events = 0
+
+    def _reader(self, feature: Feature) -> Callable[[RuleState], float]:
+        base = 4 * self._index[feature.window]
+        direction = DIRECTION_NAMES[feature.direction]
+        if feature.aggregate in ("sum", "count"):
+            offset = 0 if feature.aggregate == "sum" else 1
+            if direction == IN:
+                return lambda state: state.totals[base + offset]
+            if direction == OUT:
+                return lambda state: state.totals[base + 2 + offset]
+            return lambda state: state.totals[base + offset] + state.totals[base + 2 + offset]
+        slot = (self._index[feature.window], direction)
+        if feature.aggregate == "max":
+            j = self.max_slots.index(slot)
+            return lambda state: self._max(state, j)
+        j = self.distinct_slots.index(slot)
+        return lambda state: len(state.distinct[j])
+
+    def _max(self, state: RuleState, j: int) -> float:
+        value = state.maxes[j]
+        if value is None:
+            # The maximum left the window: rescan what is still inside it
+            k, direction = self.max_slots[j]
+            flags, amounts = state.flags, state.amounts
+            value = max((amounts[i] for i in range(state.heads[k], len(flags)) if _matches(direction, flags[i])),
+                        default=0.0)
+            state.maxes[j] = value
+        return value
+
+    def observe(self, event: PaymentObserved) -> RuleState:
+        return self.observe_values(event.account_id, to_epoch_us(event.timestamp), event.amount,
+                                   DIRECTION_FLAGS.get(event.direction, OTHER), event.counterparty_id)
+
+    def observe_values(self, account_id: str, timestamp_us: int, amount: float, flag: int,
+                       counterparty: str = "") -> RuleState:
+        """Adds a payment to every window and expires what fell out of each one."""
+        self.position += 1
+        state = self.accounts.get(account_id)
+        if state is None:
+            state = self.accounts[intern_id(account_id)] = RuleState(
+                len(self.windows), len(self.max_slots), len(self.distinct_slots))
+        counterparties = state.counterparties
+        if counterparties is not None:
+            counterparty = intern_id(counterparty)
+
+        timestamps, amounts, flags, heads = state.timestamps, state.amounts, state.flags, state.heads
+        if not timestamps or timestamps[-1] <= timestamp_us:
+            index = len(timestamps)
+            timestamps.append(timestamp_us)
+            amounts.append(amount)
+            flags.append(flag)
+            if counterparties is not None:
+                counterparties.append(counterparty)
+        else:
+            index = bisect.bisect_right(timestamps, timestamp_us, heads[-1])
+            timestamps.insert(index, timestamp_us)
+            amounts.insert(index, amount)
+            flags.insert(index, flag)
+            if counterparties is not None:
+                counterparties.insert(index, counterparty)
+            self.late_events += 1
+
+        totals = state.totals
+        newest = timestamps[-1]
+        for k, window_us, max_slots, distinct_slots in self._plan:
+            base = 4 * k
+            head = heads[k]
+            window_start = newest - window_us
+            if timestamp_us <= window_start:
+                # Late and already outside this window; it sorted in at or before the head
+                heads[k] = head = head + 1
+            elif flag != OTHER:
+                if flag == IN:
+                    totals[base] += amount
+                    totals[base + 1] += 1
+                else:
+                    totals[base + 2] += amount
+                    totals[base + 3] += 1
+                if max_slots or distinct_slots:
+                    self._enter_trackers(state, max_slots, distinct_slots, amount, flag, counterparty)
+
+            # Expire everything at or before newest - window
+            end = len(timestamps)
+            if head < end and timestamps[head] <= window_start:
+                while head < end and timestamps[head] <= window_start:
+                    expired = flags[head]
+                    if expired != OTHER:
+                        offset = base if expired == IN else base + 2
+                        count = totals[offset + 1] - 1
+                        totals[offset + 1] = count
+                        # Reset on empty so float residue from add/subtract never accumulates
+                        totals[offset] = totals[offset] - amounts[head] if count else 0.0
+                        if max_slots or distinct_slots:
+                            self._leave_trackers(state, max_slots, distinct_slots, head, expired)
+                    head += 1
+                heads[k] = head
+
+        # The longest window has the earliest head; compact once its dead prefix is as long as the live part
+        dead = heads[-1]
+        if dead and dead * 2 >= len(timestamps):
+            del timestamps[:dead], amounts[:dead], flags[:dead]
+            if counterparties is not None:
+                del counterparties[:dead]
+            for k in range(len(heads)):
+                heads[k] -= dead
+        return state
+
+    @staticmethod
+    def _enter_trackers(state: RuleState, max_slots, distinct_slots, amount: float, flag: int, counterparty: str):
+        for j, direction in max_slots:
+            value = state.maxes[j]
+            if value is not None and amount > value and _matches(direction, flag):
+                state.maxes[j] = amount
+        if counterparty:
+            for j, direction in distinct_slots:
+                if _matches(direction, flag):
+                    seen = state.distinct[j]
+                    seen[counterparty] = seen.get(counterparty, 0) + 1
+
+    @staticmethod
+    def _leave_trackers(state: RuleState, max_slots, distinct_slots, i: int, flag: int):
+        amount = state.amounts[i]
+        for j, direction in max_slots:
+            value = state.maxes[j]
+            if value is not None and amount >= value and _matches(direction, flag):
+                # The maximum left the window; recomputed on the next read
+                state.maxes[j] = None
+        counterparty = state.counterparties[i] if distinct_slots else ""
+        if counterparty:
+            for j, direction in distinct_slots:
+                if _matches(direction, flag):
+                    seen = state.distinct[j]
+                    remaining = seen[counterparty] - 1
+                    if remaining:
+                        seen[counterparty] = remaining
+                    else:
+                        del seen[counterparty]
+
+    def evaluate(self, state: RuleState) -> List[Tuple[Rule, Dict[str, float]]]:
+        """Rules whose conditions all hold for this state, with the feature values they read."""
+        fired = []
+        for rule, checks, used in self._compiled:
+            for read, op, value, relative in checks:
+                if not op(read(state), value * relative(state) if relative else value):
+                    break
+            else:
+                fired.append((rule, {name: self._readers[name](state) for name in used}))
+        return fired
+
+    def features(self, state: RuleState) -> Dict[str, float]:
+        """Current value of every feature the rules reference."""
+        return {name: read(state) for name, read in self._readers.items()}
+
+    def balance(self, state: RuleState, window: datetime.timedelta) -> Tuple[float, float]:
+        """(inbound sum, outbound sum) of one of the engine's windows."""
+        base = 4 * self._index[window]
+        return state.totals[base], state.totals[base + 2]
+
+    def evict_idle(self, watermark: datetime.datetime) -> int:
+        """Removes accounts with no payment inside the longest window as of watermark."""
+        cutoff = to_epoch_us(watermark) - self.windows_us[-1]
+        idle = [acc for acc, state in self.accounts.items() if not state.timestamps or state.timestamps[-1] <= cutoff]
+        for acc in idle:
+            del self.accounts[acc]
+        return len(idle)
+
+if __name__ == "__main__":
+    from events import EventBus
+    from agents import RuleEngineAgent
+
+    bus = EventBus()
+    # No FastCashoutDetectorAgent here, so the deterministic cash-out rule is added
+    agent = RuleEngineAgent(bus, rules=[FAST_CASHOUT_RULE] + DEFAULT_RULES)
+    bus.subscribe(RuleAlertRaised, lambda alert: print(f"[{alert.rule}] {alert.account_id} {alert.values}"))
+    bus.subscribe(FastCashoutAlertRaised,
+                  lambda alert: print(f"[fast_cashout_30m] {alert.account_id} ratio={alert.ratio:.2f}"))
+
+    start = datetime.datetime(2025, 1, 1, 9, 0)
+    # Mule: salary in, then fanned out to many new payees within minutes
+    bus.publish(PaymentObserved(timestamp=start, account_id="ACC_MULE", amount=5000.0, direction="IN",
+                                counterparty_id="EMPLOYER"))
+    for i in range(12):
+        bus.publish(PaymentObserved(timestamp=start + datetime.timedelta(minutes=2 + i), account_id="ACC_MULE",
+                                    amount=380.0, direction="OUT", counterparty_id=f"PAYEE_{i}"))
+    # Normal customer: a few payments to the same payee spread over the day
+    for hour in range(4):
+        bus.publish(PaymentObserved(timestamp=start + datetime.timedelta(hours=hour), account_id="ACC_NORMAL",
+                                    amount=40.0, direction="OUT", counterparty_id="GROCER"))
+    print("Alerts per rule:", agent.alert_counts)
+
+    # A late payment belongs to a window by its timestamp, not by where it sorts in:
+    # with payments at 0m and 10m, one arriving late at 2m is outside the 5m window
+    engine = RuleEngine([Rule("burst", [Condition("out_count_5m", ">=", 2), Condition("out_count_24h", ">=", 1)])])
+    for minute in (0, 10, 2):
+        state = engine.observe(PaymentObserved(timestamp=start + datetime.timedelta(minutes=minute), account_id="ACC_LATE",
+                                               amount=10.0, direction="OUT", counterparty_id="PAYEE"))
+    late = engine.features(state)
+    assert late == {"out_count_5m": 1, "out_count_24h": 3}, late
+    print("Late payment windows:", late)
@@ -0,0 +1,389 @@
+"""
+Multi-process sharded ingestion for the fraud pipeline.
+
+ShardedRunner partitions accounts across worker processes with shard_for(account_id),
+so every payment of an account is handled, in order, by the same worker. Each worker
+runs its own EventBus with its own RollingWindowAgent and FastCashoutDetectorAgent
+(or whatever `pipeline` builds). Payments travel to the workers in batches over
+pipes; alerts come back after every batch and are merged into one stream, either
+published on a parent EventBus or collected in `runner.alerts`.
+
+  with ShardedRunner(workers=4, event_bus=bus) as runner:
+      for row in rows:
+          runner.ingest(row.account, row.amount, row.direction, row.timestamp)
+  # leaving the block flushes, waits for the workers and stops them
+"""
+import datetime
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from multiprocessing.connection import wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+if __name__ == "__main__":
+    # Run as a script: the shared llm_runtime package lives at the repository root
+    sys.path.append(os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")))
+
+from events import Event, EventBus, PaymentObserved, FastCashoutAlertRaised, RuleAlertRaised, shard_for
+
+ALERT_TYPES = (FastCashoutAlertRaised, RuleAlertRaised)
+
+def build_pipeline(event_bus: EventBus, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Default per-worker pipeline: RollingWindowAgent + FastCashoutDetectorAgent, plus a
+    RuleEngineAgent with DEFAULT_RULES when options["rules"] is true. Options:
+    window_seconds, base_url, model, ratio_threshold, llm_band, min_amount,
+    memo_tolerance, alert_cooldown_seconds, rules, snapshot_dir, snapshot_every,
+    evict_every. With snapshot_dir each worker snapshots its windows to
+    snapshot_dir/shard-N. Also builds the per-shard agents of an events.ShardedEventBus
+    (see ShardedEventBus.build_pipelines).
+    Returns the agents whose stats are reported.
+    """
+    from agents import CashoutGate, FastCashoutDetectorAgent, RollingWindowAgent, RuleEngineAgent
+    from rules import DEFAULT_RULES
+    from llm_runtime.transport import get_transport
+
+    window = datetime.timedelta(seconds=options.get("window_seconds", 30 * 60))
+    llm_band = options.get("llm_band")
+    gate = CashoutGate(ratio_threshold=options.get("ratio_threshold", 0.8),
+                       llm_band=tuple(llm_band) if llm_band is not None else None,
+                       min_amount=options.get("min_amount", 100.0))
+    cooldown = options.get("alert_cooldown_seconds", 30 * 60)
+    snapshot_dir = options.get("snapshot_dir")
+    if snapshot_dir:
+        snapshot_dir = os.path.join(snapshot_dir, f"shard-{options.get('shard', 0)}")
+    agents = {
+        "windows": RollingWindowAgent(event_bus, window=window, snapshot_dir=snapshot_dir,
+                                      snapshot_every=options.get("snapshot_every", 100_000),
+                                      evict_every=options.get("evict_every", 10_000)),
+        "detector": FastCashoutDetectorAgent(
+            event_bus, gate=gate, model=options.get("model", "gemma3:4b"),
+            transport=get_transport(options.get("base_url", "http://localhost:11434")), window=window,
+            memo_tolerance=options.get("memo_tolerance", 0.02),
+            alert_cooldown=None if cooldown is None else datetime.timedelta(seconds=cooldown)),
+    }
+    if options.get("rules"):
+        agents["rules"] = RuleEngineAgent(event_bus, rules=DEFAULT_RULES,
+                                          evict_every=options.get("evict_every", 10_000))
+    return agents
+
+def _pipeline_stats(agents: Dict[str, Any]) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {}
+    if "detector" in agents:
+        stats["detector_tiers"] = dict(agents["detector"].tier_counts)
+        stats["detector_tiers"]["suppressed_alerts"] = agents["detector"].suppressed_alerts
+    if "rules" in agents:
+        stats["rule_alerts"] = dict(agents["rules"].alert_counts)
+    if "windows" in agents:
+        stats["accounts"] = len(agents["windows"].windows.accounts)
+    return stats
+
+def _worker_main(index: int, inbox, outbox, pipeline: Callable, options: Dict[str, Any]):
+    """
+    Worker process: replays each batch through a private EventBus and returns the alerts
+    it raised. A worker whose windows restore from a snapshot skips the payments of its
+    shard that the snapshot already holds.
+    """
+    bus = EventBus()
+    alerts: List[Event] = []
+    for alert_type in ALERT_TYPES:
+        bus.subscribe(alert_type, alerts.append)
+    agents = pipeline(bus, dict(options, shard=index))
+    windows = agents.get("windows")
+    skip = windows.restore() if windows is not None else 0
+    if skip:
+        print(f"Worker {index}: restored windows at payment {skip:,} of its shard")
+    errors = 0
+    while True:
+        batch = inbox.recv()
+        if batch is None:
+            break
+        payments = batch
+        if skip:
+            skipped = min(skip, len(batch))
+            skip -= skipped
+            payments = batch[skipped:]
+        for account_id, timestamp, amount, direction, counterparty_id in payments:
+            try:
+                bus.publish(PaymentObserved(timestamp=timestamp, account_id=account_id, amount=amount,
+                                            direction=direction, counterparty_id=counterparty_id))
+            except Exception as e:
+                errors += 1
+                print(f"Worker {index}: error handling payment for {account_id}: {e}")
+        outbox.send((len(batch), alerts))
+        alerts.clear()
+    if windows is not None and windows.snapshotter is not None:
+        windows.snapshotter.close()
+    stats = _pipeline_stats(agents)
+    stats["errors"] = errors
+    outbox.send((None, stats))
+
+class ShardedRunner:
+    """
+    Fans payments out to `workers` processes by account and merges their alerts.
+
+    Payments are buffered per worker and sent as one pickled batch when a buffer
+    reaches `batch_size`, or by the first ingest (for any account) after its oldest
+    payment has waited `max_delay` seconds; flush() sends everything now, and should
+    be called when the input goes quiet. Pipe writes block when a worker
+    falls behind, which is the backpressure.
+
+    Alerts are merged by a collector thread. With `event_bus` they are published on
+    it (subscribers then run on the collector thread), otherwise appended to
+    self.alerts. Alerts for one account keep their order; across accounts they
+    interleave in completion order.
+
+    `pipeline(event_bus, options)` builds each worker's agents and must be importable
+    by the workers (a module-level function); options["shard"] is the worker's index.
+    With options["snapshot_dir"], a restarted runner resumes from each shard's latest
+    snapshot: feed it the same input from the start, with the same number of workers.
+    The default start method is "spawn", so workers do not inherit the parent's
+    threads or pooled Ollama connections.
+    """
+    def __init__(self, workers: int = 4, batch_size: int = 1000, max_delay: float = 0.05,
+                 pipeline: Callable[[EventBus, Dict[str, Any]], Dict[str, Any]] = build_pipeline,
+                 options: Optional[Dict[str, Any]] = None, event_bus: Optional[EventBus] = None,
+                 start_method: str = "spawn"):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.event_bus = event_bus
+        self.alerts: List[Event] = []
+        self.sent = 0
+        self.processed = 0
+        self.batches = 0
+        self.alert_count = 0
+        self._shard_sent = [0] * workers
+        self._shard_processed = [0] * workers
+        self._dead: set = set()
+        self.worker_stats: List[Optional[Dict[str, Any]]] = [None] * workers
+        self._buffers: List[List[Tuple]] = [[] for _ in range(workers)]
+        self._buffer_started: List[float] = [0.0] * workers
+        # No later than the oldest _buffer_started of a non-empty buffer (None: all empty)
+        self._oldest_started: Optional[float] = None
+        # account_id -> shard; crc32 of every id would cost more than the lookup
+        self._shards: Dict[str, int] = {}
+        self._progress = threading.Condition()
+        self._closed = False
+
+        context = multiprocessing.get_context(start_method)
+        self._inboxes = []
+        self._outboxes = []
+        self._processes = []
+        for index in range(workers):
+            inbox_reader, inbox_writer = context.Pipe(duplex=False)
+            outbox_reader, outbox_writer = context.Pipe(duplex=False)
+            process = context.Process(target=_worker_main, name=f"fraud-shard-{index}", daemon=True,
+                                      args=(index, inbox_reader, outbox_writer, pipeline, options or {}))
+            process.start()
+            # The parent only keeps its own ends, so a dead worker shows up as EOF
+            inbox_reader.close()
+            outbox_writer.close()
+            self._inboxes.append(inbox_writer)
+            self._outboxes.append(outbox_reader)
+            self._processes.append(process)
+        self._collector = threading.Thread(target=self._collect, name="fraud-shard-collector", daemon=True)
+        self._collector.start()
+
+    def publish(self, event: PaymentObserved):
+        self.ingest(event.account_id, event.amount, event.direction, event.timestamp, event.counterparty_id)
+
+    def ingest(self, account_id: str, amount: float, direction: str, timestamp: datetime.datetime,
+               counterparty_id: str = ""):
+        """Same arguments as IngestionAgent.ingest."""
+        shard = self._shards.get(account_id)
+        if shard is None:
+            shard = self._shards[account_id] = shard_for(account_id, self.workers)
+        buffer = self._buffers[shard]
+        now = time.monotonic()
+        if not buffer:
+            self._buffer_started[shard] = now
+            if self._oldest_started is None:
+                self._oldest_started = now
+        buffer.append((account_id, timestamp, amount, direction, counterparty_id))
+        if len(buffer) >= self.batch_size:
+            self._send(shard)
+        # Every shard's deadline, not just this one's: a quiet shard must not wait for its own next payment
+        if self._oldest_started is not None and now - self._oldest_started >= self.max_delay:
+            self._send_stale(now)
+
+    def flush(self):
+        for shard in range(self.workers):
+            if self._buffers[shard]:
+                self._send(shard)
+        self._oldest_started = None
+
+    def _send_stale(self, now: float):
+        oldest = None
+        for shard in range(self.workers):
+            if not self._buffers[shard]:
+                continue
+            if now - self._buffer_started[shard] >= self.max_delay:
+                self._send(shard)
+            elif oldest is None or self._buffer_started[shard] < oldest:
+                oldest = self._buffer_started[shard]
+        self._oldest_started = oldest
+
+    def _send(self, shard: int):
+        batch = self._buffers[shard]
+        self._buffers[shard] = []
+        self.sent += len(batch)
+        self._shard_sent[shard] += len(batch)
+        self.batches += 1
+        if shard in self._dead:
+            return
+        try:
+            self._inboxes[shard].send(batch)
+        except (BrokenPipeError, OSError) as e:
+            print(f"Shard worker {shard} is gone ({e}); its payments are dropped")
+            with self._progress:
+                self._dead.add(shard)
+                self._progress.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Flushes and waits until every payment sent so far has been processed. Returns False on timeout."""
+        self.flush()
+        with self._progress:
+            return self._progress.wait_for(self._drained, timeout)
+
+    def _drained(self) -> bool:
+        # A worker that died will never catch up; its payments are reported as lost in stats()
+        return all(self._shard_processed[i] >= self._shard_sent[i] or i in self._dead for i in range(self.workers))
+
+    def close(self) -> Dict[str, Any]:
+        """Drains the workers, stops them and returns the merged stats."""
+        if not self._closed:
+            self._closed = True
+            self.join()
+            for inbox in self._inboxes:
+                try:
+                    inbox.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            self._collector.join()
+            for process in self._processes:
+                process.join()
+            for inbox in self._inboxes:
+                inbox.close()
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {"workers": self.workers, "sent": self.sent, "processed": self.processed,
+                                  "batches": self.batches, "alerts": self.alert_count}
+        if self._dead:
+            merged["dead_workers"] = sorted(self._dead)
+            merged["lost"] = sum(self._shard_sent[i] - self._shard_processed[i] for i in self._dead)
+        tiers: Dict[str, int] = {}
+        rule_alerts: Dict[str, int] = {}
+        for stats in filter(None, self.worker_stats):
+            for name, count in stats.get("detector_tiers", {}).items():
+                tiers[name] = tiers.get(name, 0) + count
+            for name, count in stats.get("rule_alerts", {}).items():
+                rule_alerts[name] = rule_alerts.get(name, 0) + count
+            merged["errors"] = merged.get("errors", 0) + stats.get("errors", 0)
+        if tiers:
+            merged["detector_tiers"] = tiers
+        if rule_alerts:
+            merged["rule_alerts"] = rule_alerts
+        return merged
+
+    def _collect(self):
+        pending = {conn: index for index, conn in enumerate(self._outboxes)}
+        while pending:
+            for conn in wait(list(pending)):
+                index = pending[conn]
+                try:
+                    count, payload = conn.recv()
+                except EOFError:
+                    print(f"Shard worker {index} exited unexpectedly")
+                    del pending[conn]
+                    with self._progress:
+                        self._dead.add(index)
+                        self._progress.notify_all()
+                    continue
+                if count is None:
+                    # Final message: the worker's stats
+                    self.worker_stats[index] = payload
+                    del pending[conn]
+                    conn.close()
+                    continue
+                self.alert_count += len(payload)
+                for alert in payload:
+                    if self.event_bus is not None:
+                        self.event_bus.publish(alert)
+                    else:
+                        self.alerts.append(alert)
+                with self._progress:
+                    self.processed += count
+                    self._shard_processed[index] += count
+                    self._progress.notify_all()
+        with self._progress:
+            self._progress.notify_all()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def _check_sharded_bus(workers: int = 4, payments: int = 20_000, accounts: int = 400):
+    """
+    The default pipeline on an events.ShardedEventBus, one set of agents per shard with
+    eviction and snapshots on, must raise exactly the alerts of a synchronous EventBus.
+    """
+    import random
+    import shutil
+    import tempfile
+    from events import ShardedEventBus
+
+    rng = random.Random(7)
+    start = datetime.datetime(2025, 1, 1)
+    rows = []
+    for i in range(payments):
+        direction = "IN" if i < accounts or rng.random() < 0.4 else "OUT"
+        rows.append((f"ACC{rng.randrange(accounts):05d}", start + datetime.timedelta(seconds=2 * i),
+                     round(rng.uniform(100.0, 900.0), 2), direction))
+    directory = tempfile.mkdtemp()
+    try:
+        # Empty LLM band: no model calls; evicting and snapshotting often exercises both
+        options = {"llm_band": (0.8, 0.8), "rules": True, "evict_every": 100, "snapshot_every": 1_000}
+
+        def run(bus):
+            alerts = []
+            for alert_type in ALERT_TYPES:
+                bus.subscribe(alert_type, alerts.append)
+            for account_id, timestamp, amount, direction in rows:
+                bus.publish(PaymentObserved(timestamp=timestamp, account_id=account_id, amount=amount,
+                                            direction=direction))
+            if isinstance(bus, ShardedEventBus):
+                bus.join()
+            return sorted((type(a).__name__, a.account_id, a.timestamp) for a in alerts)
+
+        bus = EventBus()
+        agents = build_pipeline(bus, dict(options, snapshot_dir=os.path.join(directory, "sync")))
+        expected = run(bus)
+        agents["windows"].snapshotter.close()
+
+        with ShardedEventBus(workers=workers, max_queue=64) as sharded:
+            shard_agents = sharded.build_pipelines(build_pipeline,
+                                                   dict(options, snapshot_dir=os.path.join(directory, "sharded")))
+            actual = run(sharded)
+            errors = sharded.errors
+        for agents in shard_agents:
+            agents["windows"].snapshotter.close()
+
+        assert errors == 0, f"{errors} events failed on the shards"
+        assert actual == expected, f"sharded bus raised {len(actual)} alerts, synchronous bus {len(expected)}"
+        assert sum(agents["windows"].windows.position for agents in shard_agents) == payments
+        for index in range(workers):
+            assert os.listdir(os.path.join(directory, "sharded", f"shard-{index}")), f"no snapshot for shard {index}"
+        print(f"ShardedEventBus check passed: {payments:,} payments on {workers} shards, {len(actual):,} alerts")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    _check_sharded_bus()
@@ -0,0 +1,183 @@
+import glob
+import json
+import os
+import pickle
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional
+from windows import WindowStore
+
+SNAPSHOT_MAGIC = b"FDWS2\n"
+
+COLUMNS = ("account_ids", "lengths", "timestamps", "amounts", "flags")
+
+def encode_snapshot(state: Dict[str, Any]) -> bytes:
+    """
+    Serializes WindowStore.capture() output: the account ids, live entries per account
+    and the concatenated column arrays (epoch microseconds, amount, direction flag),
+    which pickle as raw bytes.
+
+    Layout: magic line, JSON header line (position, window, checksum, ...), then a
+    zlib-compressed pickle of (account_ids, lengths, timestamps, amounts, flags).
+    """
+    payload = zlib.compress(pickle.dumps(tuple(state[name] for name in COLUMNS), protocol=pickle.HIGHEST_PROTOCOL), 1)
+    header = {
+        "position": state["position"],
+        "window_seconds": state["window_seconds"],
+        "late_events": state.get("late_events", 0),
+        "reordered_entries": state.get("reordered_entries", 0),
+        "rejected_late_events": state.get("rejected_late_events", 0),
+        "accounts": len(state["account_ids"]),
+        "entries": len(state["timestamps"]),
+        "created": time.time(),
+        "crc32": zlib.crc32(payload),
+    }
+    return SNAPSHOT_MAGIC + json.dumps(header).encode("utf-8") + b"\n" + payload
+
+def decode_snapshot(data: bytes) -> Dict[str, Any]:
+    """Inverse of encode_snapshot; raises ValueError for foreign or corrupt files."""
+    if not data.startswith(SNAPSHOT_MAGIC):
+        raise ValueError("not a window snapshot")
+    header_end = data.index(b"\n", len(SNAPSHOT_MAGIC))
+    header = json.loads(data[len(SNAPSHOT_MAGIC):header_end])
+    payload = data[header_end + 1:]
+    if zlib.crc32(payload) != header["crc32"]:
+        raise ValueError("snapshot checksum mismatch")
+    columns = pickle.loads(zlib.decompress(payload))
+    header.update(zip(COLUMNS, columns))
+    return header
+
+def snapshot_path(directory: str, position: int) -> str:
+    return os.path.join(directory, f"windows-{position:015d}.snap")
+
+def write_snapshot(directory: str, data: bytes, position: int) -> str:
+    """Writes to a temporary file, fsyncs it and renames it into place, so readers never see a partial snapshot."""
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(directory, position)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        # Persist the rename itself
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return path
+
+def list_snapshots(directory: str) -> List[str]:
+    """Snapshot files, newest (highest position) first."""
+    return sorted(glob.glob(os.path.join(directory, "windows-*.snap")), reverse=True)
+
+def load_latest_snapshot(directory: str) -> Optional[Dict[str, Any]]:
+    """Decodes the newest readable snapshot, skipping corrupt ones; None if there is none."""
+    for path in list_snapshots(directory):
+        try:
+            with open(path, "rb") as f:
+                state = decode_snapshot(f.read())
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError, zlib.error) as e:
+            print(f"Skipping unreadable snapshot {path}: {e}")
+            continue
+        state["path"] = path
+        return state
+    return None
+
+class WindowSnapshotter:
+    """
+    Periodically snapshots a WindowStore to `directory`.
+
+    maybe_snapshot() is called after every observed payment and is a counter/clock
+    check most of the time. When a snapshot is due, the windows are captured in the
+    calling thread (WindowStore.capture copies the column arrays) and encoded and
+    written by a background thread, so ingestion only pauses for the copy. A snapshot
+    that comes due while the previous one is still being written is skipped.
+    """
+    def __init__(self, store: WindowStore, directory: str, every_events: Optional[int] = 100_000,
+                 every_seconds: Optional[float] = 60.0, keep: int = 2):
+        self.store = store
+        self.directory = directory
+        self.every_events = every_events
+        self.every_seconds = every_seconds
+        self.keep = keep
+        self._last_position = store.position
+        self._last_time = time.monotonic()
+        self._writer: Optional[threading.Thread] = None
+        self.stats = {"written": 0, "skipped_busy": 0, "failed": 0, "last_capture_ms": 0.0,
+                      "last_write_ms": 0.0, "last_bytes": 0, "last_path": None}
+
+    def mark_restored(self):
+        """Resets the schedule after the store was restored, so the restored state is not re-written at once."""
+        self._last_position = self.store.position
+        self._last_time = time.monotonic()
+
+    def maybe_snapshot(self):
+        due = (self.every_events is not None and self.store.position - self._last_position >= self.every_events) or (
+            self.every_seconds is not None and time.monotonic() - self._last_time >= self.every_seconds
+            and self.store.position != self._last_position)
+        if due:
+            self.snapshot()
+
+    def snapshot(self, wait: bool = False) -> bool:
+        """Starts a snapshot now; returns False if the previous write is still running."""
+        if self._writer is not None and self._writer.is_alive():
+            self.stats["skipped_busy"] += 1
+            return False
+        started = time.perf_counter()
+        state = self.store.capture()
+        self.stats["last_capture_ms"] = (time.perf_counter() - started) * 1000
+        self._last_position = state["position"]
+        self._last_time = time.monotonic()
+        self._writer = threading.Thread(target=self._write, args=(state,), name="window-snapshot", daemon=True)
+        self._writer.start()
+        if wait:
+            self._writer.join()
+        return True
+
+    def close(self, final_snapshot: bool = True):
+        """Waits for an in-flight write and optionally takes a last snapshot."""
+        if self._writer is not None:
+            self._writer.join()
+        if final_snapshot and self.store.position != self._last_position:
+            self.snapshot(wait=True)
+
+    def _write(self, state: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            data = encode_snapshot(state)
+            path = write_snapshot(self.directory, data, state["position"])
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"Window snapshot failed: {e}")
+            return
+        self.stats.update(written=self.stats["written"] + 1, last_bytes=len(data), last_path=path,
+                          last_write_ms=(time.perf_counter() - started) * 1000)
+        for old in list_snapshots(self.directory)[self.keep:]:
+            try:
+                os.remove(old)
+            except OSError:
+                pass
+
+def restore_store(store: WindowStore, directory: str) -> int:
+    """
+    Loads the newest snapshot in `directory` into `store` and returns its position:
+    the offset of the first payment that still has to be replayed. Returns 0 (replay
+    everything) when there is no usable snapshot.
+
+    Only the windows are snapshotted. FastCashoutDetectorAgent's per-account verdicts
+    and alert cooldowns start empty after a restore, so the first windows after it may
+    go to the model again and an account alerted just before the snapshot can alert
+    once more within its cooldown.
+    """
+    state = load_latest_snapshot(directory)
+    if state is None:
+        return 0
+    if state["window_seconds"] != store.window.total_seconds():
+        print(f"Ignoring snapshot {state['path']}: window {state['window_seconds']}s != {store.window.total_seconds()}s")
+        return 0
+    store.restore(state)
+    return store.position
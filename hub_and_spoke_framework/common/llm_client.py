@@ -1,14 +1,47 @@
-import requests
 import json
-from typing import List, Dict, Any, Optional
+import time
+from typing import Callable, List, Dict, Any, Optional
+
+from llm_runtime import metrics
+from llm_runtime.cache import ResponseCache
+from llm_runtime.jsonstream import IncrementalJSONParser
+from llm_runtime.transport import OllamaTransport, get_transport
+
+class StreamResult:
+    """Outcome of a streamed JSON generation."""
+    def __init__(self):
+        self.data: Optional[Dict[str, Any]] = None  # first accepted JSON object, if any
+        self.text = ""                               # everything received before stopping
+        self.time_to_first_token: Optional[float] = None
+        self.total_time = 0.0
+        self.chunks = 0
+        self.stopped_early = False                   # generation cancelled once the object closed
+        self.cached = False
+        self.error: Optional[str] = None
 
 class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2"):
+    def __init__(self, base_url: str = "http://localhost:11434", model: str = "llama3.2",
+                 transport: Optional[OllamaTransport] = None, caller: Optional[str] = None):
         self.base_url = base_url
         self.model = model
+        self.caller = caller  # spoke/agent name used to label metrics
+        # Clients for the same host share one pooled, rate-limited transport
+        self.transport = transport or get_transport(base_url)
+
+    def _record(self, started: Optional[float], response: Optional[Dict[str, Any]] = None, outcome: str = "ok"):
+        if metrics.ENABLED:
+            elapsed = time.perf_counter() - started if started is not None else None
+            metrics.record_llm_call(self.model, self.caller, elapsed, response, outcome)
 
-    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
-        url = f"{self.base_url}/api/generate"
+    @staticmethod
+    def _store(cache: Optional[ResponseCache], key: Optional[str], text: str,
+               validate: Optional[Callable[[str], bool]]):
+        # Replies that failed validation are not cached, so the next identical request asks again
+        if key is not None and (validate is None or validate(text)):
+            cache.put(key, text)
+
+    def _generate_payload(self, prompt: str, system_prompt: Optional[str],
+                          options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         payload = {
             "model": self.model,
             "prompt": prompt,
@@ -16,25 +49,148 @@ class OllamaClient:
         }
         if system_prompt:
             payload["system"] = system_prompt
+        if options:
+            payload["options"] = options
+        return payload
 
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json().get("response", "")
-        except Exception as e:
-            return f"Error communicating with Ollama: {str(e)}"
-
-    def chat(self, messages: List[Dict[str, str]]) -> str:
-        url = f"{self.base_url}/api/chat"
+    def _chat_payload(self, messages: List[Dict[str, str]], options: Optional[Dict[str, Any]]) -> Dict[str, Any]:
         payload = {
             "model": self.model,
             "messages": messages,
             "stream": False
         }
+        if options:
+            payload["options"] = options
+        return payload
+
+    def generate(self, prompt: str, system_prompt: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                 cache: Optional[ResponseCache] = None, validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        Single-shot completion. Pass a ResponseCache to reuse answers for identical
+        deterministic requests (options with temperature 0 or a fixed seed), and
+        `validate` to only cache replies the caller can use (e.g. ones that parse).
+        """
+        payload = self._generate_payload(prompt, system_prompt, options)
+        started = time.perf_counter()
+        try:
+            key, cached = cache.lookup(payload) if cache else (None, None)
+            if cached is not None:
+                self._record(None, outcome="cache_hit")
+                return cached
+            result = self.transport.post_json("/api/generate", payload)
+            self._record(started, result)
+            text = result.get("response", "")
+            self._store(cache, key, text, validate)
+            return text
+        except Exception as e:
+            self._record(started, outcome="error")
+            return f"Error communicating with Ollama: {str(e)}"
 
+    def chat(self, messages: List[Dict[str, str]], options: Optional[Dict[str, Any]] = None,
+             cache: Optional[ResponseCache] = None, validate: Optional[Callable[[str], bool]] = None) -> str:
+        payload = self._chat_payload(messages, options)
+        started = time.perf_counter()
         try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json().get("message", {}).get("content", "")
+            key, cached = cache.lookup(payload) if cache else (None, None)
+            if cached is not None:
+                self._record(None, outcome="cache_hit")
+                return cached
+            result = self.transport.post_json("/api/chat", payload)
+            self._record(started, result)
+            text = result.get("message", {}).get("content", "")
+            self._store(cache, key, text, validate)
+            return text
         except Exception as e:
+            self._record(started, outcome="error")
             return f"Error communicating with Ollama: {str(e)}"
+
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None,
+                        options: Optional[Dict[str, Any]] = None, cache: Optional[ResponseCache] = None,
+                        validate: Optional[Callable[[str], bool]] = None) -> str:
+        payload = self._generate_payload(prompt, system_prompt, options)
+        started = time.perf_counter()
+        try:
+            key, cached = cache.lookup(payload) if cache else (None, None)
+            if cached is not None:
+                self._record(None, outcome="cache_hit")
+                return cached
+            result = await self.transport.apost_json("/api/generate", payload)
+            self._record(started, result)
+            text = result.get("response", "")
+            self._store(cache, key, text, validate)
+            return text
+        except Exception as e:
+            self._record(started, outcome="error")
+            return f"Error communicating with Ollama: {str(e)}"
+
+    async def achat(self, messages: List[Dict[str, str]], options: Optional[Dict[str, Any]] = None,
+                    cache: Optional[ResponseCache] = None, validate: Optional[Callable[[str], bool]] = None) -> str:
+        payload = self._chat_payload(messages, options)
+        started = time.perf_counter()
+        try:
+            key, cached = cache.lookup(payload) if cache else (None, None)
+            if cached is not None:
+                self._record(None, outcome="cache_hit")
+                return cached
+            result = await self.transport.apost_json("/api/chat", payload)
+            self._record(started, result)
+            text = result.get("message", {}).get("content", "")
+            self._store(cache, key, text, validate)
+            return text
+        except Exception as e:
+            self._record(started, outcome="error")
+            return f"Error communicating with Ollama: {str(e)}"
+
+    def generate_json_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                             options: Optional[Dict[str, Any]] = None,
+                             accept: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                             cache: Optional[ResponseCache] = None) -> StreamResult:
+        """
+        Streams a completion and returns as soon as a complete JSON object (that passes
+        `accept`) has been parsed, closing the stream so Ollama stops generating. Also
+        records time-to-first-token.
+        """
+        result = StreamResult()
+        payload = self._generate_payload(prompt, system_prompt, options)
+        parser = IncrementalJSONParser(accept)
+        started = time.perf_counter()
+        try:
+            key, cached = cache.lookup(payload) if cache else (None, None)
+            if cached is not None:
+                self._record(None, outcome="cache_hit")
+                result.cached = True
+                result.text = cached
+                result.data = parser.feed(cached)
+                return result
+
+            payload["stream"] = True
+            parts = []
+            final_chunk = None
+            stream = self.transport.stream_json_lines("/api/generate", payload)
+            try:
+                for chunk in stream:
+                    piece = chunk.get("response", "")
+                    if piece and result.time_to_first_token is None:
+                        result.time_to_first_token = time.perf_counter() - started
+                    result.chunks += 1
+                    parts.append(piece)
+                    if chunk.get("done"):
+                        final_chunk = chunk
+                    if parser.feed(piece) is not None:
+                        result.stopped_early = not chunk.get("done", False)
+                        break
+            finally:
+                stream.close()
+            # Token counters only arrive in the final chunk, so early-stopped streams report latency only
+            self._record(started, final_chunk, "early_stop" if result.stopped_early else "ok")
+            result.text = "".join(parts)
+            result.data = parser.result
+            if key is not None and result.data is not None:
+                cache.put(key, json.dumps(result.data))
+        except Exception as e:
+            self._record(started, outcome="error")
+            result.error = f"Error communicating with Ollama: {str(e)}"
+            result.text = result.text or result.error
+        finally:
+            result.total_time = time.perf_counter() - started
+        return result
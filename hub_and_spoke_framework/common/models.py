@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 from typing import List, Optional, Dict, Any
 from enum import Enum
 from datetime import datetime
@@ -23,11 +23,26 @@ class Transaction(BaseModel):
     metadata: Dict[str, Any] = {}
 
 class Finding(BaseModel):
+    # Frozen: a finding is logged in several audit events and its encoding is cached
+    model_config = ConfigDict(frozen=True)
+
     spoke_name: str
     severity: str  # e.g., "LOW", "MEDIUM", "HIGH", "CRITICAL"
     score: float   # 0.0 to 1.0
     rationale: str
     action_item: Optional[str] = None
+    # Set on the placeholder a spoke returns when its LLM call or reply could not be used;
+    # not serialised. The registry counts calls that end in one as failures.
+    _fallback: bool = PrivateAttr(default=False)
+
+    @property
+    def is_fallback(self) -> bool:
+        return self._fallback
+
+    def mark_fallback(self) -> "Finding":
+        """Flags this finding as a placeholder for an unusable LLM reply and returns it."""
+        self._fallback = True
+        return self
 
 class OrchestrationResponse(BaseModel):
     request_id: str
@@ -35,3 +50,4 @@ class OrchestrationResponse(BaseModel):
     consensus_score: float
     final_decision: str
     audit_trail_id: str
+    late_spokes: List[str] = []  # spokes that timed out or failed and were left out of the decision
@@ -0,0 +1,106 @@
+"""
+JSON encoding for common.models and audit payloads.
+
+encode(obj) turns a payload into UTF-8 JSON bytes. Pydantic models inside it are
+encoded by pydantic's own serializer. For frozen models (model_config frozen=True,
+such as Finding) the bytes are also cached per instance, so a Finding that appears in
+several audit events is only serialised the first time; later events splice the
+cached bytes in. Mutable models are encoded on every use, since a cached encoding
+would go stale the moment one is changed. orjson is used when it is installed,
+otherwise the standard json module.
+
+Datetimes are written as ISO-8601 and anything else json cannot represent falls back
+to str(), as json.dumps(default=str) did before.
+"""
+import datetime
+import enum
+import json
+import weakref
+from typing import Any, Callable, Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from pydantic import BaseModel
+
+class _Ref(weakref.ref):
+    __slots__ = ("key",)
+
+def _drop(ref: _Ref):
+    # Called when the model is collected; its id may already belong to a newer model
+    entry = _encoded.get(ref.key)
+    if entry is not None and entry[0] is ref:
+        del _encoded[ref.key]
+
+# id(model) -> (weak reference, encoded bytes). Keyed by id rather than stored on the
+# model so that model_copy() and equality never see it.
+_encoded: Dict[int, Tuple[_Ref, bytes]] = {}
+
+def _frozen(model_class: type) -> bool:
+    # pydantic 1 models have no model_config and are never cached
+    return bool(getattr(model_class, "model_config", {}).get("frozen"))
+
+def _serialize(model: BaseModel) -> bytes:
+    # pydantic 2's Rust serializer returns bytes directly (model_dump_json() wraps it in a
+    # str at three times the cost); pydantic 1 only has .json()
+    serializer = getattr(type(model), "__pydantic_serializer__", None)
+    return serializer.to_json(model) if serializer is not None else model.json().encode("utf-8")
+
+def encode_model(model: BaseModel) -> bytes:
+    """
+    The model as JSON bytes. Frozen models are encoded on first use and cached for the
+    model's lifetime; mutable ones are encoded every time.
+    """
+    if not _frozen(type(model)):
+        return _serialize(model)
+    key = id(model)
+    entry = _encoded.get(key)
+    if entry is not None and entry[0]() is model:
+        return entry[1]
+    data = _serialize(model)
+    ref = _Ref(model, _drop)
+    ref.key = key
+    _encoded[key] = (ref, data)
+    return data
+
+def _orjson_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return orjson.Fragment(encode_model(value))
+    return str(value)
+
+def encode_orjson(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_NON_STR_KEYS)
+
+def encode_json(obj: Any) -> bytes:
+    """
+    Standard-library encoder. json cannot embed raw bytes, so each model is written as
+    a unique placeholder string that is replaced by its cached encoding afterwards.
+    """
+    fragments: List[bytes] = []
+
+    def default(value: Any) -> Any:
+        if isinstance(value, BaseModel):
+            fragments.append(encode_model(value))
+            return f"\x00model{len(fragments) - 1}\x00"
+        if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+            return value.isoformat()
+        if isinstance(value, enum.Enum):
+            return value.value
+        return str(value)
+
+    data = json.dumps(obj, default=default, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    for i, fragment in enumerate(fragments):
+        data = data.replace(b'"\\u0000model%d\\u0000"' % i, fragment, 1)
+    return data
+
+ENCODERS: Dict[str, Callable[[Any], bytes]] = {"json": encode_json}
+if orjson is not None:
+    ENCODERS["orjson"] = encode_orjson
+
+encode = encode_orjson if orjson is not None else encode_json
+
+def decode(data) -> Any:
+    """Parses JSON bytes or text, with orjson when available."""
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -1,18 +1,180 @@
 from abc import ABC, abstractmethod
 from common.models import Transaction, Finding
-from common.llm_client import OllamaClient
-from typing import List
+from common.llm_client import OllamaClient, StreamResult
+from llm_runtime.cache import ResponseCache
+from typing import Any, Dict, List, Optional
+import json
+import threading
+
+BATCH_FINDING_SCHEMA = """[
+    {
+        "transaction_id": "ID of the transaction this finding is for",
+        "severity": "LOW/MEDIUM/HIGH",
+        "score": 0.0 to 1.0,
+        "rationale": "Short explanation",
+        "action_item": "Recommended action"
+    }
+]"""
 
 class BaseSpoke(ABC):
-    def __init__(self, name: str, model_name: str = "llama3.2"):
+    # Set by spokes that support batched scoring (see describe_transaction)
+    system_prompt: Optional[str] = None
+    batch_task: Optional[str] = None
+
+    def __init__(self, name: str, model_name: str = "llama3.2", cache: Optional[ResponseCache] = None,
+                 options: Optional[Dict[str, Any]] = None, stream: bool = False,
+                 base_url: str = "http://localhost:11434"):
         self.name = name
-        self.llm = OllamaClient(model=model_name)
+        # base_url selects the Ollama host, so replicas of a spoke can run on different hosts
+        self.llm = OllamaClient(base_url=base_url, model=model_name, caller=name)
+        # Caching is opt-in and only applies to deterministic sampling, so a cached
+        # spoke defaults to temperature 0.
+        self.cache = cache
+        self.options = options if options is not None else ({"temperature": 0} if cache else None)
+        # Items from batched replies that were missing/malformed and re-scored one by one
+        self.batch_fallbacks = 0
+        self._stats_lock = threading.Lock()
+        # Stream completions and stop as soon as a Finding-shaped object has been parsed
+        self.stream = stream
+        # Spokes are called from several request threads at once, so each keeps its own last stream
+        self._local = threading.local()
+
+    @property
+    def last_stream(self) -> Optional[StreamResult]:
+        """The StreamResult of the calling thread's most recent streamed prompt."""
+        return getattr(self._local, "last_stream", None)
 
     @abstractmethod
     def process_transaction(self, transaction: Transaction) -> Finding:
         """Process a transaction and return a finding."""
         pass
 
+    def _score_prompt(self, prompt: str) -> Finding:
+        """Runs a single-transaction prompt and turns the reply into a Finding."""
+        if self.stream:
+            result = self.llm.generate_json_stream(prompt, system_prompt=self.system_prompt, options=self.options,
+                                                   accept=self._is_finding_shaped, cache=self.cache)
+            self._local.last_stream = result
+            finding = self._finding_from(result.data)
+            if finding is not None:
+                return finding
+            response_text = result.text
+        else:
+            response_text = self.llm.generate(prompt, system_prompt=self.system_prompt, options=self.options,
+                                              cache=self.cache, validate=self._parses)
+
+        try:
+            data = self._extract_json(response_text)
+            return Finding(
+                spoke_name=self.name,
+                severity=data.get("severity", "LOW"),
+                score=data.get("score", 0.0),
+                rationale=data.get("rationale", "No rationale provided"),
+                action_item=data.get("action_item", "None")
+            )
+        except Exception:
+            # Also reached when the client swallowed a transport error into the reply text
+            return Finding(
+                spoke_name=self.name,
+                severity="MEDIUM",
+                score=0.5,
+                rationale=f"Error parsing LLM response: {response_text[:50]}...",
+                action_item="Manual Review"
+            ).mark_fallback()
+
+    @staticmethod
+    def _extract_json(response_text: str) -> Dict[str, Any]:
+        # Naive extraction for demo: the text between the first '{' and the last '}'
+        start = response_text.find('{')
+        end = response_text.rfind('}') + 1
+        return json.loads(response_text[start:end])
+
+    @classmethod
+    def _parses(cls, response_text: str) -> bool:
+        """Whether a single-transaction reply is worth caching: it holds a JSON object."""
+        try:
+            return isinstance(cls._extract_json(response_text), dict)
+        except Exception:
+            return False
+
+    @staticmethod
+    def _is_finding_shaped(data: Dict[str, Any]) -> bool:
+        return "severity" in data and "score" in data
+
+    def describe_transaction(self, transaction: Transaction) -> Optional[str]:
+        """Transaction details for a batched prompt; None means the spoke does not batch."""
+        return None
+
+    def process_batch(self, transactions: List[Transaction]) -> List[Finding]:
+        """
+        Scores several transactions with one prompt that asks for an array of findings
+        keyed by transaction_id. Findings come back in input order; items missing or
+        malformed in the reply are scored individually with process_transaction.
+        """
+        unique = list({tx.transaction_id: tx for tx in transactions}.values())
+        if len(unique) < 2 or self.batch_task is None or self.describe_transaction(unique[0]) is None:
+            return [self.process_transaction(tx) for tx in transactions]
+
+        response_text = self.llm.generate(self._batch_prompt(unique), system_prompt=self.system_prompt,
+                                          options=self.options, cache=self.cache,
+                                          validate=lambda text: bool(self._parse_batch(text)))
+        by_id = self._parse_batch(response_text)
+
+        findings: Dict[str, Finding] = {}
+        for tx in unique:
+            finding = self._finding_from(by_id.get(tx.transaction_id))
+            if finding is None:
+                with self._stats_lock:
+                    self.batch_fallbacks += 1
+                finding = self.process_transaction(tx)
+            findings[tx.transaction_id] = finding
+        return [findings[tx.transaction_id] for tx in transactions]
+
+    def _batch_prompt(self, transactions: List[Transaction]) -> str:
+        items = "\n\n".join(
+            f"transaction_id: {tx.transaction_id}\n{self.describe_transaction(tx)}" for tx in transactions
+        )
+        return (
+            f"{self.batch_task}\n\n{items}\n\n"
+            f"Return one finding per transaction as a JSON array in EXACT format:\n{BATCH_FINDING_SCHEMA}"
+        )
+
+    @staticmethod
+    def _parse_batch(response_text: str) -> Dict[str, Any]:
+        try:
+            start = response_text.find('[')
+            end = response_text.rfind(']') + 1
+            items = json.loads(response_text[start:end])
+        except Exception:
+            return {}
+        if not isinstance(items, list):
+            return {}
+        return {
+            str(item["transaction_id"]): item
+            for item in items
+            if isinstance(item, dict) and "transaction_id" in item
+        }
+
+    def _finding_from(self, data: Any) -> Optional[Finding]:
+        """Builds a Finding from parsed JSON, or None if the object is not Finding-shaped."""
+        if not isinstance(data, dict):
+            return None
+        score = data.get("score")
+        if isinstance(score, bool) or not isinstance(score, (int, float)) or not 0.0 <= score <= 1.0:
+            return None
+        if not isinstance(data.get("severity"), str):
+            return None
+        try:
+            return Finding(
+                spoke_name=self.name,
+                severity=data["severity"],
+                score=score,
+                rationale=data.get("rationale", "No rationale provided"),
+                action_item=data.get("action_item", "None")
+            )
+        except Exception:
+            return None
+
     def get_info(self) -> dict:
         return {
             "name": self.name,
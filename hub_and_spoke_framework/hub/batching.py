@@ -0,0 +1,95 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from common.models import Transaction
+import threading
+import time
+
+class MicroBatcher:
+    """
+    Collects transactions bound for the same spoke and scores them together.
+
+    A batch is flushed when it reaches `max_batch` items or its oldest item has waited
+    `max_wait_ms`, then sent through spoke.process_batch on a worker thread. Each
+    submit() gets its own Future, so results are demultiplexed back to the request
+    that asked for them.
+    """
+    def __init__(self, max_batch: int = 8, max_wait_ms: float = 20.0, max_workers: int = 8):
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches_sent = 0
+        self.items_sent = 0
+        self._pending: Dict[int, Tuple[Any, float, List[Tuple[Transaction, Future]]]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spoke-batch")
+        self._flusher = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._flusher.start()
+
+    def submit(self, spoke: Any, transaction: Transaction) -> Future:
+        future: Future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            key = id(spoke)
+            if key not in self._pending:
+                self._pending[key] = (spoke, time.monotonic(), [])
+            items = self._pending[key][2]
+            items.append((transaction, future))
+            if len(items) >= self.max_batch:
+                self._dispatch(self._pending.pop(key))
+            else:
+                self._cond.notify()
+        return future
+
+    def close(self):
+        """Flushes everything still pending and waits for in-flight batches."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if self._closed:
+                    for batch in list(self._pending.values()):
+                        self._dispatch(batch)
+                    self._pending.clear()
+                    return
+                now = time.monotonic()
+                due = [key for key, (_, started, _) in self._pending.items() if now - started >= self.max_wait]
+                for key in due:
+                    self._dispatch(self._pending.pop(key))
+                if self._pending:
+                    oldest = min(started for _, started, _ in self._pending.values())
+                    self._cond.wait(max(0.0, oldest + self.max_wait - now))
+                else:
+                    self._cond.wait()
+
+    def _dispatch(self, batch: Tuple[Any, float, List[Tuple[Transaction, Future]]]):
+        spoke, _, items = batch
+        self.batches_sent += 1
+        self.items_sent += len(items)
+        self._executor.submit(self._score, spoke, items)
+
+    @staticmethod
+    def _score(spoke: Any, items: List[Tuple[Transaction, Future]]):
+        live = [(tx, future) for tx, future in items if future.set_running_or_notify_cancel()]
+        if not live:
+            return
+        try:
+            findings = spoke.process_batch([tx for tx, _ in live])
+        except Exception as e:
+            for _, future in live:
+                future.set_exception(e)
+            return
+        findings = list(findings or ())
+        for i, (_, future) in enumerate(live):
+            if i < len(findings):
+                future.set_result(findings[i])
+            else:
+                # A short reply must not leave requests waiting until their deadline
+                future.set_exception(RuntimeError(
+                    f"{getattr(spoke, 'name', spoke)}.process_batch returned {len(findings)} findings "
+                    f"for {len(live)} transactions"))
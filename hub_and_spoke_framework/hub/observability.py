@@ -1,26 +1,536 @@
+from collections import deque
 from datetime import datetime
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+import atexit
+import hashlib
 import os
+import threading
+import weakref
+from common.serialization import decode, encode
+
+FSYNC_POLICIES = ("none", "batch", "request")
+
+# (encoded line, event_type, request_id, ISO timestamp) for one audit event
+AuditRecord = Tuple[bytes, str, Optional[str], str]
+
+def _reverse_lines(path: str, block_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Yields the lines of a file from last to first, reading fixed-size blocks from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        remainder = b""
+        while position > 0:
+            read = min(block_size, position)
+            position -= read
+            f.seek(position)
+            chunk = f.read(read) + remainder
+            lines = chunk.split(b"\n")
+            # The first piece may be the tail of a line that starts in an earlier block
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line
+        if remainder:
+            yield remainder
+
+def expand_response(events: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """
+    Rebuilds a request's full OrchestrationResponse payload from its audit trail.
+
+    REQUEST_COMPLETED lists the spokes whose findings were already logged in this
+    request's SPOKE_RESPONSE_RECEIVED events (finding_refs) instead of embedding them
+    again, with None marking the position of each embedded finding; this merges the
+    two back in the original order. Returns None if the request has not completed.
+    """
+    completed = None
+    logged: Dict[str, Any] = {}
+    for event in events:
+        if event["event_type"] == "SPOKE_RESPONSE_RECEIVED":
+            logged[event["data"]["spoke_name"]] = event["data"]["finding"]
+        elif event["event_type"] == "REQUEST_COMPLETED":
+            completed = event["data"]
+    if completed is None:
+        return None
+    response = dict(completed)
+    refs = response.pop("finding_refs", [])
+    embedded = iter(response.get("findings", []))
+    findings = []
+    for name in refs:
+        if name is None:
+            findings.append(next(embedded))
+        elif name in logged:
+            findings.append(logged[name])
+    # Logs written before embedded findings had a place in finding_refs list them last
+    findings.extend(embedded)
+    response["findings"] = findings
+    return response
+
+# Buffered stores still open at interpreter exit; weak, so a closed store can be collected
+_open_stores: "weakref.WeakSet[AuditStore]" = weakref.WeakSet()
+
+def _close_open_stores():
+    for store in list(_open_stores):
+        try:
+            store.close()
+        except RuntimeError as e:
+            print(f"Error closing audit store: {e}")
+
+atexit.register(_close_open_stores)
 
 class AuditStore:
-    def __init__(self, storage_path: str = "audit_log.jsonl"):
+    """
+    Append-only JSONL audit log.
+
+    With buffered=True (the default) events are serialised on the caller's thread and
+    handed to a background writer that group-commits them: everything queued within
+    `flush_interval` seconds, or up to `batch_size` lines, goes out in one write. Each
+    event is one complete line, and a batch is written with a single append, so lines
+    from concurrent requests never interleave. If a write fails the writer stops: the
+    failed and queued events stay unwritten, and log_event, flush and close raise.
+
+    fsync policy:
+      none    - leave durability to the OS (default)
+      batch   - fsync after every batch
+      request - fsync after batches that contain a REQUEST_COMPLETED event
+    """
+    def __init__(self, storage_path: str = "audit_log.jsonl", buffered: bool = True,
+                 flush_interval: float = 0.05, batch_size: int = 512, fsync: str = "none"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', expected one of {FSYNC_POLICIES}")
         self.storage_path = storage_path
+        self.buffered = buffered
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.batches_written = 0
+
+        self._fd: Optional[int] = None
+        self._write_lock = threading.Lock()
+        self._queue: deque = deque()
+        self._cond = threading.Condition()
+        self._enqueued = 0
+        self._written = 0
+        self._flush_requested = False
+        self._closed = False
+        self._error: Optional[Exception] = None
+        self._writer: Optional[threading.Thread] = None
+        if buffered:
+            self._writer = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._writer.start()
+            _open_stores.add(self)
 
     def log_event(self, event_type: str, data: Dict[str, Any]):
+        """
+        Appends one event. `data` may hold pydantic models (a Transaction, a Finding);
+        they are encoded once and their cached bytes reused by any later event.
+        """
+        timestamp = datetime.utcnow().isoformat(timespec="microseconds")
         entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": timestamp,
             "event_type": event_type,
             "data": data
         }
-        with open(self.storage_path, "a") as f:
-            f.write(json.dumps(entry) + "\n")
+        line = encode(entry) + b"\n"
+        record = (line, event_type, data.get("request_id"), timestamp)
+        if not self.buffered:
+            self._write_batch([record])
+            return
+        with self._cond:
+            self._check_error()
+            if self._closed:
+                raise RuntimeError("AuditStore is closed")
+            self._queue.append(record)
+            self._enqueued += 1
+            if len(self._queue) >= self.batch_size:
+                self._cond.notify_all()
+
+    def flush(self):
+        """Blocks until every event logged so far has been written."""
+        if self._writer is None:
+            return
+        with self._cond:
+            target = self._enqueued
+            if self._written < target:
+                self._flush_requested = True
+                self._cond.notify_all()
+                while self._written < target and self._error is None and self._writer.is_alive():
+                    self._cond.wait()
+            self._check_error()
+
+    def close(self):
+        """Flushes outstanding events, stops the writer and closes the file."""
+        try:
+            if self._writer is not None:
+                try:
+                    self.flush()
+                finally:
+                    with self._cond:
+                        self._closed = True
+                        self._cond.notify_all()
+                    self._writer.join()
+                    self._writer = None
+                    _open_stores.discard(self)
+        finally:
+            with self._write_lock:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+
+    def _check_error(self):
+        if self._error is not None:
+            raise RuntimeError(f"Audit writer failed, {self._enqueued - self._written} events not written: "
+                               f"{self._error}") from self._error
 
     def get_logs(self) -> List[Dict[str, Any]]:
+        self.flush()
         if not os.path.exists(self.storage_path):
             return []
         logs = []
         with open(self.storage_path, "r") as f:
             for line in f:
-                logs.append(json.loads(line))
+                logs.append(decode(line))
+        return logs
+
+    def tail(self, n: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yields the most recent events first, reading the file backwards."""
+        self.flush()
+        if not os.path.exists(self.storage_path):
+            return
+        for i, line in enumerate(_reverse_lines(self.storage_path)):
+            if n is not None and i >= n:
+                return
+            yield decode(line)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue and self._closed:
+                    return
+                # Group commit: give concurrent requests a chance to fill the batch
+                if len(self._queue) < self.batch_size and not (self._closed or self._flush_requested):
+                    self._cond.wait_for(
+                        lambda: len(self._queue) >= self.batch_size or self._closed or self._flush_requested,
+                        self.flush_interval
+                    )
+                batch = [self._queue.popleft() for _ in range(min(len(self._queue), self.batch_size))]
+                if not self._queue:
+                    self._flush_requested = False
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                # Not only OSError: a writer that died any other way would leave flush() waiting forever
+                print(f"Error writing audit batch: {e}")
+                with self._cond:
+                    self._error = e
+                    self._closed = True
+                    self._cond.notify_all()
+                return
+            with self._cond:
+                self._written += len(batch)
+                self._cond.notify_all()
+
+    def _write_batch(self, records: List[AuditRecord]):
+        with self._write_lock:
+            if self._fd is None:
+                self._fd = os.open(self.storage_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self._append(self._fd, b"".join(record[0] for record in records))
+            self.batches_written += 1
+            self._maybe_fsync(self._fd, records)
+
+    def _maybe_fsync(self, fd: int, records: List[AuditRecord]):
+        if self.fsync == "batch" or (self.fsync == "request" and any(r[1] == "REQUEST_COMPLETED" for r in records)):
+            os.fsync(fd)
+
+    @staticmethod
+    def _append(fd: int, data: bytes):
+        view = memoryview(data)
+        while view:
+            written = os.write(fd, view)
+            view = view[written:]
+
+class _RequestFilter:
+    """Bloom filter over the request ids in one segment: no false negatives, ~1% false positives."""
+    HASHES = 7
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self._array = bytearray((bits + 7) // 8)
+
+    def _positions(self, request_id: str) -> Iterator[int]:
+        digest = hashlib.blake2b(request_id.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.bits for i in range(self.HASHES))
+
+    def add(self, request_id: str):
+        for position in self._positions(request_id):
+            self._array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, request_id: str) -> bool:
+        return all(self._array[position >> 3] & (1 << (position & 7)) for position in self._positions(request_id))
+
+class _Segment:
+    """One data file of a SegmentedAuditStore plus a summary of its sidecar index."""
+    def __init__(self, number: int, directory: str, filter_bits: int):
+        self.number = number
+        self.data_path = os.path.join(directory, f"segment-{number:06d}.jsonl")
+        self.index_path = os.path.join(directory, f"segment-{number:06d}.idx")
+        self.size = 0
+        # Bytes of the sidecar that describe the first `size` bytes of data
+        self.index_size = 0
+        self.first_ts: Optional[str] = None
+        self.last_ts: Optional[str] = None
+        self.event_types: Set[str] = set()
+        self.requests = _RequestFilter(filter_bits)
+
+    def add(self, request_key: str, event_type: str, timestamp: str):
+        if request_key:
+            self.requests.add(request_key)
+        self.event_types.add(event_type)
+        if self.first_ts is None or timestamp < self.first_ts:
+            self.first_ts = timestamp
+        if self.last_ts is None or timestamp > self.last_ts:
+            self.last_ts = timestamp
+
+class SegmentedAuditStore(AuditStore):
+    """
+    Audit log rolled over into size/time-bounded segments under `directory`.
+
+    Every segment-NNNNNN.jsonl has a sidecar segment-NNNNNN.idx with one compact
+    line per event (request_id, event_type, byte offset, length, timestamp). Only a
+    summary of each segment is kept in memory - its time range, event types and a
+    Bloom filter of its request ids - so memory stays flat as the log grows; a lookup
+    reads the sidecars of the segments that may match and then only the matching data
+    lines. Writes go through the same group-commit writer as AuditStore; rollover
+    happens between batches, so a segment can exceed its bounds by at most one batch.
+    """
+    def __init__(self, directory: str = "audit_log", max_segment_bytes: int = 64 * 1024 * 1024,
+                 max_segment_age: Optional[float] = 3600.0, **kwargs):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        # ~10 bits per request at a few hundred bytes of audit events per request
+        self._filter_bits = max(1 << 16, max_segment_bytes // 64)
+        self._segments: List[_Segment] = []
+        self._index_fd: Optional[int] = None
+        self._load_segments()
+        super().__init__(storage_path=self._segments[-1].data_path, **kwargs)
+
+    def get_request(self, request_id: str) -> List[Dict[str, Any]]:
+        """All events logged for one request_id, in write order."""
+        key = self._request_key(request_id)
+        self.flush()
+        with self._write_lock:
+            candidates = [(seg, seg.index_size) for seg in self._segments if key in seg.requests]
+        prefix = (key + "\t").encode("utf-8")
+        locations = []
+        for seg, index_size in candidates:
+            for line in self._index_lines(seg, index_size):
+                if line.startswith(prefix):
+                    _, _, offset, length, _ = line.split(b"\t")
+                    locations.append((seg.number, int(offset), int(length)))
+        return [decode(line) for line in self._read(locations)]
+
+    def get_response(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """The request's OrchestrationResponse payload with referenced findings filled in."""
+        return expand_response(self.get_request(request_id))
+
+    def query(self, event_type: Optional[str] = None, start: Optional[Any] = None,
+              end: Optional[Any] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Events of one type (or all types) with start <= timestamp < end. start/end are
+        datetimes or ISO strings in UTC; segments outside the range are skipped.
+        """
+        start, end = self._iso(start), self._iso(end)
+        self.flush()
+        with self._write_lock:
+            segments = [(seg, seg.index_size) for seg in self._segments
+                        if seg.first_ts is not None
+                        and not (end is not None and seg.first_ts >= end)
+                        and not (start is not None and seg.last_ts < start)
+                        and (event_type is None or event_type in seg.event_types)]
+        for seg, index_size in segments:
+            locations = []
+            for line in self._index_lines(seg, index_size):
+                _, line_type, offset, length, ts = line.decode("utf-8").split("\t")
+                if event_type is not None and line_type != event_type:
+                    continue
+                if (start is None or ts >= start) and (end is None or ts < end):
+                    locations.append((seg.number, int(offset), int(length)))
+            for line in self._read(locations):
+                yield decode(line)
+
+    def tail(self, n: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Yields the most recent events first, reading segments backwards from the end."""
+        self.flush()
+        with self._write_lock:
+            paths = [seg.data_path for seg in reversed(self._segments) if seg.size]
+        emitted = 0
+        for path in paths:
+            for line in _reverse_lines(path):
+                if n is not None and emitted >= n:
+                    return
+                emitted += 1
+                yield decode(line)
+
+    def get_logs(self) -> List[Dict[str, Any]]:
+        self.flush()
+        with self._write_lock:
+            paths = [seg.data_path for seg in self._segments if seg.size]
+        logs = []
+        for path in paths:
+            with open(path, "r") as f:
+                for line in f:
+                    logs.append(decode(line))
         return logs
+
+    def close(self):
+        super().close()
+        with self._write_lock:
+            if self._index_fd is not None:
+                os.close(self._index_fd)
+                self._index_fd = None
+
+    def _write_batch(self, records: List[AuditRecord]):
+        with self._write_lock:
+            segment = self._segments[-1]
+            if segment.size and self._segment_full(segment):
+                segment = self._roll()
+            if self._fd is None:
+                self._fd = os.open(segment.data_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+                self._index_fd = os.open(segment.index_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+            # Data first, then index: a crash in between is repaired by _recover on start-up
+            self._append(self._fd, b"".join(record[0] for record in records))
+            index_lines = []
+            offset = segment.size
+            for line, event_type, request_id, timestamp in records:
+                key = self._request_key(request_id)
+                index_lines.append(self._index_line(key, event_type, offset, len(line), timestamp))
+                segment.add(key, event_type, timestamp)
+                offset += len(line)
+            index = "".join(index_lines).encode("utf-8")
+            self._append(self._index_fd, index)
+            segment.size = offset
+            segment.index_size += len(index)
+            self.batches_written += 1
+            self._maybe_fsync(self._fd, records)
+            self._maybe_fsync(self._index_fd, records)
+
+    def _segment_full(self, segment: _Segment) -> bool:
+        if segment.size >= self.max_segment_bytes:
+            return True
+        if self.max_segment_age is not None and segment.first_ts is not None:
+            age = (datetime.utcnow() - datetime.fromisoformat(segment.first_ts)).total_seconds()
+            return age >= self.max_segment_age
+        return False
+
+    def _roll(self) -> _Segment:
+        if self._fd is not None:
+            os.close(self._fd)
+            os.close(self._index_fd)
+            self._fd = self._index_fd = None
+        segment = _Segment(self._segments[-1].number + 1, self.directory, self._filter_bits)
+        self._segments.append(segment)
+        self.storage_path = segment.data_path
+        return segment
+
+    @staticmethod
+    def _request_key(request_id: Optional[str]) -> str:
+        """The request id as written to the sidecar, where a tab would split the line."""
+        return (request_id or "").replace("\t", " ")
+
+    @staticmethod
+    def _index_line(request_key: str, event_type: str, offset: int, length: int, timestamp: str) -> str:
+        return f"{request_key}\t{event_type}\t{offset}\t{length}\t{timestamp}\n"
+
+    @staticmethod
+    def _index_lines(segment: _Segment, index_size: int) -> List[bytes]:
+        """The sidecar lines covering the first `index_size` bytes, read from disk."""
+        if not index_size:
+            return []
+        with open(segment.index_path, "rb") as f:
+            content = f.read(index_size)
+        return content.split(b"\n")[:-1]
+
+    def _read(self, locations: List[Tuple[int, int, int]]) -> Iterator[bytes]:
+        numbers = {seg.number: seg for seg in self._segments}
+        fd, current = None, None
+        try:
+            for number, offset, length in locations:
+                if number != current:
+                    if fd is not None:
+                        os.close(fd)
+                    fd, current = os.open(numbers[number].data_path, os.O_RDONLY), number
+                yield os.pread(fd, length, offset)
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    @staticmethod
+    def _iso(value: Optional[Any]) -> Optional[str]:
+        if value is None or isinstance(value, str):
+            return value
+        return value.isoformat(timespec="microseconds")
+
+    def _load_segments(self):
+        numbers = sorted(
+            int(name[len("segment-"):-len(".jsonl")])
+            for name in os.listdir(self.directory)
+            if name.startswith("segment-") and name.endswith(".jsonl")
+        )
+        for number in numbers or [1]:
+            segment = _Segment(number, self.directory, self._filter_bits)
+            self._segments.append(segment)
+            self._recover(segment)
+
+    def _recover(self, segment: _Segment):
+        """Summarises a segment's sidecar index and indexes any lines written after it."""
+        size = os.path.getsize(segment.data_path) if os.path.exists(segment.data_path) else 0
+        indexed_end = 0
+        kept = []
+        dropped = False
+        if os.path.exists(segment.index_path):
+            with open(segment.index_path, "rb") as f:
+                for raw in f:
+                    line = raw.decode("utf-8")
+                    parts = line.rstrip("\n").split("\t")
+                    # A torn last line (crash mid-write) or an entry past the end of the data
+                    # is dropped; the data lines it described are re-indexed below.
+                    if not line.endswith("\n") or len(parts) != 5 or int(parts[2]) + int(parts[3]) > size:
+                        dropped = True
+                        continue
+                    request_key, event_type, offset, length, timestamp = parts
+                    segment.add(request_key, event_type, timestamp)
+                    indexed_end = max(indexed_end, int(offset) + int(length))
+                    kept.append(line)
+
+        if indexed_end < size:
+            with open(segment.data_path, "rb+") as f:
+                f.seek(indexed_end)
+                offset = indexed_end
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        # Torn final line from a crash mid-write: drop it so new lines start clean
+                        f.truncate(offset)
+                        size = offset
+                        break
+                    entry = decode(line)
+                    key = self._request_key((entry.get("data") or {}).get("request_id"))
+                    kept.append(self._index_line(key, entry["event_type"], offset, len(line), entry["timestamp"]))
+                    segment.add(key, entry["event_type"], entry["timestamp"])
+                    offset += len(line)
+            dropped = True
+
+        index = "".join(kept).encode("utf-8")
+        if dropped:
+            # Rewrite rather than append, so lazy reads never see the dropped lines
+            tmp_path = segment.index_path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(index)
+            os.replace(tmp_path, segment.index_path)
+        segment.size = size
+        segment.index_size = len(index)
@@ -1,45 +1,216 @@
-from typing import List
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set
+import os
+import sys
+
+if __name__ == "__main__":
+    # Run as a script: common/ and hub/ live one level up, llm_runtime at the repository root
+    framework = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+    sys.path[:0] = [framework, os.path.dirname(framework)]
+
 from common.models import Transaction, OrchestrationResponse, Finding, SpokeCapability
 from hub.registry import AgentRegistry
 from hub.observability import AuditStore
+from hub.batching import MicroBatcher
+import time
 import uuid
 
+from llm_runtime import metrics
+
+class SpokeFindings(list):
+    """
+    The findings execute_spokes returns, carrying what aggregate_results needs about the
+    same call: the spokes that were late or failed, and which findings are already in the
+    audit log. Keeping this on the result rather than on the Orchestrator means nothing is
+    left behind for requests that are never aggregated.
+    """
+    def __init__(self, findings=(), late_spokes: Optional[List[str]] = None, logged: Optional[Set[int]] = None):
+        super().__init__(findings)
+        self.late_spokes: List[str] = late_spokes if late_spokes is not None else []
+        self.logged: Set[int] = logged if logged is not None else set()
+
 class Orchestrator:
-    def __init__(self, registry: AgentRegistry, audit_store: AuditStore):
+    def __init__(self, registry: AgentRegistry, audit_store: AuditStore, max_workers: int = 8,
+                 spoke_timeout: Optional[float] = None, request_deadline: Optional[float] = None,
+                 batcher: Optional[MicroBatcher] = None, quorum: float = 0.5):
         self.registry = registry
         self.audit_store = audit_store
+        # Seconds: per-spoke timeout and overall budget for a request's fan-out (None = wait forever)
+        self.spoke_timeout = spoke_timeout
+        self.request_deadline = request_deadline
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="spoke")
+        # Optional micro-batcher: concurrent requests to the same spoke share one prompt
+        self.batcher = batcher
+        # Share of the invoked spokes that must answer before a request can be APPROVED
+        self.quorum = quorum
 
     def process_request(self, transaction: Transaction) -> str:
+        started = time.perf_counter() if metrics.ENABLED else None
         request_id = str(uuid.uuid4())
-        self.audit_store.log_event("REQUEST_RECEIVED", {"request_id": request_id, "transaction": transaction.dict()})
+        # The model is encoded once by the audit store (see common.serialization)
+        self.audit_store.log_event("REQUEST_RECEIVED", {"request_id": request_id, "transaction": transaction})
         self.audit_store.log_event("ORCHESTRATION_STARTED", {"request_id": request_id})
+        if started is not None:
+            metrics.STAGE_LATENCY.observe(time.perf_counter() - started, pipeline="hub", stage="process_request")
         return request_id
 
-    def execute_spokes(self, request_id: str, transaction: Transaction, spokes: List[Any]) -> List[Finding]:
-        findings: List[Finding] = []
+    def route_spokes(self, capabilities: List[SpokeCapability]) -> List[Any]:
+        """
+        Picks one replica per logical spoke for each capability (spokes registered with an
+        instance) and returns handles that execute_spokes can call like spokes.
+        """
+        started = time.perf_counter() if metrics.ENABLED else None
+        handles: Dict[str, Any] = {}
+        for capability in capabilities:
+            for replica in self.registry.select_replicas(capability):
+                if replica.handle is not None and replica.name not in handles:
+                    handles[replica.name] = replica.handle
+        if started is not None:
+            metrics.STAGE_LATENCY.observe(time.perf_counter() - started, pipeline="hub", stage="route_spokes")
+        return list(handles.values())
+
+    def execute_spokes(self, request_id: str, transaction: Transaction, spokes: List[Any],
+                       deadline: Optional[float] = None, spoke_timeout: Optional[float] = None) -> List[Finding]:
+        """
+        Fans the transaction out to all spokes in parallel and returns the findings that
+        arrived within min(spoke_timeout, deadline) seconds, in spoke order, as SpokeFindings:
+        late or failed spokes travel with the list to aggregate_results.
+
+        Audit order per request is fixed: one SPOKE_INVOKED per spoke in spoke order, then
+        one SPOKE_RESPONSE_RECEIVED / SPOKE_TIMED_OUT / SPOKE_FAILED per spoke in spoke order.
+        """
+        deadline = self.request_deadline if deadline is None else deadline
+        spoke_timeout = self.spoke_timeout if spoke_timeout is None else spoke_timeout
+        limits = [t for t in (deadline, spoke_timeout) if t is not None]
+        budget = min(limits) if limits else None
+
         for spoke in spokes:
             self.audit_store.log_event("SPOKE_INVOKED", {"request_id": request_id, "spoke_name": spoke.name})
-            finding = spoke.process_transaction(transaction)
+        started = time.monotonic()
+        completed_at: Dict[int, float] = {}
+        futures = []
+        for i, spoke in enumerate(spokes):
+            if self.batcher is not None:
+                future = self.batcher.submit(spoke, transaction)
+            else:
+                future = self._executor.submit(spoke.process_transaction, transaction)
+            future.add_done_callback(lambda _, i=i: completed_at.setdefault(i, time.monotonic()))
+            futures.append(future)
+        wait(futures, timeout=budget)
+
+        findings = SpokeFindings()
+        late = findings.late_spokes
+        logged = findings.logged
+        for i, (spoke, future) in enumerate(zip(spokes, futures)):
+            if not future.done():
+                # Not-yet-started calls are cancelled; running ones finish in the background and are ignored
+                future.cancel()
+                late.append(spoke.name)
+                if metrics.ENABLED:
+                    metrics.SPOKE_LATENCY.observe(time.monotonic() - started, spoke=spoke.name, outcome="timeout")
+                self.audit_store.log_event("SPOKE_TIMED_OUT", {
+                    "request_id": request_id, "spoke_name": spoke.name,
+                    "waited_ms": round((time.monotonic() - started) * 1000, 1)
+                })
+                continue
+            try:
+                finding = future.result()
+            except Exception as e:
+                late.append(spoke.name)
+                if metrics.ENABLED:
+                    metrics.SPOKE_LATENCY.observe(completed_at.get(i, time.monotonic()) - started,
+                                                  spoke=spoke.name, outcome="error")
+                self.audit_store.log_event("SPOKE_FAILED", {"request_id": request_id, "spoke_name": spoke.name, "error": str(e)})
+                continue
             findings.append(finding)
-            self.audit_store.log_event("SPOKE_RESPONSE_RECEIVED", {"request_id": request_id, "spoke_name": spoke.name, "finding": finding.dict()})
+            elapsed = completed_at.get(i, time.monotonic()) - started
+            if metrics.ENABLED:
+                metrics.SPOKE_LATENCY.observe(elapsed, spoke=spoke.name, outcome="ok")
+            self.audit_store.log_event("SPOKE_RESPONSE_RECEIVED", {
+                "request_id": request_id, "spoke_name": spoke.name, "finding": finding,
+                "elapsed_ms": round(elapsed * 1000, 1)
+            })
+            logged.add(id(finding))
+
+        if metrics.ENABLED:
+            metrics.STAGE_LATENCY.observe(time.monotonic() - started, pipeline="hub", stage="execute_spokes")
         return findings
 
-    def aggregate_results(self, request_id: str, findings: List[Finding]) -> OrchestrationResponse:
+    def aggregate_results(self, request_id: str, findings: List[Finding],
+                          late_spokes: Optional[List[str]] = None) -> OrchestrationResponse:
+        started = time.perf_counter() if metrics.ENABLED else None
+        # Decide on the findings that arrived in time; late/failed spokes are listed, not scored.
+        # A plain list (not from execute_spokes) has no late spokes unless they are passed in.
+        if late_spokes is None:
+            late_spokes = list(getattr(findings, "late_spokes", []))
+        logged = getattr(findings, "logged", set())
+
+        # Fallback findings (the spoke's LLM call or reply failed) stay in the response but
+        # are not assessments: they neither count towards the quorum nor move the score
+        assessed = [f for f in findings if not getattr(f, "is_fallback", False)]
+
         # Compute consensus (simple mean for demo)
-        if not findings:
-            score = 0.0
-            decision = "APPROVED"
+        score = sum(f.score for f in assessed) / len(assessed) if assessed else 0.0
+        answered = len(assessed) / (len(findings) + len(late_spokes)) if assessed else 0.0
+        if answered < self.quorum or not assessed:
+            # Nothing (or too little) was assessed: never let that pass as an approval
+            decision = "FLAGGED"
         else:
-            score = sum(f.score for f in findings) / len(findings)
             decision = "FLAGGED" if score > 0.5 else "APPROVED"
 
         response = OrchestrationResponse(
             request_id=request_id,
-            findings=findings,
+            findings=list(findings),
             consensus_score=score,
             final_decision=decision,
-            audit_trail_id=request_id
+            audit_trail_id=request_id,
+            late_spokes=late_spokes
         )
 
-        self.audit_store.log_event("REQUEST_COMPLETED", response.dict())
+        # The response as logged, except that findings already in this request's
+        # SPOKE_RESPONSE_RECEIVED events are referenced by spoke name rather than written
+        # again. finding_refs keeps one entry per finding in order, None where the finding
+        # is embedded instead; observability.expand_response puts the list back together.
+        completed = response.model_dump(exclude={"findings"})
+        completed["finding_refs"] = [f.spoke_name if id(f) in logged else None for f in findings]
+        completed["findings"] = [f for f in findings if id(f) not in logged]
+        self.audit_store.log_event("REQUEST_COMPLETED", completed)
+        if started is not None:
+            metrics.STAGE_LATENCY.observe(time.perf_counter() - started, pipeline="hub", stage="aggregate_results")
         return response
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+if __name__ == "__main__":
+    # Self-check: when every spoke's LLM call fails, the placeholder findings must not
+    # approve the transaction
+    import datetime
+    import tempfile
+    from common.models import SpokeCapability
+    from common.spoke_base import BaseSpoke
+
+    class UnreachableSpoke(BaseSpoke):
+        def get_capabilities(self) -> List[SpokeCapability]:
+            return [SpokeCapability.FRAUD]
+
+        def process_transaction(self, transaction: Transaction) -> Finding:
+            return self._score_prompt(f"Score transaction {transaction.transaction_id}")
+
+    registry = AgentRegistry()
+    for name in ("RiskA", "RiskB", "RiskC"):
+        spoke = UnreachableSpoke(name, base_url="http://127.0.0.1:9")  # nothing listens on the discard port
+        registry.register_spoke(name, spoke.get_capabilities(), spoke.llm.base_url, instance=spoke)
+    audit_store = AuditStore(storage_path=os.path.join(tempfile.mkdtemp(), "audit.jsonl"))
+    orchestrator = Orchestrator(registry, audit_store)
+    transaction = Transaction(transaction_id="TX-CHECK", amount=950.0, sender_id="A", receiver_id="B",
+                              timestamp=datetime.datetime(2025, 1, 1))
+    request_id = orchestrator.process_request(transaction)
+    findings = orchestrator.execute_spokes(request_id, transaction,
+                                           orchestrator.route_spokes([SpokeCapability.FRAUD]))
+    response = orchestrator.aggregate_results(request_id, findings)
+    assert len(findings) == 3 and all(f.is_fallback for f in findings), findings
+    assert response.final_decision == "FLAGGED", response
+    orchestrator.shutdown()
+    audit_store.close()
+    print(f"All spokes failed -> {response.final_decision} (score {response.consensus_score})")
@@ -1,30 +1,227 @@
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
 from common.models import SpokeCapability
+import random
+import threading
+import time
+
+SELECTION_POLICIES = ("least_loaded", "p2c")
 
 class SpokeMetadata:
-    def __init__(self, name: str, capabilities: List[SpokeCapability], endpoint: str):
+    """One replica of a spoke: a name, its capabilities and the endpoint that serves it."""
+    def __init__(self, name: str, capabilities: List[SpokeCapability], endpoint: str, instance: Any = None):
         self.name = name
         self.capabilities = capabilities
         self.endpoint = endpoint
         self.status = "active"
+        self.instance = instance  # spoke object bound to this endpoint, if registered with one
+        self.handle = ReplicaHandle(self) if instance is not None else None
+        self.in_flight = 0
+        self.latency_ewma: Optional[float] = None
+        self.consecutive_failures = 0
+        self.last_heartbeat = time.monotonic()
+        self.status_changed_at = time.monotonic()
+
+    @property
+    def replica_id(self) -> str:
+        return f"{self.name}@{self.endpoint}"
+
+class ReplicaHandle:
+    """
+    Spoke-like wrapper that routes calls to one replica and reports load and latency
+    back to the registry. One handle exists per replica so micro-batching still groups
+    requests bound for the same replica.
+    """
+    def __init__(self, replica: SpokeMetadata):
+        self.replica = replica
+        self.registry: Optional["AgentRegistry"] = None
+
+    @property
+    def name(self) -> str:
+        return self.replica.name
+
+    def process_transaction(self, transaction):
+        with self.registry.lease(self.replica) as lease:
+            finding = self.replica.instance.process_transaction(transaction)
+            # A fallback finding means the LLM call or its reply failed, even though nothing was raised
+            lease.failed = getattr(finding, "is_fallback", False)
+            return finding
+
+    def process_batch(self, transactions):
+        with self.registry.lease(self.replica) as lease:
+            findings = self.replica.instance.process_batch(transactions)
+            lease.failed = any(getattr(finding, "is_fallback", False) for finding in findings)
+            return findings
+
+class Lease:
+    """One call against a replica; the caller sets failed when the call returned a failure."""
+    def __init__(self, replica: SpokeMetadata):
+        self.replica = replica
+        self.failed = False
 
 class AgentRegistry:
-    def __init__(self):
+    """
+    Registry of spoke replicas.
+
+    Spokes registered under the same name with different endpoints are replicas of one
+    logical spoke. A capability -> spoke name -> replicas index replaces the linear scan,
+    and each replica tracks in-flight requests, an EWMA of recent latency and its health:
+
+      active    - eligible for routing
+      expired   - no heartbeat within heartbeat_ttl seconds (back to active on heartbeat)
+      degraded  - latency EWMA above slow_threshold
+      unhealthy - max_failures consecutive failed calls
+
+    Degraded and unhealthy replicas are retried after recovery_interval seconds.
+    """
+    def __init__(self, selection: str = "p2c", heartbeat_ttl: Optional[float] = None,
+                 slow_threshold: Optional[float] = None, max_failures: int = 3,
+                 recovery_interval: float = 30.0, ewma_alpha: float = 0.2):
+        if selection not in SELECTION_POLICIES:
+            raise ValueError(f"Unknown selection policy '{selection}', expected one of {SELECTION_POLICIES}")
+        self.selection = selection
+        self.heartbeat_ttl = heartbeat_ttl
+        self.slow_threshold = slow_threshold
+        self.max_failures = max_failures
+        self.recovery_interval = recovery_interval
+        self.ewma_alpha = ewma_alpha
         self._spokes: Dict[str, SpokeMetadata] = {}
+        self._by_capability: Dict[SpokeCapability, Dict[str, List[SpokeMetadata]]] = {}
+        self._by_name: Dict[str, List[SpokeMetadata]] = {}
+        self._lock = threading.Lock()
 
-    def register_spoke(self, name: str, capabilities: List[SpokeCapability], endpoint: str):
-        self._spokes[name] = SpokeMetadata(name, capabilities, endpoint)
+    def register_spoke(self, name: str, capabilities: List[SpokeCapability], endpoint: str, instance: Any = None):
+        replica = SpokeMetadata(name, capabilities, endpoint, instance)
+        if replica.handle is not None:
+            replica.handle.registry = self
+        with self._lock:
+            previous = self._spokes.get(replica.replica_id)
+            if previous is not None:
+                self._unindex(previous)
+            self._spokes[replica.replica_id] = replica
+            self._by_name.setdefault(name, []).append(replica)
+            for capability in capabilities:
+                self._by_capability.setdefault(capability, {}).setdefault(name, []).append(replica)
         print(f"Registered Spoke: {name} with capabilities: {capabilities}")
 
+    def deregister_spoke(self, name: str, endpoint: Optional[str] = None):
+        with self._lock:
+            for replica in self._replicas(name, endpoint):
+                self._unindex(replica)
+                del self._spokes[replica.replica_id]
+
     def get_spokes_for_capability(self, capability: SpokeCapability) -> List[SpokeMetadata]:
-        return [
-            spoke for spoke in self._spokes.values()
-            if capability in spoke.capabilities and spoke.status == "active"
-        ]
+        """Every routable replica with the capability."""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                replica
+                for replicas in self._by_capability.get(capability, {}).values()
+                for replica in replicas
+                if self._routable(replica, now)
+            ]
+
+    def select_replicas(self, capability: SpokeCapability) -> List[SpokeMetadata]:
+        """One replica per logical spoke with the capability, chosen by the selection policy."""
+        with self._lock:
+            names = list(self._by_capability.get(capability, {}))
+        chosen = [self.select_replica(name, capability) for name in names]
+        return [replica for replica in chosen if replica is not None]
+
+    def select_replica(self, name: str, capability: Optional[SpokeCapability] = None) -> Optional[SpokeMetadata]:
+        """Picks a replica of one spoke; falls back to degraded replicas if nothing else is left."""
+        with self._lock:
+            if capability is not None:
+                candidates = list(self._by_capability.get(capability, {}).get(name, ()))
+            else:
+                candidates = self._replicas(name)
+            now = time.monotonic()
+            routable = [r for r in candidates if self._routable(r, now)]
+            if not routable:
+                routable = [r for r in candidates if r.status == "degraded"]
+            if not routable:
+                return None
+            if self.selection == "p2c" and len(routable) > 2:
+                # Power of two choices: near least-loaded balance without herding on one replica
+                routable = random.sample(routable, 2)
+            # Recent failures rank before latency: a failing replica has no (or a stale) EWMA
+            return min(routable, key=lambda r: (r.in_flight, r.consecutive_failures, r.latency_ewma or 0.0))
+
+    @contextmanager
+    def lease(self, replica: SpokeMetadata):
+        """
+        Counts a request against a replica and records its latency and outcome. The call
+        fails if it raises or if the caller sets failed on the yielded Lease.
+        """
+        with self._lock:
+            replica.in_flight += 1
+        started = time.monotonic()
+        lease = Lease(replica)
+        ok = False
+        try:
+            yield lease
+            ok = not lease.failed
+        finally:
+            self.record_result(replica, time.monotonic() - started, ok)
+
+    def record_result(self, replica: SpokeMetadata, latency: float, ok: bool):
+        with self._lock:
+            replica.in_flight = max(0, replica.in_flight - 1)
+            if ok:
+                replica.consecutive_failures = 0
+                replica.latency_ewma = latency if replica.latency_ewma is None else (
+                    self.ewma_alpha * latency + (1 - self.ewma_alpha) * replica.latency_ewma
+                )
+                if self.slow_threshold is not None and replica.latency_ewma > self.slow_threshold:
+                    self._set_status(replica, "degraded")
+            else:
+                replica.consecutive_failures += 1
+                if replica.consecutive_failures >= self.max_failures:
+                    self._set_status(replica, "unhealthy")
+
+    def heartbeat(self, name: str, endpoint: Optional[str] = None):
+        with self._lock:
+            for replica in self._replicas(name, endpoint):
+                replica.last_heartbeat = time.monotonic()
+                if replica.status == "expired":
+                    self._set_status(replica, "active")
 
     def list_all_spokes(self) -> List[SpokeMetadata]:
         return list(self._spokes.values())
 
-    def update_spoke_status(self, name: str, status: str):
-        if name in self._spokes:
-            self._spokes[name].status = status
+    def update_spoke_status(self, name: str, status: str, endpoint: Optional[str] = None):
+        with self._lock:
+            for replica in self._replicas(name, endpoint):
+                self._set_status(replica, status)
+
+    def _routable(self, replica: SpokeMetadata, now: float) -> bool:
+        if replica.status == "active" and self.heartbeat_ttl is not None and now - replica.last_heartbeat > self.heartbeat_ttl:
+            self._set_status(replica, "expired")
+        elif replica.status in ("degraded", "unhealthy") and now - replica.status_changed_at >= self.recovery_interval:
+            # Give it another chance with a clean latency history
+            replica.latency_ewma = None
+            replica.consecutive_failures = 0
+            self._set_status(replica, "active")
+        return replica.status == "active"
+
+    def _replicas(self, name: str, endpoint: Optional[str] = None) -> List[SpokeMetadata]:
+        return [r for r in self._by_name.get(name, ()) if endpoint is None or r.endpoint == endpoint]
+
+    def _unindex(self, replica: SpokeMetadata):
+        same_name = self._by_name.get(replica.name, [])
+        if replica in same_name:
+            same_name.remove(replica)
+        if not same_name:
+            self._by_name.pop(replica.name, None)
+        for capability in replica.capabilities:
+            replicas = self._by_capability.get(capability, {}).get(replica.name, [])
+            if replica in replicas:
+                replicas.remove(replica)
+            if not replicas:
+                self._by_capability.get(capability, {}).pop(replica.name, None)
+
+    @staticmethod
+    def _set_status(replica: SpokeMetadata, status: str):
+        if replica.status != status:
+            replica.status = status
+            replica.status_changed_at = time.monotonic()
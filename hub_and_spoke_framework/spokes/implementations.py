@@ -1,11 +1,21 @@
 from common.spoke_base import BaseSpoke
 from common.models import Transaction, Finding, SpokeCapability
-import json
 
 class FraudSpoke(BaseSpoke):
+    system_prompt = "You are a Fraud Detection Expert."
+    batch_task = "Analyze each of the following transactions for potential FRAUD."
+
     def get_capabilities(self):
         return [SpokeCapability.FRAUD]
 
+    def describe_transaction(self, transaction: Transaction) -> str:
+        return (
+            f"Transaction Amount: {transaction.amount} {transaction.currency}\n"
+            f"Sender ID: {transaction.sender_id}\n"
+            f"Receiver ID: {transaction.receiver_id}\n"
+            f"Metadata: {transaction.metadata}"
+        )
+
     def process_transaction(self, transaction: Transaction) -> Finding:
         prompt = f"""
         Analyze the following transaction for potential FRAUD.
@@ -22,35 +32,22 @@ class FraudSpoke(BaseSpoke):
             "action_item": "Recommended action"
         }}
         """
-        
-        response_text = self.llm.generate(prompt, system_prompt="You are a Fraud Detection Expert.")
-        
-        # Extract JSON from response (naive extraction for demo)
-        try:
-            # Look for the first '{' and last '}'
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            data = json.loads(response_text[start:end])
-            return Finding(
-                spoke_name=self.name,
-                severity=data.get("severity", "LOW"),
-                score=data.get("score", 0.0),
-                rationale=data.get("rationale", "No rationale provided"),
-                action_item=data.get("action_item", "None")
-            )
-        except Exception:
-            return Finding(
-                spoke_name=self.name,
-                severity="MEDIUM",
-                score=0.5,
-                rationale=f"Error parsing LLM response: {response_text[:50]}...",
-                action_item="Manual Review"
-            )
+        return self._score_prompt(prompt)
 
 class AMLSpoke(BaseSpoke):
+    system_prompt = "You are an AML Compliance Officer."
+    batch_task = "Analyze each of the following transactions for potential Anti-Money Laundering (AML) risks."
+
     def get_capabilities(self):
         return [SpokeCapability.AML]
 
+    def describe_transaction(self, transaction: Transaction) -> str:
+        return (
+            f"Transaction Amount: {transaction.amount} {transaction.currency}\n"
+            f"Sender ID: {transaction.sender_id}\n"
+            f"Receiver ID: {transaction.receiver_id}"
+        )
+
     def process_transaction(self, transaction: Transaction) -> Finding:
         prompt = f"""
         Analyze the following transaction for potential Anti-Money Laundering (AML) risks.
@@ -66,25 +63,4 @@ class AMLSpoke(BaseSpoke):
             "action_item": "Recommended action"
         }}
         """
-        
-        response_text = self.llm.generate(prompt, system_prompt="You are an AML Compliance Officer.")
-        
-        try:
-            start = response_text.find('{')
-            end = response_text.rfind('}') + 1
-            data = json.loads(response_text[start:end])
-            return Finding(
-                spoke_name=self.name,
-                severity=data.get("severity", "LOW"),
-                score=data.get("score", 0.0),
-                rationale=data.get("rationale", "No rationale provided"),
-                action_item=data.get("action_item", "None")
-            )
-        except Exception:
-            return Finding(
-                spoke_name=self.name,
-                severity="MEDIUM",
-                score=0.5,
-                rationale=f"Error parsing LLM response: {response_text[:50]}...",
-                action_item="Manual Review"
-            )
+        return self._score_prompt(prompt)
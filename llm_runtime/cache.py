@@ -0,0 +1,139 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+# Request fields that determine the model output
+KEY_FIELDS = ("model", "system", "prompt", "messages", "options", "format")
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """SHA-256 over the canonical JSON of the output-determining request fields."""
+    material = {name: payload.get(name) for name in KEY_FIELDS}
+    encoded = json.dumps(material, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+def is_deterministic(payload: Dict[str, Any]) -> bool:
+    """True if the request pins sampling (temperature 0 or a fixed seed)."""
+    options = payload.get("options") or {}
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+class ResponseCache:
+    """
+    Content-addressed cache for LLM responses.
+
+    An in-memory LRU tier sits in front of an optional SQLite tier that survives
+    restarts. Entries expire after `ttl` seconds (if set) and each tier is capped
+    by entry count. Callers opt in per call site and only deterministic requests
+    are cached; everything else is counted as a bypass.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None,
+                 path: Optional[str] = None, max_disk_entries: int = 100_000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._puts_since_trim = 0
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0, "expired": 0}
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+
+    def lookup(self, payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Returns (key, cached_value) for a request payload. key is None when the
+        request is not deterministic and must not be cached.
+        """
+        if not is_deterministic(payload):
+            with self._lock:
+                self.stats["bypassed"] += 1
+            return None, None
+        key = cache_key(payload)
+        return key, self.get(key)
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if self._fresh(created, now):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return value
+                del self._memory[key]
+                self.stats["expired"] += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    value, created = row
+                    if self._fresh(created, now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, created, value)
+                        self.stats["hits"] += 1
+                        self.stats["disk_hits"] += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.stats["expired"] += 1
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now)
+                )
+                # Trim the least recently used rows in batches rather than on every write
+                self._puts_since_trim += 1
+                if self._puts_since_trim >= max(1, self.max_disk_entries // 100):
+                    self._puts_since_trim = 0
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN ("
+                        "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                        (self.max_disk_entries,)
+                    )
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _fresh(self, created: float, now: float) -> bool:
+        return self.ttl is None or now - created < self.ttl
+
+    def _remember(self, key: str, created: float, value: str):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
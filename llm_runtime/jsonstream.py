@@ -0,0 +1,68 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+class IncrementalJSONParser:
+    """
+    Finds the first complete top-level JSON object in text that arrives in pieces.
+
+    Each feed() scans only the new characters, tracking brace depth and string/escape
+    state, so the cost over a whole stream is linear. Text before the object (e.g.
+    "Sure, here is the JSON:") is skipped. When an object closes it is decoded and
+    checked with `accept`; rejected or undecodable objects are discarded and the scan
+    continues with the next one.
+    """
+    def __init__(self, accept: Optional[Callable[[Dict[str, Any]], bool]] = None):
+        self.accept = accept
+        self.result: Optional[Dict[str, Any]] = None
+        self._buffer: list = []
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    @property
+    def done(self) -> bool:
+        return self.result is not None
+
+    def feed(self, text: str) -> Optional[Dict[str, Any]]:
+        """Consumes a chunk; returns the object once one has been completed and accepted."""
+        if self.result is not None:
+            return self.result
+        start = 0
+        for i, ch in enumerate(text):
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    start = i
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._buffer.append(text[start:i + 1])
+                    candidate = "".join(self._buffer)
+                    self._buffer = []
+                    if self._try_accept(candidate):
+                        return self.result
+        if self._depth > 0:
+            self._buffer.append(text[start:])
+        return None
+
+    def _try_accept(self, candidate: str) -> bool:
+        try:
+            obj = json.loads(candidate)
+        except ValueError:
+            return False
+        if isinstance(obj, dict) and (self.accept is None or self.accept(obj)):
+            self.result = obj
+            return True
+        return False
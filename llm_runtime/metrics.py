@@ -0,0 +1,290 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Off unless LLM_METRICS is set or enable() is called. Instrumented code checks this flag
+# before doing any work, so disabled metrics cost one attribute read per call site.
+ENABLED = os.environ.get("LLM_METRICS", "").lower() not in ("", "0", "false", "no")
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000)
+
+def enable():
+    global ENABLED
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def _label_key(labelnames: Sequence[str], labels: Dict[str, Any]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    """Exposition-format number: shortest round-trip repr (:g keeps only 6 digits), +Inf/-Inf/NaN."""
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+class Counter:
+    """Monotonic counter with optional labels."""
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        with self._lock:
+            return self._values.get(_label_key(self.labelnames, labels), 0.0)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._values.items())
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value} for key, value in items]
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics) with optional labels."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any):
+        """Observes the duration of the block in seconds (only while metrics are enabled)."""
+        if not ENABLED:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(key, list(series[0]), series[1], series[2]) for key, series in self._series.items()]
+        result = []
+        for key, counts, total, count in items:
+            result.append({
+                "labels": dict(zip(self.labelnames, key)),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else 0.0,
+                "p50": self._quantile(counts, count, 0.50),
+                "p95": self._quantile(counts, count, 0.95),
+                "p99": self._quantile(counts, count, 0.99),
+            })
+        return result
+
+    def _quantile(self, counts: List[int], count: int, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None if it is in the +Inf bucket)."""
+        if not count:
+            return None
+        target = q * count
+        running = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            running += bucket_count
+            if running >= target:
+                return bound
+        return None
+
+    def render(self) -> Iterator[str]:
+        with self._lock:
+            items = sorted((key, list(series[0]), series[1], series[2]) for key, series in self._series.items())
+        for key, counts, total, count in items:
+            running = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                running += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {running}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Current values of every metric, keyed by metric name."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def export_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+REGISTRY = MetricsRegistry()
+
+# LLM calls, labelled by model and by the spoke/agent that made them
+LLM_REQUESTS = REGISTRY.counter("llm_requests_total", "LLM calls by outcome (ok, error, cache_hit).",
+                                ("model", "caller", "outcome"))
+LLM_LATENCY = REGISTRY.histogram("llm_request_seconds", "Wall time of LLM calls.", ("model", "caller"))
+LLM_PROMPT_TOKENS = REGISTRY.counter("llm_prompt_tokens_total", "Prompt tokens evaluated (prompt_eval_count).",
+                                     ("model", "caller"))
+LLM_COMPLETION_TOKENS = REGISTRY.counter("llm_completion_tokens_total", "Tokens generated (eval_count).",
+                                         ("model", "caller"))
+LLM_PREFILL = REGISTRY.histogram("llm_prefill_seconds", "Prompt evaluation time reported by Ollama.", ("model", "caller"))
+LLM_LOAD = REGISTRY.histogram("llm_load_seconds", "Model load time reported by Ollama.", ("model", "caller"))
+LLM_DECODE_RATE = REGISTRY.histogram("llm_decode_tokens_per_second", "Generation speed (eval_count / eval_duration).",
+                                     ("model", "caller"), buckets=TOKEN_RATE_BUCKETS)
+
+# Transport
+HTTP_REQUESTS = REGISTRY.counter("ollama_http_requests_total", "HTTP requests to Ollama by path and status.",
+                                 ("path", "status"))
+HTTP_LATENCY = REGISTRY.histogram("ollama_http_request_seconds", "Time from send to response headers.", ("path",))
+HTTP_RETRIES = REGISTRY.counter("ollama_http_retries_total", "Retried HTTP attempts.", ("path",))
+HTTP_WAIT = REGISTRY.histogram("ollama_in_flight_wait_seconds", "Time spent waiting for an in-flight slot.", ("model",))
+
+# Pipelines
+STAGE_LATENCY = REGISTRY.histogram("pipeline_stage_seconds", "Duration of orchestrator and workflow stages.",
+                                   ("pipeline", "stage"))
+SPOKE_LATENCY = REGISTRY.histogram("spoke_call_seconds", "Spoke call latency as seen by the orchestrator.",
+                                   ("spoke", "outcome"))
+EVENT_DISPATCH = REGISTRY.histogram("eventbus_dispatch_seconds", "Time to run all subscribers of one event.",
+                                    ("event_type",))
+
+def record_llm_call(model: str, caller: str, seconds: Optional[float], response: Optional[Dict[str, Any]] = None,
+                    outcome: str = "ok"):
+    """Records one LLM call, including the token and timing fields of an Ollama response body."""
+    if not ENABLED:
+        return
+    caller = caller or "unknown"
+    LLM_REQUESTS.inc(model=model, caller=caller, outcome=outcome)
+    if seconds is not None:
+        LLM_LATENCY.observe(seconds, model=model, caller=caller)
+    if not response:
+        return
+    prompt_tokens = response.get("prompt_eval_count")
+    if prompt_tokens:
+        LLM_PROMPT_TOKENS.inc(prompt_tokens, model=model, caller=caller)
+    if response.get("prompt_eval_duration"):
+        LLM_PREFILL.observe(response["prompt_eval_duration"] / 1e9, model=model, caller=caller)
+    if response.get("load_duration"):
+        LLM_LOAD.observe(response["load_duration"] / 1e9, model=model, caller=caller)
+    eval_count = response.get("eval_count")
+    if eval_count:
+        LLM_COMPLETION_TOKENS.inc(eval_count, model=model, caller=caller)
+        eval_duration = response.get("eval_duration")
+        if eval_duration:
+            LLM_DECODE_RATE.observe(eval_count / (eval_duration / 1e9), model=model, caller=caller)
+
+def snapshot() -> Dict[str, List[Dict[str, Any]]]:
+    return REGISTRY.snapshot()
+
+def export_prometheus() -> str:
+    return REGISTRY.export_prometheus()
+
+def start_http_server(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serves export_prometheus() on /metrics from a daemon thread. Only local by default;
+    pass host="0.0.0.0" (or an interface address) to let a remote Prometheus scrape it.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = export_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
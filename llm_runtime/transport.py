@@ -0,0 +1,264 @@
+import asyncio
+import http.client
+import json
+import queue
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Union
+from urllib.parse import urlsplit
+
+from . import metrics
+
+RETRYABLE_STATUSES = {429, 502, 503, 504}
+
+class OllamaTransportError(Exception):
+    """Raised when a request to the Ollama host fails after all retries."""
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class OllamaTransport:
+    """
+    Shared HTTP transport for Ollama calls.
+
+    - keeps a pool of keep-alive connections to one host instead of a new TCP
+      connection per request,
+    - caps requests in flight globally and (optionally) per model,
+    - applies connect/read timeouts,
+    - retries connection failures and 429/502/503/504 with exponential backoff
+      and full jitter.
+
+    One instance per host is shared by every client through get_transport().
+    """
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 8,
+                 max_in_flight: int = 16, per_model_limit: Union[int, Dict[str, int], None] = None,
+                 connect_timeout: float = 5.0, read_timeout: float = 300.0,
+                 retries: int = 3, backoff_base: float = 0.25, backoff_max: float = 5.0):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self._scheme = parts.scheme or "http"
+        self._host = parts.hostname or "localhost"
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+        self._in_flight = threading.BoundedSemaphore(max_in_flight)
+        self._per_model_limit = per_model_limit
+        self._model_limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._max_in_flight = max_in_flight
+
+    def post_json(self, path: str, payload: Dict[str, Any], model: Optional[str] = None,
+                  timeout: Optional[float] = None) -> Dict[str, Any]:
+        """POSTs a JSON payload and returns the decoded JSON body."""
+        model = model or payload.get("model")
+        body = json.dumps(payload).encode("utf-8")
+        with self._limit(model):
+            status, data = self._request_with_retries("POST", path, body, timeout)
+        try:
+            return json.loads(data)
+        except ValueError as e:
+            raise OllamaTransportError(f"Invalid JSON from {path}: {e}", status)
+
+    def stream_json_lines(self, path: str, payload: Dict[str, Any], model: Optional[str] = None,
+                          timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+        """
+        POSTs a streaming request and yields each NDJSON chunk as it arrives.
+
+        The in-flight slot is held until the generator finishes. Closing the generator
+        early (break / close()) drops the connection, which makes Ollama stop
+        generating; a stream read to its "done" chunk returns the connection to the pool.
+        """
+        model = model or payload.get("model")
+        body = json.dumps(payload).encode("utf-8")
+        with self._limit(model):
+            _, (conn, response) = self._request_with_retries("POST", path, body, timeout, stream=True)
+            finished = False
+            try:
+                for line in response:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("done"):
+                        finished = True
+                    yield chunk
+                    if finished:
+                        break
+                if finished:
+                    response.read()
+            except socket.timeout as e:
+                raise OllamaTransportError(f"Timed out streaming {path}: {e}")
+            finally:
+                if finished and not response.will_close:
+                    self._release_connection(conn)
+                else:
+                    conn.close()
+
+    async def apost_json(self, path: str, payload: Dict[str, Any], model: Optional[str] = None,
+                         timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Event-loop friendly post_json; runs on a pool sized to the in-flight cap."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), lambda: self.post_json(path, payload, model, timeout))
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @contextmanager
+    def _limit(self, model: Optional[str]):
+        model_sem = self._model_semaphore(model)
+        waited = time.perf_counter() if metrics.ENABLED else None
+        # Per-model slot first: a request queued behind a saturated model must not hold
+        # a global slot that requests for other models could use
+        if model_sem is not None:
+            model_sem.acquire()
+        self._in_flight.acquire()
+        if waited is not None:
+            metrics.HTTP_WAIT.observe(time.perf_counter() - waited, model=model or "")
+        try:
+            yield
+        finally:
+            self._in_flight.release()
+            if model_sem is not None:
+                model_sem.release()
+
+    def _model_semaphore(self, model: Optional[str]) -> Optional[threading.BoundedSemaphore]:
+        if model is None or self._per_model_limit is None:
+            return None
+        with self._lock:
+            sem = self._model_limits.get(model)
+            if sem is None:
+                if isinstance(self._per_model_limit, dict):
+                    limit = self._per_model_limit.get(model)
+                    if limit is None:
+                        return None
+                else:
+                    limit = self._per_model_limit
+                sem = self._model_limits[model] = threading.BoundedSemaphore(limit)
+            return sem
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_in_flight, thread_name_prefix="ollama")
+            return self._executor
+
+    def _request_with_retries(self, method: str, path: str, body: bytes, timeout: Optional[float],
+                              stream: bool = False):
+        attempt = 0
+        while True:
+            started = time.perf_counter() if metrics.ENABLED else None
+            try:
+                status, data = self._request(method, path, body, timeout, stream)
+            except socket.timeout as e:
+                if started is not None:
+                    metrics.HTTP_REQUESTS.inc(path=path, status="timeout")
+                # A read timeout means the model is busy; retrying would only add load
+                raise OllamaTransportError(f"Timed out waiting for {path}: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                if started is not None:
+                    metrics.HTTP_REQUESTS.inc(path=path, status="connection_error")
+                if attempt >= self.retries:
+                    raise OllamaTransportError(f"Connection to {self.base_url} failed: {e}")
+            else:
+                if started is not None:
+                    metrics.HTTP_REQUESTS.inc(path=path, status=status)
+                    metrics.HTTP_LATENCY.observe(time.perf_counter() - started, path=path)
+                if status < 400:
+                    return status, data
+                if status not in RETRYABLE_STATUSES or attempt >= self.retries:
+                    raise OllamaTransportError(f"HTTP {status} from {path}: {data[:200]!r}", status)
+            # Full jitter keeps many clients from retrying in lockstep
+            time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)))
+            attempt += 1
+            if metrics.ENABLED:
+                metrics.HTTP_RETRIES.inc(path=path)
+
+    def _request(self, method: str, path: str, body: bytes, timeout: Optional[float], stream: bool = False):
+        """
+        Returns (status, body bytes), or for a successful stream request
+        (status, (connection, unread response)) which the caller must release.
+        """
+        conn, reused = self._acquire_connection()
+        try:
+            try:
+                response = self._send(conn, method, path, body, timeout)
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry once on a fresh one
+                conn.close()
+                conn = self._new_connection()
+                response = self._send(conn, method, path, body, timeout)
+            if stream and response.status < 400:
+                return response.status, (conn, response)
+            data = response.read()
+        except BaseException:
+            conn.close()
+            raise
+        if response.will_close:
+            conn.close()
+        else:
+            self._release_connection(conn)
+        return response.status, data
+
+    def _send(self, conn: http.client.HTTPConnection, method: str, path: str, body: bytes,
+              timeout: Optional[float]):
+        if conn.sock is None:
+            try:
+                conn.connect()
+            except socket.timeout as e:
+                # Connect timeouts are retryable, unlike read timeouts
+                raise ConnectionError(f"connect timed out: {e}")
+        conn.sock.settimeout(timeout or self.read_timeout)
+        conn.request(method, self._prefix + path, body=body,
+                     headers={"Content-Type": "application/json", "Connection": "keep-alive"})
+        return conn.getresponse()
+
+    def _acquire_connection(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release_connection(self, conn: http.client.HTTPConnection):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+        return cls(self._host, self._port, timeout=self.connect_timeout)
+
+_transports: Dict[str, OllamaTransport] = {}
+_transports_lock = threading.Lock()
+
+def get_transport(base_url: str = "http://localhost:11434", **kwargs) -> OllamaTransport:
+    """
+    Returns the process-wide transport for base_url, creating it on first use.
+    kwargs only apply when the transport is created.
+    """
+    key = base_url.rstrip("/")
+    with _transports_lock:
+        transport = _transports.get(key)
+        if transport is None:
+            transport = _transports[key] = OllamaTransport(key, **kwargs)
+        return transport